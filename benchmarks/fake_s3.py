@@ -0,0 +1,111 @@
+"""
+In-process stand-in for the boto3 S3 client
+Objects are kept in a local directory so large runs stay out of RAM
+"""
+
+import hashlib
+import io
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from botocore.exceptions import ClientError
+
+# --------------------------------------------------
+# Fake client
+# --------------------------------------------------
+
+class _Exceptions:
+    ClientError = ClientError
+
+class FakeS3Client:
+
+    """
+    Implements the put/get/head/list calls used by the pipeline,
+    optionally sleeping per call to model the network round trip
+    """
+
+    exceptions = _Exceptions
+
+    def __init__(self, root: Path, latency: float = 0.0):
+        self.root = Path(root)
+        self.latency = latency
+        self.calls = 0
+
+    def _call(self):
+        self.calls += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _path(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+
+    def _missing(self, key: str, operation: str):
+        return ClientError({"Error": {"Code": "404", "Message": f"{key} not found"}}, operation)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._call()
+
+        body = Body.encode("utf-8") if isinstance(Body, str) else Body
+
+        path = self._path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(body)
+
+        head = {
+            "ContentLength": len(body),
+            "ContentType": kwargs.get("ContentType"),
+            "ContentEncoding": kwargs.get("ContentEncoding"),
+            "Metadata": kwargs.get("Metadata", {}),
+            "ETag": f'"{hashlib.md5(body).hexdigest()}"'
+        }
+
+        path.with_name(path.name + ".head").write_text(json.dumps(head))
+
+        return {"ETag": head["ETag"]}
+
+    def head_object(self, Bucket, Key):
+        self._call()
+
+        path = self._path(Bucket, Key)
+
+        if not path.exists():
+            raise self._missing(Key, "HeadObject")
+
+        head = json.loads(path.with_name(path.name + ".head").read_text())
+        head["LastModified"] = datetime.fromtimestamp(path.stat().st_mtime, timezone.utc)
+
+        return head
+
+    def get_object(self, Bucket, Key):
+        head = self.head_object(Bucket, Key)
+        head["Body"] = io.BufferedReader(io.FileIO(self._path(Bucket, Key)))
+        return head
+
+    def list_objects_v2(self, Bucket, Prefix=""):
+        self._call()
+
+        base = self.root / Bucket
+
+        # Walk only the deepest directory the prefix names
+        parent = self._path(Bucket, Prefix)
+        parent = parent if Prefix.endswith("/") else parent.parent
+
+        contents = []
+
+        if parent.exists():
+            for path in sorted(parent.rglob("*")):
+                key = path.relative_to(base).as_posix()
+
+                if path.is_file() and not key.endswith(".head") and key.startswith(Prefix):
+                    head = json.loads(path.with_name(path.name + ".head").read_text())
+
+                    contents.append({
+                        "Key": key,
+                        "ETag": head["ETag"],
+                        "Size": path.stat().st_size,
+                        "LastModified": datetime.fromtimestamp(path.stat().st_mtime, timezone.utc)
+                    })
+
+        return {"Contents": contents, "KeyCount": len(contents)}
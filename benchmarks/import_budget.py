@@ -0,0 +1,216 @@
+"""
+Import-time budget for the cron jobs in src/jobs
+
+Imports each job module in a fresh interpreter with -X importtime and
+a scrubbed environment (no .env, no credentials), so a job that reads
+config or builds clients at import fails here. Reports the cumulative
+import time, interpreter wall time and heaviest third-party packages,
+and exits non-zero when a job fails to import or exceeds its budget.
+
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --repeat 5 --output benchmarks/results
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+JOBS_DIR = PROJECT_ROOT / "src" / "jobs"
+
+# Budget on the job module's cumulative import time, milliseconds
+
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "350"))
+
+# Daily jobs that never touch numpy or pandas get a tighter budget
+
+JOB_BUDGETS_MS = {
+    "incremental_job": 120,
+    "curated_incremental_job": 120,
+    "partition_job": 120,
+    "pipeline_job": 120,
+}
+
+# Variables kept from the caller's environment, everything else is dropped
+
+PASSTHROUGH = ("PATH", "HOME", "LANG", "LC_ALL", "TMPDIR", "VIRTUAL_ENV")
+
+# --------------------------------------------------
+# Measure
+# --------------------------------------------------
+
+def list_jobs() -> list[str]:
+
+    """
+    Job modules in src/jobs
+
+    :return: Module names eg incremental_job
+    :rtype: list[str]
+    """
+
+    return sorted(path.stem for path in JOBS_DIR.glob("*.py") if path.stem != "__init__")
+
+def parse_importtime(stderr: str) -> list[tuple[int, int, int, str]]:
+
+    """
+    Parse -X importtime output
+
+    :param stderr: Interpreter stderr
+    :type stderr: str
+    :return: (self_us, cumulative_us, depth, module) per import
+    :rtype: list[tuple[int, int, int, str]]
+    """
+
+    imports = []
+
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+
+        imports.append((int(self_us), int(cumulative_us), depth, name.strip()))
+
+    return imports
+
+def measure(job: str) -> dict:
+
+    """
+    Import one job in a fresh interpreter
+
+    :param job: Job module name
+    :type job: str
+    :return: ok, error, import_ms, wall_ms and heaviest packages
+    :rtype: dict
+    """
+
+    module = f"src.jobs.{job}"
+
+    env = {name: os.environ[name] for name in PASSTHROUGH if name in os.environ}
+    env["PYTHONPATH"] = str(PROJECT_ROOT)
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+
+    # An empty working directory keeps load_dotenv from finding .env
+    with tempfile.TemporaryDirectory() as cwd:
+        started = time.perf_counter()
+
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True
+        )
+
+        wall_ms = (time.perf_counter() - started) * 1000
+
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()
+        return {"ok": False, "error": error[-1] if error else f"exit {completed.returncode}"}
+
+    imports = parse_importtime(completed.stderr)
+    job_us = next(cumulative for _, cumulative, _, name in imports if name == module)
+
+    # Top-level third-party packages, the usual cold start cost
+    packages = {}
+
+    for _, cumulative, _, name in imports:
+        if "." in name or name.startswith("_") or name in ("src", "sitecustomize") or name in sys.stdlib_module_names:
+            continue
+
+        packages[name] = max(packages.get(name, 0), cumulative)
+
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:5]
+
+    return {
+        "ok": True,
+        "import_ms": job_us / 1000,
+        "wall_ms": wall_ms,
+        "heaviest": {name: round(us / 1000, 1) for name, us in heaviest}
+    }
+
+def run(jobs: list[str], repeat: int = 3) -> dict[str, dict]:
+
+    """
+    Measure each job, keeping the median of repeated runs
+
+    :param jobs: Job module names
+    :type jobs: list[str]
+    :param repeat: Runs per job
+    :type repeat: int
+    :return: Result per job with budget_ms and within_budget
+    :rtype: dict[str, dict]
+    """
+
+    results = {}
+
+    for job in jobs:
+        runs = [measure(job) for _ in range(repeat)]
+        failed = next((result for result in runs if not result["ok"]), None)
+
+        budget_ms = JOB_BUDGETS_MS.get(job, DEFAULT_BUDGET_MS)
+
+        if failed:
+            results[job] = {**failed, "budget_ms": budget_ms, "within_budget": False}
+            continue
+
+        median = sorted(runs, key=lambda result: result["import_ms"])[len(runs) // 2]
+        import_ms = statistics.median(result["import_ms"] for result in runs)
+
+        results[job] = {
+            **median,
+            "import_ms": round(import_ms, 1),
+            "wall_ms": round(statistics.median(result["wall_ms"] for result in runs), 1),
+            "budget_ms": budget_ms,
+            "within_budget": import_ms <= budget_ms
+        }
+
+    return results
+
+# --------------------------------------------------
+# Entry point
+# --------------------------------------------------
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Import-time budget for src/jobs")
+    parser.add_argument("jobs", nargs="*", help="Job modules, default every job in src/jobs")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per job, the median is reported")
+    parser.add_argument("--output", type=Path, default=None, help="Directory for a JSON result")
+    args = parser.parse_args()
+
+    results = run(args.jobs or list_jobs(), repeat=args.repeat)
+
+    for job, result in results.items():
+        if not result["ok"]:
+            print(f"[ERROR] {job}: import failed: {result['error']}")
+            continue
+
+        tag = "OK" if result["within_budget"] else "WARN"
+        heaviest = ", ".join(f"{name} {ms}ms" for name, ms in result["heaviest"].items())
+
+        print(
+            f"[{tag}] {job}: import {result['import_ms']}ms / budget {result['budget_ms']:.0f}ms, "
+            f"wall {result['wall_ms']}ms ({heaviest})"
+        )
+
+    if args.output:
+        args.output.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = args.output / f"import_budget_{stamp}.json"
+        path.write_text(json.dumps(results, indent=2))
+        print(f"[OK] results written to {path}")
+
+    if not all(result["within_budget"] for result in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Offline end-to-end pipeline benchmark
+
+Runs extract -> raw -> staging -> curated -> mart against synthetic
+EODHD data, an in-process fake S3 or a local data lake (--storage)
+and a local PostgreSQL database, and writes per-stage timings to
+benchmarks/results/*.json.
+
+The target database is wiped: pass a scratch database with --dbname.
+
+    python -m benchmarks.run_pipeline --dbname etl_bench --symbols 500 --years 30
+    python -m benchmarks.run_pipeline --dbname etl_bench --symbols 5000 --years 30
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+
+SCHEMA_FILES = [
+    "sql/staging/staging_stocks.sql",
+    "sql/staging/staging_stock_meta.sql",
+    "sql/curated/curated_stock.sql",
+    "sql/marts/mart_performance.sql",
+    "sql/etl/etl_watermark.sql",
+    "sql/etl/etl_backfill_checkpoint.sql",
+    "sql/etl/etl_restated_candles.sql",
+    "sql/etl/etl_raw_manifest.sql"
+]
+
+TRUNCATE = """
+TRUNCATE
+    staging.stocks,
+    staging.stocks_meta,
+    curated.fact_stock_prices,
+    curated.dim_trade_date,
+    curated.dim_stock_meta,
+    mart.stock_perf_current,
+    etl.load_watermark,
+    etl.backfill_checkpoint,
+    etl.restated_candles,
+    etl.raw_manifest
+RESTART IDENTITY CASCADE;
+"""
+
+STOCK_LIST_STEM = "raw/stocks/stock_lists/domain=sp500/stock_list_2026-01-17"
+
+# --------------------------------------------------
+# DB round-trip counter
+# --------------------------------------------------
+
+class RoundTrips:
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self, n: int = 1):
+        with self.lock:
+            self.count += n
+
+round_trips = RoundTrips()
+
+def counting_configure(conn):
+
+    """
+    Pool configure callback, counts execute/executemany/copy calls
+    """
+
+    import psycopg
+
+    class CountingCursor(psycopg.Cursor):
+
+        def execute(self, *args, **kwargs):
+            round_trips.add()
+            return super().execute(*args, **kwargs)
+
+        def executemany(self, *args, **kwargs):
+            round_trips.add()
+            return super().executemany(*args, **kwargs)
+
+        def copy(self, *args, **kwargs):
+            round_trips.add()
+            return super().copy(*args, **kwargs)
+
+    conn.cursor_factory = CountingCursor
+
+# --------------------------------------------------
+# Measurement
+# --------------------------------------------------
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_stage(name: str, fn, count_rows) -> dict:
+
+    """
+    Time a stage and collect rows/sec, peak RSS and DB round-trips
+
+    :param name: Stage name
+    :type name: str
+    :param fn: Stage callable
+    :param count_rows: Maps the stage result to rows processed
+    :return: Stage measurements
+    :rtype: dict
+    """
+
+    print(f"[BENCH] {name} ...")
+
+    trips = round_trips.count
+    start = time.perf_counter()
+
+    result = fn()
+
+    seconds = time.perf_counter() - start
+    rows = count_rows(result)
+
+    stage = {
+        "seconds": round(seconds, 3),
+        "rows": rows,
+        "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "db_round_trips": round_trips.count - trips
+    }
+
+    print(f"[BENCH] {name}: {stage}")
+
+    return stage
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# --------------------------------------------------
+# Benchmark
+# --------------------------------------------------
+
+def run(args) -> dict:
+
+    # Stand-in configuration before any pipeline module is imported
+    os.environ["DB_NAME"] = args.dbname
+    os.environ["S3_RAW_BUCKET"] = "benchmark"
+    os.environ["RAW_FORMAT"] = args.raw_format
+    os.environ.setdefault("EOD_APIKEY", "benchmark")
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+    from benchmarks.fake_s3 import FakeS3Client
+    from benchmarks.synthetic import trading_days, synthetic_symbols, synthetic_stock_list, synthetic_history
+    from src.utils import db, metrics
+    from src.utils.storage import S3Storage, LocalStorage, set_storage
+    from src.utils.raw_format import raw_key, encode_payload
+    from src.load_raw.s3 import write_historical_s3
+    from src.load_staging import staging_historical, staging_stock_meta
+    from src.load_curated.curated_incremental import load_curated_incremental
+    from src.load_curated.curated_bulk import load_curated_bulk, rebuild_curated_bulk
+    from src.load_mart.mart_perf_current import load_mart_perf_current
+
+    workdir = tempfile.TemporaryDirectory(prefix="etl_bench_")
+
+    if args.storage == "local":
+        storage = LocalStorage(Path(workdir.name))
+    else:
+        storage = S3Storage("benchmark", FakeS3Client(Path(workdir.name), latency=args.s3_latency_ms / 1000))
+
+    set_storage(storage)
+
+    days = trading_days(args.years)
+    symbols = synthetic_symbols(args.symbols)
+
+    def fetch_historical(symbol: str) -> list[dict]:
+        return synthetic_history(symbol, days)
+
+    write_historical_s3.fetch_historical = fetch_historical
+
+    db.init_pool(configure=counting_configure)
+
+    # Schema and clean tables
+    with db.transaction() as conn:
+        for schema_file in SCHEMA_FILES:
+            db.execute((PROJECT_ROOT / schema_file).read_text(), conn=conn)
+
+        db.execute(TRUNCATE, conn=conn)
+
+    stock_list = synthetic_stock_list(symbols)
+    body, put_args = encode_payload({"domain": "sp500", "source": "benchmark", "ingested_at": datetime.now(timezone.utc).isoformat()}, stock_list)
+    storage.put(raw_key(STOCK_LIST_STEM), body, **put_args)
+
+    curated_sql = (PROJECT_ROOT / "src" / "load_curated" / "curated_historical.sql").read_text()
+    dim_stock_meta = curated_sql.split(";")[0]
+
+    stages = {}
+    metrics.reset()
+
+    stages["extract_raw"] = run_stage(
+        "extract_raw",
+        lambda: write_historical_s3.get_historical_data(symbols, workers=args.workers, rate_per_minute=10 ** 9),
+        lambda result: len(result["written"]) * len(days)
+    )
+
+    def staging():
+        staging_stock_meta.load_stock_meta()
+        result = staging_historical.load_staging_historical(symbols, workers=args.staging_workers)
+
+        # Worker processes close the parent pool before forking,
+        # their own round-trips are not counted
+        db.init_pool(configure=counting_configure)
+
+        return result
+
+    stages["staging"] = run_stage(
+        "staging",
+        staging,
+        lambda result: sum(counts["inserted"] for counts in result.values())
+    )
+
+    def curated():
+        if args.curated_mode == "bulk":
+            return load_curated_bulk()
+
+        db.execute(dim_stock_meta)
+        return load_curated_incremental()
+
+    stages["curated"] = run_stage(
+        "curated",
+        curated,
+        lambda result: result["facts"]
+    )
+
+    stages["mart"] = run_stage(
+        "mart",
+        lambda: load_mart_perf_current(force=True),
+        lambda result: result["rows"]
+    )
+
+    # Same candles again under a new run id: uploads and staging
+    # downloads are skipped on their content digest
+    if args.rerun:
+        calls = getattr(storage.client, "calls", 0) if args.storage == "s3" else None
+
+        stages["extract_raw_rerun"] = run_stage(
+            "extract_raw_rerun",
+            lambda: write_historical_s3.get_historical_data(symbols, workers=args.workers, rate_per_minute=10 ** 9, resume=False),
+            lambda result: len(result["written"]) * len(days)
+        )
+
+        stages["staging_rerun"] = run_stage(
+            "staging_rerun",
+            lambda: staging_historical.load_staging_historical(symbols, workers=args.staging_workers, run_id="benchmark_rerun"),
+            lambda result: sum(counts["inserted"] + counts["updated"] for counts in result.values())
+        )
+
+        if calls is not None:
+            print(f"[BENCH] rerun storage calls: {storage.client.calls - calls} for {len(symbols)} symbols")
+
+    # Both tables again from scratch through shadow tables, indexed
+    # after the load, against the in-place stages above
+    if args.rebuild:
+        def staging_rebuild():
+            result = staging_historical.rebuild_staging_historical(symbols, workers=args.staging_workers)
+            db.init_pool(configure=counting_configure)
+
+            return result
+
+        stages["staging_rebuild"] = run_stage(
+            "staging_rebuild",
+            staging_rebuild,
+            lambda result: sum(counts["inserted"] for counts in result.values())
+        )
+
+        stages["curated_rebuild"] = run_stage(
+            "curated_rebuild",
+            rebuild_curated_bulk,
+            lambda result: result["facts"]
+        )
+
+    db.close_pool()
+    workdir.cleanup()
+
+    total_seconds = sum(stage["seconds"] for stage in stages.values())
+    pipeline_metrics = metrics.report("benchmark", "success", total_seconds)
+
+    return {
+        "started_at": args.started_at,
+        "git_commit": git_commit(),
+        "params": {
+            "symbols": args.symbols,
+            "years": args.years,
+            "trading_days": len(days),
+            "raw_format": args.raw_format,
+            "storage": args.storage,
+            "s3_latency_ms": args.s3_latency_ms,
+            "workers": args.workers,
+            "staging_workers": args.staging_workers,
+            "curated_mode": args.curated_mode,
+            "rerun": args.rerun,
+            "rebuild": args.rebuild
+        },
+        "stages": stages,
+        "total_seconds": round(total_seconds, 3),
+        "latency": pipeline_metrics["latency"],
+        "counters": pipeline_metrics["counters"]
+    }
+
+# --------------------------------------------------
+# Entry point
+# --------------------------------------------------
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Offline end-to-end ETL benchmark")
+    parser.add_argument("--dbname", required=True, help="Scratch PostgreSQL database, wiped by the run")
+    parser.add_argument("--symbols", type=int, default=500, help="Synthetic symbols, eg 500 or 5000")
+    parser.add_argument("--years", type=int, default=30, help="Years of daily history per symbol")
+    parser.add_argument("--raw-format", default="ndjson.gz", help="RAW_FORMAT for the fake S3 objects")
+    parser.add_argument("--storage", choices=["s3", "local"], default="s3", help="Raw storage backend, s3 uses the fake client")
+    parser.add_argument("--s3-latency-ms", type=float, default=0.0, help="Simulated round trip per fake S3 call")
+    parser.add_argument("--workers", type=int, default=8, help="Extract workers")
+    parser.add_argument("--staging-workers", type=int, default=1, help="Staging rebuild worker processes")
+    parser.add_argument("--curated-mode", choices=["incremental", "bulk"], default="incremental", help="Curated loader")
+    parser.add_argument("--rerun", action="store_true", help="Repeat extract and staging with unchanged data")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild staging and curated through shadow tables")
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR, help="Directory for JSON results")
+
+    args = parser.parse_args()
+    args.started_at = datetime.now(timezone.utc).isoformat()
+
+    report = run(args)
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output_file = args.output / f"{stamp}_{args.symbols}x{args.years}y.json"
+
+    with output_file.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"[OK] benchmark results written to {output_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Synthetic OHLCV generator matching the EODHD payload shape
+"""
+
+import zlib
+import numpy as np
+from datetime import date, timedelta
+from src.utils.trading_calendar import sessions
+
+# --------------------------------------------------
+# Trading days
+# --------------------------------------------------
+
+def trading_days(years: int, end: date = date(2025, 12, 31)) -> list[str]:
+
+    """
+    NYSE sessions over the last N years, as ISO date strings
+
+    :param years: Years of history
+    :type years: int
+    :param end: Last calendar day
+    :type end: date
+    :return: ISO trading dates, oldest first
+    :rtype: list[str]
+    """
+
+    return np.datetime_as_string(sessions(end - timedelta(days=365 * years), end)).tolist()
+
+# --------------------------------------------------
+# Symbols
+# --------------------------------------------------
+
+def synthetic_symbols(count: int) -> list[str]:
+
+    """
+    Deterministic ticker-like symbols, eg SYM0001
+
+    :param count: Number of symbols
+    :type count: int
+    :return: Symbols
+    :rtype: list[str]
+    """
+
+    return [f"SYM{i:04d}" for i in range(count)]
+
+def synthetic_stock_list(symbols: list[str]) -> list[dict]:
+
+    """
+    Stock list rows shaped like the Wikipedia scrape
+
+    :param symbols: Symbols
+    :type symbols: list[str]
+    :return: Stock meta rows
+    :rtype: list[dict]
+    """
+
+    sectors = ["Information Technology", "Health Care", "Financials", "Industrials", "Energy"]
+
+    return [
+        {
+            "symbol": symbol,
+            "name": f"{symbol} Inc.",
+            "sector": sectors[i % len(sectors)],
+            "sub_industry": f"Sub Industry {i % 25}",
+            "headquarters": "New York, New York",
+            "CIK": 1000000 + i
+        }
+        for i, symbol in enumerate(symbols)
+    ]
+
+# --------------------------------------------------
+# Candles
+# --------------------------------------------------
+
+def synthetic_history(symbol: str, days: list[str]) -> list[dict]:
+
+    """
+    Random-walk daily candles for one symbol, EODHD /eod shape
+
+    :param symbol: Symbol, seeds the generator
+    :type symbol: str
+    :param days: ISO trading dates
+    :type days: list[str]
+    :return: Candles, oldest first
+    :rtype: list[dict]
+    """
+
+    rng = np.random.default_rng(zlib.crc32(symbol.encode("utf-8")))
+    n = len(days)
+
+    close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n)))
+    open_ = close * np.exp(rng.normal(0, 0.005, n))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n))
+    adjusted = close * rng.uniform(0.5, 1.0)
+    volume = rng.integers(100_000, 50_000_000, n)
+
+    columns = zip(
+        days,
+        np.round(open_, 4).tolist(),
+        np.round(high, 4).tolist(),
+        np.round(low, 4).tolist(),
+        np.round(close, 4).tolist(),
+        np.round(adjusted, 4).tolist(),
+        volume.tolist()
+    )
+
+    return [
+        {
+            "date": d,
+            "open": o,
+            "high": h,
+            "low": l,
+            "close": c,
+            "adjusted_close": a,
+            "volume": v
+        }
+        for d, o, h, l, c, a, v in columns
+    ]
+
+def synthetic_bulk_last_day(symbols: list[str], day: str) -> list[dict]:
+
+    """
+    One candle per symbol, EODHD /eod-bulk-last-day shape
+
+    :param symbols: Symbols
+    :type symbols: list[str]
+    :param day: ISO trade date
+    :type day: str
+    :return: Candles
+    :rtype: list[dict]
+    """
+
+    rows = []
+
+    for symbol in symbols:
+        candle = synthetic_history(symbol, [day])[0]
+        rows.append({"code": symbol, "exchange_short_name": "US", **candle})
+
+    return rows
@@ -42,31 +42,40 @@ CREATE TABLE IF NOT EXISTS curated.dim_trade_date (
 -- =========================================================
 -- Fact Table
 -- =========================================================
+-- Range partitioned by trade year (fact_stock_prices_YYYY),
+-- partitions are created by src/utils/partitions.py.
+-- trade_date duplicates dim_trade_date.date as the partition key.
+-- row_hash: md5 of the OHLCV values, as in staging.stocks.
 
 CREATE TABLE IF NOT EXISTS curated.fact_stock_prices (
-    stock_price_sk  BIGSERIAL PRIMARY KEY,
+    stock_price_sk  BIGSERIAL,
     symbol_sk       BIGINT NOT NULL REFERENCES curated.dim_stock_meta(stock_meta_sk),
     trade_date_sk   BIGINT NOT NULL REFERENCES curated.dim_trade_date(date_sk),
+    trade_date      DATE NOT NULL,
     open            NUMERIC(12,4) NOT NULL,
     high            NUMERIC(12,4) NOT NULL,
     low             NUMERIC(12,4) NOT NULL,
     close           NUMERIC(12,4) NOT NULL,
     adjusted_close  NUMERIC(12,4) NOT NULL,
     volume          BIGINT NOT NULL,
+    row_hash        UUID GENERATED ALWAYS AS (
+        md5(
+            open::TEXT || '|' || high::TEXT || '|' || low::TEXT || '|' ||
+            close::TEXT || '|' || adjusted_close::TEXT || '|' || volume::TEXT
+        )::UUID
+    ) STORED,
+
+    CONSTRAINT fact_stock_prices_pk
+    PRIMARY KEY (stock_price_sk, trade_date),
 
     CONSTRAINT fact_stock_grain
-    UNIQUE (symbol_sk, trade_date_sk)
-);
+    UNIQUE (symbol_sk, trade_date)
+) PARTITION BY RANGE (trade_date);
 
 -- =========================================================
 -- Index
 -- =========================================================
-
-CREATE INDEX IF NOT EXISTS index_fact_stock_symbol
-ON curated.fact_stock_prices (symbol_sk);
+-- fact_stock_grain covers symbol lookups
 
 CREATE INDEX IF NOT EXISTS index_fact_stock_trade_date
-ON curated.fact_stock_prices (trade_date_sk);
-
-CREATE INDEX IF NOT EXISTS index_fact_stock_price_trade_date
-ON curated.fact_stock_prices (symbol_sk, trade_date_sk);
\ No newline at end of file
+ON curated.fact_stock_prices (trade_date);
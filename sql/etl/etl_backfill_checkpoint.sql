@@ -0,0 +1,33 @@
+-- =========================================================
+-- Stock ETL - Backfill Checkpoints
+-- =========================================================
+
+-- =========================================================
+-- Create Schema
+-- =========================================================
+
+CREATE SCHEMA IF NOT EXISTS etl;
+
+-- =========================================================
+-- Backfill Checkpoint
+-- =========================================================
+-- One row per backfill run, stage ('raw', 'staging') and symbol.
+-- etag: raw object written or loaded, row_count: candles in it.
+-- Reruns of a run_id skip 'done' symbols and retry 'failed' ones.
+
+CREATE TABLE IF NOT EXISTS etl.backfill_checkpoint (
+    run_id          TEXT NOT NULL,
+    stage           TEXT NOT NULL,
+    symbol          TEXT NOT NULL,
+    status          TEXT NOT NULL,
+    etag            TEXT,
+    row_count       BIGINT,
+    error           TEXT,
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+    CONSTRAINT backfill_checkpoint_pk
+    PRIMARY KEY (run_id, stage, symbol),
+
+    CONSTRAINT backfill_checkpoint_status
+    CHECK (status IN ('done', 'failed'))
+);
@@ -0,0 +1,35 @@
+-- =========================================================
+-- Stock ETL - Pipeline Run Ledger
+-- =========================================================
+
+-- =========================================================
+-- Create Schema
+-- =========================================================
+
+CREATE SCHEMA IF NOT EXISTS etl;
+
+-- =========================================================
+-- Pipeline Run
+-- =========================================================
+-- One row per pipeline run and stage.
+-- status: running, done, failed, or skipped when an upstream stage failed.
+-- attempts: tries so far, including retries after failure or timeout.
+-- Reruns of a run_id skip 'done' stages and resume from the rest.
+
+CREATE TABLE IF NOT EXISTS etl.pipeline_run (
+    run_id          TEXT NOT NULL,
+    stage           TEXT NOT NULL,
+    status          TEXT NOT NULL,
+    attempts        INT NOT NULL DEFAULT 0,
+    started_at      TIMESTAMPTZ,
+    finished_at     TIMESTAMPTZ,
+    seconds         DOUBLE PRECISION,
+    error           TEXT,
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+    CONSTRAINT pipeline_run_pk
+    PRIMARY KEY (run_id, stage),
+
+    CONSTRAINT pipeline_run_status
+    CHECK (status IN ('running', 'done', 'failed', 'skipped'))
+);
@@ -0,0 +1,37 @@
+-- =========================================================
+-- Stock ETL - Raw Object Manifest
+-- =========================================================
+
+-- =========================================================
+-- Create Schema
+-- =========================================================
+
+CREATE SCHEMA IF NOT EXISTS etl;
+
+-- =========================================================
+-- Raw Manifest
+-- =========================================================
+-- One row per raw historical object (full history or delta).
+-- digest: sha256 of the candle rows, independent of raw format
+-- and ingested_at, also stored as the object's content-digest
+-- metadata. etag: object version the digest describes.
+-- loaded_digest: digest last merged into staging. An object
+-- whose etag and digest are unchanged since it was loaded is
+-- not downloaded again.
+
+CREATE TABLE IF NOT EXISTS etl.raw_manifest (
+    object_key      TEXT NOT NULL,
+    symbol          TEXT NOT NULL,
+    digest          TEXT NOT NULL,
+    etag            TEXT,
+    row_count       BIGINT,
+    written_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+    loaded_digest   TEXT,
+    loaded_at       TIMESTAMPTZ,
+
+    CONSTRAINT raw_manifest_pk
+    PRIMARY KEY (object_key)
+);
+
+CREATE INDEX IF NOT EXISTS raw_manifest_symbol_idx
+ON etl.raw_manifest (symbol);
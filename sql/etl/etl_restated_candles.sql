@@ -0,0 +1,30 @@
+-- =========================================================
+-- Stock ETL - Restated Candles
+-- =========================================================
+
+-- =========================================================
+-- Create Schema
+-- =========================================================
+
+CREATE SCHEMA IF NOT EXISTS etl;
+
+-- =========================================================
+-- Restated Candles
+-- =========================================================
+-- Candles whose values changed after they were first loaded,
+-- e.g. adjusted_close restated after a split or dividend, and
+-- candles first loaded at or behind the next stage's watermark,
+-- e.g. a backfilled symbol or a refilled gap.
+-- stage: downstream stage still to apply it ('curated', 'mart').
+-- Written by the staging and curated merges, consumed (deleted)
+-- by the next stage in the transaction that applies it.
+
+CREATE TABLE IF NOT EXISTS etl.restated_candles (
+    stage           TEXT NOT NULL,
+    symbol          TEXT NOT NULL,
+    trade_date      DATE NOT NULL,
+    restated_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+    CONSTRAINT restated_candles_pk
+    PRIMARY KEY (stage, symbol, trade_date)
+);
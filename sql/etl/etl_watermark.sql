@@ -0,0 +1,25 @@
+-- =========================================================
+-- Stock ETL - Load Watermarks
+-- =========================================================
+
+-- =========================================================
+-- Create Schema
+-- =========================================================
+
+CREATE SCHEMA IF NOT EXISTS etl;
+
+-- =========================================================
+-- Load Watermark
+-- =========================================================
+-- One row per pipeline stage ('*') or per stage and symbol.
+-- high_water_date: latest trade_date already loaded by the stage.
+
+CREATE TABLE IF NOT EXISTS etl.load_watermark (
+    stage           TEXT NOT NULL,
+    symbol          TEXT NOT NULL DEFAULT '*',
+    high_water_date DATE NOT NULL,
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+    CONSTRAINT load_watermark_pk
+    PRIMARY KEY (stage, symbol)
+);
@@ -0,0 +1,151 @@
+-- =========================================================
+-- Stock ETL - Migration: yearly range partitions
+-- =========================================================
+-- Converts heap staging.stocks and curated.fact_stock_prices
+-- into tables range partitioned by trade year, one partition
+-- per year present. Adds trade_date to the fact table and
+-- drops its overlapping indexes. Runs in one transaction,
+-- future partitions: python -m src.utils.partitions
+
+BEGIN;
+
+-- =========================================================
+-- Staging Table - Price
+-- =========================================================
+
+ALTER TABLE staging.stocks RENAME TO stocks_heap;
+
+ALTER TABLE staging.stocks_heap DROP CONSTRAINT staging_stocks_symbol_trade_date_uk;
+
+DROP INDEX IF EXISTS staging.index_staging_stocks_trade_date;
+
+CREATE TABLE staging.stocks (
+    symbol          TEXT NOT NULL,
+    domain          TEXT NOT NULL,
+    source          TEXT NOT NULL,
+    ingestion_type  TEXT NOT NULL,
+    ingested_at     TIMESTAMPTZ NOT NULL,
+    trade_date      DATE NOT NULL,
+    open            NUMERIC(12,4) NOT NULL,
+    high            NUMERIC(12,4) NOT NULL,
+    low             NUMERIC(12,4) NOT NULL,
+    close           NUMERIC(12,4) NOT NULL,
+    adjusted_close  NUMERIC(12,4) NOT NULL,
+    volume          BIGINT NOT NULL,
+
+    CONSTRAINT staging_stocks_symbol_trade_date_uk
+        UNIQUE (symbol, trade_date)
+) PARTITION BY RANGE (trade_date);
+
+CREATE INDEX index_staging_stocks_trade_date
+ON staging.stocks (trade_date);
+
+DO $$
+DECLARE
+    y INT;
+BEGIN
+    FOR y IN
+        SELECT DISTINCT EXTRACT(year FROM trade_date)::INT
+        FROM staging.stocks_heap
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE staging.%I PARTITION OF staging.stocks FOR VALUES FROM (%L) TO (%L)',
+            'stocks_' || y, make_date(y, 1, 1), make_date(y + 1, 1, 1)
+        );
+    END LOOP;
+END $$;
+
+INSERT INTO staging.stocks
+SELECT *
+FROM staging.stocks_heap;
+
+DROP TABLE staging.stocks_heap;
+
+-- =========================================================
+-- Fact Table
+-- =========================================================
+
+ALTER TABLE curated.fact_stock_prices RENAME TO fact_stock_prices_heap;
+
+ALTER TABLE curated.fact_stock_prices_heap DROP CONSTRAINT fact_stock_grain;
+
+DROP INDEX IF EXISTS curated.index_fact_stock_symbol;
+DROP INDEX IF EXISTS curated.index_fact_stock_trade_date;
+DROP INDEX IF EXISTS curated.index_fact_stock_price_trade_date;
+
+-- Keep the surrogate key sequence and its values
+
+ALTER SEQUENCE curated.fact_stock_prices_stock_price_sk_seq OWNED BY NONE;
+
+CREATE TABLE curated.fact_stock_prices (
+    stock_price_sk  BIGINT NOT NULL DEFAULT nextval('curated.fact_stock_prices_stock_price_sk_seq'),
+    symbol_sk       BIGINT NOT NULL REFERENCES curated.dim_stock_meta(stock_meta_sk),
+    trade_date_sk   BIGINT NOT NULL REFERENCES curated.dim_trade_date(date_sk),
+    trade_date      DATE NOT NULL,
+    open            NUMERIC(12,4) NOT NULL,
+    high            NUMERIC(12,4) NOT NULL,
+    low             NUMERIC(12,4) NOT NULL,
+    close           NUMERIC(12,4) NOT NULL,
+    adjusted_close  NUMERIC(12,4) NOT NULL,
+    volume          BIGINT NOT NULL,
+
+    CONSTRAINT fact_stock_prices_pk
+    PRIMARY KEY (stock_price_sk, trade_date),
+
+    CONSTRAINT fact_stock_grain
+    UNIQUE (symbol_sk, trade_date)
+) PARTITION BY RANGE (trade_date);
+
+ALTER SEQUENCE curated.fact_stock_prices_stock_price_sk_seq OWNED BY curated.fact_stock_prices.stock_price_sk;
+
+CREATE INDEX index_fact_stock_trade_date
+ON curated.fact_stock_prices (trade_date);
+
+DO $$
+DECLARE
+    y INT;
+BEGIN
+    FOR y IN
+        SELECT DISTINCT td.year
+        FROM curated.fact_stock_prices_heap as sp
+        JOIN curated.dim_trade_date as td
+            ON sp.trade_date_sk = td.date_sk
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE curated.%I PARTITION OF curated.fact_stock_prices FOR VALUES FROM (%L) TO (%L)',
+            'fact_stock_prices_' || y, make_date(y, 1, 1), make_date(y + 1, 1, 1)
+        );
+    END LOOP;
+END $$;
+
+INSERT INTO curated.fact_stock_prices (
+    stock_price_sk,
+    symbol_sk,
+    trade_date_sk,
+    trade_date,
+    open,
+    high,
+    low,
+    close,
+    adjusted_close,
+    volume
+)
+
+SELECT
+    sp.stock_price_sk,
+    sp.symbol_sk,
+    sp.trade_date_sk,
+    td.date,
+    sp.open,
+    sp.high,
+    sp.low,
+    sp.close,
+    sp.adjusted_close,
+    sp.volume
+FROM curated.fact_stock_prices_heap as sp
+JOIN curated.dim_trade_date as td
+    ON sp.trade_date_sk = td.date_sk;
+
+DROP TABLE curated.fact_stock_prices_heap;
+
+COMMIT;
@@ -0,0 +1,30 @@
+-- =========================================================
+-- Stock ETL - Migration: per-row content hash
+-- =========================================================
+-- Adds row_hash, an md5 of the OHLCV values, to staging.stocks
+-- and curated.fact_stock_prices as a stored generated column.
+-- Merges update a conflicting row only when its hash differs.
+-- Rewrites both tables, run in a maintenance window. Create
+-- etl.restated_candles with sql/etl/etl_restated_candles.sql.
+
+BEGIN;
+
+ALTER TABLE staging.stocks
+ADD COLUMN IF NOT EXISTS row_hash UUID
+GENERATED ALWAYS AS (
+    md5(
+        open::TEXT || '|' || high::TEXT || '|' || low::TEXT || '|' ||
+        close::TEXT || '|' || adjusted_close::TEXT || '|' || volume::TEXT
+    )::UUID
+) STORED;
+
+ALTER TABLE curated.fact_stock_prices
+ADD COLUMN IF NOT EXISTS row_hash UUID
+GENERATED ALWAYS AS (
+    md5(
+        open::TEXT || '|' || high::TEXT || '|' || low::TEXT || '|' ||
+        close::TEXT || '|' || adjusted_close::TEXT || '|' || volume::TEXT
+    )::UUID
+) STORED;
+
+COMMIT;
@@ -11,6 +11,10 @@ CREATE SCHEMA IF NOT EXISTS staging;
 -- =========================================================
 -- Staging Table - Price
 -- =========================================================
+-- Range partitioned by trade year (stocks_YYYY), partitions
+-- are created by src/utils/partitions.py.
+-- row_hash: md5 of the OHLCV values, merges only update a
+-- conflicting row when it differs.
 
 CREATE TABLE IF NOT EXISTS staging.stocks (
     symbol          TEXT NOT NULL,
@@ -25,7 +29,21 @@ CREATE TABLE IF NOT EXISTS staging.stocks (
     close           NUMERIC(12,4) NOT NULL,
     adjusted_close  NUMERIC(12,4) NOT NULL,
     volume          BIGINT NOT NULL,
+    row_hash        UUID GENERATED ALWAYS AS (
+        md5(
+            open::TEXT || '|' || high::TEXT || '|' || low::TEXT || '|' ||
+            close::TEXT || '|' || adjusted_close::TEXT || '|' || volume::TEXT
+        )::UUID
+    ) STORED,
 
     CONSTRAINT staging_stocks_symbol_trade_date_uk
         UNIQUE (symbol, trade_date)
-);
\ No newline at end of file
+) PARTITION BY RANGE (trade_date);
+
+-- =========================================================
+-- Index
+-- =========================================================
+-- Delta reads by trade date (curated watermark)
+
+CREATE INDEX IF NOT EXISTS index_staging_stocks_trade_date
+ON staging.stocks (trade_date);
\ No newline at end of file
@@ -2,101 +2,312 @@
 API client for EODHD
 """
 
-import os
-import requests
-from dotenv import load_dotenv
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from src.utils import metrics, settings
 from src.utils.custom_exceptions import *
 
 # -------------------------------------
-# Load environment variables
+# API / EODHD config
 # -------------------------------------
 
-load_dotenv()
+eod_url = "https://eodhd.com/api/eod-bulk-last-day/US"
 
 # -------------------------------------
-# API / EODHD config
+# HTTP config
 # -------------------------------------
 
-api_key = os.getenv("EOD_APIKEY")
+# Read when a client is built:
+# EOD_POOL_SIZE            pooled keep-alive connections, at least one per fetch worker (16)
+# EOD_MAX_RETRIES          retries on 429/5xx and connection errors, exponential backoff (4)
+# EOD_BACKOFF_SECONDS      first backoff (1)
+# EOD_MAX_BACKOFF_SECONDS  longest backoff (60)
 
-if not api_key:
-    raise ConfigError("API key not set in environment")
-
-eod_url = "https://eodhd.com/api/eod-bulk-last-day/US"
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
 # -------------------------------------
-# Fetch incremental data
+# EODHD client
 # -------------------------------------
 
-def fetch_incremental(symbols: list[str]) -> list[dict]:
+class EODClient:
 
     """
-    Fetch incremental EOD data from EODHD
-    
-    :param symbols: List of symbols retrieved from config
-    :type symbols: list[str]
-    :return: EODHD Bulk json
-    :rtype: list[dict]
+    EODHD API client over one pooled keep-alive session
+
+    Retries 429/5xx and connection errors with bounded exponential
+    backoff, honouring Retry-After. Requests gzip responses and counts
+    requests, retries, latency and bytes across threads.
     """
 
-    joined_symbols = ",".join(symbols)
+    def __init__(
+        self,
+        token: str | None = None,
+        pool_size: int | None = None,
+        max_retries: int | None = None,
+        backoff: float | None = None,
+        max_backoff: float | None = None
+    ):
+
+        # The API key is only required once a client is built
+        self.token = token or settings.require("EOD_APIKEY", "API key")
+        self.max_retries = settings.get_int("EOD_MAX_RETRIES", 4) if max_retries is None else max_retries
+        self.backoff = settings.get_float("EOD_BACKOFF_SECONDS", 1) if backoff is None else backoff
+        self.max_backoff = settings.get_float("EOD_MAX_BACKOFF_SECONDS", 60) if max_backoff is None else max_backoff
+        pool_size = pool_size or settings.get_int("EOD_POOL_SIZE", 16)
+
+        # requests is imported with the first client, not at job startup
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate", "Accept": "application/json"})
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "seconds": 0.0,
+            "max_seconds": 0.0,
+            "wire_bytes": 0,
+            "bytes": 0
+        }
+
+    # -------------------------------------
+    # Counters
+    # -------------------------------------
+
+    def _count(self, seconds: float, response: "requests.Response | None" = None, retried: bool = False, failed: bool = False):
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["retries"] += retried
+            self._stats["failures"] += failed
+            self._stats["seconds"] += seconds
+            self._stats["max_seconds"] = max(self._stats["max_seconds"], seconds)
+
+            if response is not None:
+                size = len(response.content)
+                self._stats["bytes"] += size
+                self._stats["wire_bytes"] += int(response.headers.get("Content-Length", size))
+
+        outcome = "failed" if failed else "retried" if retried else "ok"
+        metrics.observe("etl_http_request_seconds", seconds, outcome=outcome)
+
+        if response is not None:
+            metrics.observe("etl_http_response_bytes", len(response.content), buckets=metrics.SIZE_BUCKETS)
+
+    def stats(self) -> dict:
+
+        """
+        Snapshot of request counters
+
+        :return: Requests, retries, failures, latency seconds and bytes
+        :rtype: dict
+        """
+
+        with self._lock:
+            snapshot = dict(self._stats)
+
+        completed = snapshot["requests"]
+        snapshot["avg_seconds"] = snapshot["seconds"] / completed if completed else 0.0
+
+        return snapshot
+
+    # -------------------------------------
+    # Backoff
+    # -------------------------------------
+
+    def _delay(self, attempt: int, response: "requests.Response | None") -> float:
+
+        """
+        Seconds to wait before a retry, Retry-After when given
+        """
+
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+
+        if retry_after:
+            try:
+                delay = float(retry_after)
+
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    delay = self.backoff * 2 ** attempt
+
+        else:
+            delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+
+        return min(max(delay, 0.0), self.max_backoff)
+
+    # -------------------------------------
+    # GET JSON
+    # -------------------------------------
+
+    def _redact(self, error: Exception) -> str:
+
+        """
+        Error text without the api token from the request URL
+        """
+
+        return re.sub(r"api_token=[^&\s]+", "api_token=***", str(error))
+
+    def get_json(self, url: str, params: dict, timeout: float, label: str):
+
+        """
+        GET a JSON payload with retries
 
-    params = {
-        "api_token": api_key,
-        "symbols": joined_symbols,
-        "fmt": "json"
-    }
+        :param url: Endpoint URL
+        :type url: str
+        :param params: Query parameters, api token added
+        :type params: dict
+        :param timeout: Per-attempt timeout in seconds
+        :type timeout: float
+        :param label: Name for error messages eg symbol
+        :type label: str
+        :return: Decoded JSON
+        """
 
-    try:
-        response = requests.get(eod_url, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
+        from requests import exceptions
 
-    except requests.exceptions.RequestException as e:
-        raise APIError(f"HTTP error fetching bulk data: {e}") from e
-    except ValueError as e:
-        raise APIError("Invalid JSON returned from API") from e
+        params = {"api_token": self.token, "fmt": "json", **params}
 
-    if not isinstance(data, list) or not data:
-        raise ValidationError("Unexpected or empty API payload")
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            response = None
 
-    return data
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+                error = None
+
+            except (exceptions.ConnectionError, exceptions.Timeout) as e:
+                error = e
+
+            retryable = error is not None or response.status_code in RETRY_STATUS
+            last_attempt = attempt == self.max_retries
+
+            self._count(
+                time.perf_counter() - start,
+                response,
+                retried=retryable and not last_attempt,
+                failed=retryable and last_attempt
+            )
+
+            if not retryable or last_attempt:
+                break
+
+            delay = self._delay(attempt, response)
+            print(f"[WARN] {label}: {error or response.status_code}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+        if error is not None:
+            raise APIError(f"HTTP error for {label}: {self._redact(error)}") from error
+
+        try:
+            response.raise_for_status()
+            return response.json()
+
+        except exceptions.RequestException as e:
+            raise APIError(f"HTTP error for {label}: {self._redact(e)}") from e
+        except ValueError as e:
+            raise APIError(f"Invalid json returned for {label}") from e
+
+    # -------------------------------------
+    # Fetch incremental data
+    # -------------------------------------
+
+    def fetch_incremental(self, symbols: list[str]) -> list[dict]:
+
+        """
+        Fetch incremental EOD data from EODHD
+        
+        :param symbols: List of symbols retrieved from config
+        :type symbols: list[str]
+        :return: EODHD Bulk json
+        :rtype: list[dict]
+        """
+
+        data = self.get_json(eod_url, {"symbols": ",".join(symbols)}, timeout=30, label="bulk data")
+
+        if not isinstance(data, list) or not data:
+            raise ValidationError("Unexpected or empty API payload")
+
+        return data
+
+    # -------------------------------------
+    # Fetch historical data
+    # -------------------------------------
+
+    def fetch_historical(self, symbol: str, from_date: date | None = None, to_date: date | None = None) -> list[dict]:
+
+        """
+        Fetch historical EOD data from EODHD
+        
+        :param symbol: Individual symbol for EOD data
+        :type symbol: str
+        :param from_date: First trade date to fetch, full history if None
+        :type from_date: date | None
+        :param to_date: Last trade date to fetch, latest if None
+        :type to_date: date | None
+        :return: Historical EOD data for symbol, may be empty for a delta
+        :rtype: list[dict]
+        """
+
+        params = {}
+
+        if from_date is not None:
+            params["from"] = from_date.isoformat()
+        if to_date is not None:
+            params["to"] = to_date.isoformat()
+
+        data = self.get_json(f"https://eodhd.com/api/eod/{symbol}.US", params, timeout=15, label=symbol)
+
+        if not isinstance(data, list):
+            raise ValidationError(f"Unexpected payload structure for {symbol}")
+        if not data and from_date is None:
+            raise ValidationError(f"No data returned for {symbol}")
+
+        return data
 
 # -------------------------------------
-# Fetch historical data
+# Shared client
 # -------------------------------------
 
-def fetch_historical(symbol: str) -> list[dict]:
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> EODClient:
+
+    """
+    Process-wide EODHD client, created on first use
+    """
+
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = EODClient()
+
+    return _client
+
+def fetch_incremental(symbols: list[str]) -> list[dict]:
+
+    """
+    Fetch incremental EOD data with the shared client
+    """
+
+    return get_client().fetch_incremental(symbols)
+
+def fetch_historical(symbol: str, from_date: date | None = None, to_date: date | None = None) -> list[dict]:
 
     """
-    Fetch historical EOD data from EODHD
-    
-    :param symbol: Individual symbol for EOD data
-    :type symbol: str
-    :return: Historical EOD data for symbol
-    :rtype: list[dict]
+    Fetch historical EOD data with the shared client
     """
 
-    url = f"https://eodhd.com/api/eod/{symbol}.US"
-
-    params = {
-        "api_token": api_key,
-        "fmt": "json"
-    }
-
-    try:
-        response = requests.get(url, params=params, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-
-    except requests.exceptions.RequestException as e:
-        raise APIError(f"HTTP error for {symbol}: {e}") from e
-    except ValueError as e:
-        raise APIError(f"Invalid json returned for {symbol}") from e
-
-    if not isinstance(data, list):
-        raise ValidationError(f"Unexpected payload structure for {symbol}")
-    if not data:
-        raise ValidationError(f"No data returned for {symbol}")
-    
-    return data
\ No newline at end of file
+    return get_client().fetch_historical(symbol, from_date, to_date)
@@ -3,9 +3,11 @@ Cron: incremental curated
 """
 
 from src.load_curated.curated_incremental import load_curated_incremental
+from src.utils import metrics
 
 def main():
-    load_curated_incremental()
+    with metrics.job_run("curated_incremental"):
+        load_curated_incremental()
 
 if __name__ == "__main__":
     main()
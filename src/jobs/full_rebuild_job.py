@@ -0,0 +1,39 @@
+"""
+Manual: rebuild staging and curated from scratch into shadow tables,
+indexed after the load and swapped in. REBUILD_TABLES picks the
+tables, curated or both (default). Staging is never rebuilt alone,
+it queues no restated candles, so curated and the mart would keep
+the old values. Writers wait for the rebuild, pause the pipeline
+cron while it runs.
+"""
+
+import os
+from src.load_staging.staging_historical import rebuild_staging_historical
+from src.load_curated.curated_bulk import rebuild_curated_bulk
+from src.load_mart.mart_perf_current import load_mart_perf_current
+from src.utils import metrics, settings
+from src.utils.custom_exceptions import *
+
+REBUILDS = ("staging", "curated")
+
+def main():
+    tables = [table.strip() for table in settings.get("REBUILD_TABLES", ",".join(REBUILDS)).split(",") if table.strip()]
+
+    if set(tables) - set(REBUILDS):
+        raise ConfigError(f"REBUILD_TABLES must be among {', '.join(REBUILDS)}")
+
+    if "staging" in tables and "curated" not in tables:
+        raise ConfigError("REBUILD_TABLES=staging needs curated too, a staging rebuild does not queue changed candles for curated")
+
+    with metrics.job_run("full_rebuild"):
+        if "staging" in tables:
+            rebuild_staging_historical(workers=settings.get_int("STAGING_WORKERS", os.cpu_count() or 1))
+
+        # Restated candles are not queued by a rebuild, curated and
+        # the mart are recomputed from the rebuilt staging instead
+        if "curated" in tables:
+            rebuild_curated_bulk()
+            load_mart_perf_current(force=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Cron: find sessions missing from staging, re-fetch and load them
+"""
+
+from datetime import date, timedelta
+from src.load_raw.s3.write_historical_s3 import get_gap_data
+from src.load_staging.staging_historical import load_staging_deltas
+from src.load_staging.presence_index import find_gaps
+from src.utils import metrics, settings
+
+def main():
+    with metrics.job_run("gap_refill"):
+        # Sessions checked back from today, 0 checks the whole history
+        lookback = settings.get_int("GAP_LOOKBACK_DAYS", 30)
+        start = date.today() - timedelta(days=lookback) if lookback else None
+
+        gaps = find_gaps(start=start)
+
+        if not gaps:
+            return
+
+        written = get_gap_data(gaps)["written"]
+
+        if written:
+            load_staging_deltas(keys=written)
+
+        remaining = find_gaps(list(gaps), start=start)
+
+        for symbol, days in remaining.items():
+            print(f"[WARN] {symbol}: {len(days)} sessions still missing, first {days[0]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+Manual: re-sync symbols after missed days, EOD deltas → S3 → staging
+"""
+
+from src.load_raw.s3.write_historical_s3 import get_historical_data
+from src.load_staging.staging_historical import load_staging_deltas
+from src.utils import metrics
+
+def main():
+    with metrics.job_run("historical_delta"):
+        get_historical_data(delta=True)
+        load_staging_deltas()
+
+if __name__ == "__main__":
+    main()
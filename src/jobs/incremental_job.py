@@ -3,9 +3,11 @@ Cron: incremental EOD → S3
 """
 
 from src.load_raw.s3.write_incremental_s3 import get_incremental_data
+from src.utils import metrics
 
 def main():
-    get_incremental_data()
+    with metrics.job_run("incremental"):
+        get_incremental_data()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,13 @@
+"""
+Cron: mart performance snapshot
+"""
+
+from src.load_mart.mart_perf_current import load_mart_perf_current
+from src.utils import metrics
+
+def main():
+    with metrics.job_run("mart"):
+        load_mart_perf_current()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Cron: create next year's partitions ahead of time
+"""
+
+from src.utils.partitions import ensure_future_partitions
+from src.utils import metrics
+
+def main():
+    with metrics.job_run("partition"):
+        ensure_future_partitions()
+
+if __name__ == "__main__":
+    main()
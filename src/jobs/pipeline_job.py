@@ -0,0 +1,33 @@
+"""
+Cron: nightly pipeline raw → staging → curated → mart
+Replaces scheduling incremental_job, staging_incremental_job and
+curated_incremental_job at fixed gaps. Rerun with the same
+PIPELINE_RUN_ID to resume a failed night from the failed stage.
+"""
+
+from src.utils.orchestrator import Stage, run_pipeline
+from src.utils import metrics
+
+# --------------------------------------------------
+# Stages
+# --------------------------------------------------
+
+# The stock list refresh runs alongside the price loads, curated
+# waits for both
+
+STAGES = [
+    Stage("partitions", "src.utils.partitions:ensure_future_partitions"),
+    Stage("raw_prices", "src.load_raw.s3.write_incremental_s3:get_incremental_data"),
+    Stage("raw_stock_list", "src.load_raw.s3.write_stock_list_s3:write_symbol_data_to_s3"),
+    Stage("staging_prices", "src.load_staging.staging_incremental:load_staging_incremental", after=("partitions", "raw_prices")),
+    Stage("staging_stock_meta", "src.load_staging.staging_stock_meta:load_stock_meta", after=("raw_stock_list",)),
+    Stage("curated", "src.load_curated.curated_incremental:load_curated_incremental", after=("staging_prices", "staging_stock_meta")),
+    Stage("mart", "src.load_mart.mart_perf_current:load_mart_perf_current", after=("curated",)),
+]
+
+def main():
+    with metrics.job_run("pipeline"):
+        run_pipeline(STAGES)
+
+if __name__ == "__main__":
+    main()
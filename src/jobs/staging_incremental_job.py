@@ -3,9 +3,11 @@ Cron: incremental staging
 """
 
 from src.load_staging.staging_incremental import load_staging_incremental
+from src.utils import metrics
 
 def main():
-    load_staging_incremental()
+    with metrics.job_run("staging_incremental"):
+        load_staging_incremental()
 
 if __name__ == "__main__":
     main()
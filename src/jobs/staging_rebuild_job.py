@@ -0,0 +1,15 @@
+"""
+Manual: rebuild staging historical from raw across all cores
+Reloads every raw object, ignoring checkpoints and the manifest
+"""
+
+import os
+from src.load_staging.staging_historical import load_staging_historical
+from src.utils import metrics, settings
+
+def main():
+    with metrics.job_run("staging_rebuild"):
+        load_staging_historical(workers=settings.get_int("STAGING_WORKERS", os.cpu_count() or 1), resume=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+Bulk load curated facts with surrogate keys resolved in-process
+Dimensions are read once into dict lookups, staging is streamed
+out with COPY and facts are COPYed back in with keys resolved
+"""
+
+from dataclasses import dataclass, field
+from datetime import date
+from src.utils.db import *
+from src.utils.custom_exceptions import *
+from src.utils.watermark import get_watermark, advance_watermark
+from src.utils.partitions import ensure_partitions, shadow_table
+from src.utils.rebuild import rebuild
+from src.utils import metrics, settings
+from src.load_curated.curated_incremental import STAGE, SEED_WATERMARK
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+# Read on use: CURATED_CHUNK_ROWS staging rows resolved per COPY (50000)
+
+TABLE = "curated.fact_stock_prices"
+
+# --------------------------------------------------
+# Columns
+# --------------------------------------------------
+
+COLUMNS = [
+    "symbol_sk",
+    "trade_date_sk",
+    "trade_date",
+    "open",
+    "high",
+    "low",
+    "close",
+    "adjusted_close",
+    "volume"
+]
+
+# --------------------------------------------------
+# SQL
+# --------------------------------------------------
+
+# Latest key per symbol, a re-listed symbol gets a new cik row
+
+SELECT_SYMBOL_KEYS = """
+SELECT symbol, MAX(stock_meta_sk)
+FROM curated.dim_stock_meta
+WHERE %(symbols)s::TEXT[] IS NULL
+   OR symbol = ANY(%(symbols)s::TEXT[])
+GROUP BY symbol;
+"""
+
+# Dates keyed by their COPY text form
+
+SELECT_DATE_KEYS = """
+SELECT date::TEXT, date_sk
+FROM curated.dim_trade_date
+WHERE %(dates)s::DATE[] IS NULL
+   OR date = ANY(%(dates)s::DATE[]);
+"""
+
+INSERT_SYMBOLS = """
+INSERT INTO curated.dim_stock_meta (
+    symbol,
+    name,
+    sector,
+    sub_industry,
+    cik,
+    domain
+)
+
+SELECT DISTINCT
+    sm.symbol,
+    sm.name,
+    sm.sector,
+    sm.sub_industry,
+    sm.cik,
+    sm.domain
+
+FROM staging.stocks_meta sm
+WHERE sm.symbol = ANY(%(symbols)s::TEXT[])
+ON CONFLICT (symbol, cik) DO NOTHING;
+"""
+
+INSERT_DATES = """
+INSERT INTO curated.dim_trade_date (
+    date,
+    day,
+    month,
+    year,
+    day_of_week
+)
+
+SELECT
+    td.trade_date,
+    EXTRACT(day FROM td.trade_date),
+    EXTRACT(month FROM td.trade_date),
+    EXTRACT(year FROM td.trade_date),
+    EXTRACT(ISODOW FROM td.trade_date)::INT
+
+FROM unnest(%(dates)s::DATE[]) as td(trade_date)
+ON CONFLICT (date) DO NOTHING;
+"""
+
+# Symbol and date first, measures are passed through as text
+
+COPY_STAGING = """
+COPY (
+    SELECT
+        symbol,
+        trade_date,
+        open,
+        high,
+        low,
+        close,
+        adjusted_close,
+        volume
+    FROM staging.stocks
+    WHERE trade_date > COALESCE(%(watermark)s::DATE, '-infinity'::DATE)
+) TO STDOUT;
+"""
+
+CREATE_TEMP = """
+CREATE TEMP TABLE curated_fact_load (
+    symbol_sk       BIGINT NOT NULL,
+    trade_date_sk   BIGINT NOT NULL,
+    trade_date      DATE NOT NULL,
+    open            NUMERIC(12,4) NOT NULL,
+    high            NUMERIC(12,4) NOT NULL,
+    low             NUMERIC(12,4) NOT NULL,
+    close           NUMERIC(12,4) NOT NULL,
+    adjusted_close  NUMERIC(12,4) NOT NULL,
+    volume          BIGINT NOT NULL
+)
+ON COMMIT DROP;
+"""
+
+COPY = f"""
+COPY curated_fact_load ({", ".join(COLUMNS)})
+FROM STDIN;
+"""
+
+MERGE = f"""
+INSERT INTO curated.fact_stock_prices ({", ".join(COLUMNS)})
+SELECT {", ".join(COLUMNS)}
+FROM curated_fact_load
+ON CONFLICT ON CONSTRAINT fact_stock_grain DO NOTHING;
+"""
+
+# Rebuild: staging is unique per symbol and trade date, so are the
+# facts, the shadow has no constraint to conflict on yet
+
+MERGE_REBUILD = f"""
+INSERT INTO {shadow_table(TABLE)} ({", ".join(COLUMNS)})
+SELECT {", ".join(COLUMNS)}
+FROM curated_fact_load;
+"""
+
+# --------------------------------------------------
+# Surrogate key cache
+# --------------------------------------------------
+
+@dataclass
+class KeyCache:
+
+    """
+    In-process lookups of dimension surrogate keys,
+    dates keyed by ISO text as read from COPY
+    """
+
+    symbols: dict[str, int] = field(default_factory=dict)
+    dates: dict[str, int] = field(default_factory=dict)
+
+    def refresh(self, conn, symbols: list[str] | None = None, dates: list[str] | None = None):
+
+        """
+        Read dimension keys into the cache, all keys when not filtered
+
+        :param conn: Open connection
+        :param symbols: Symbols to refresh, None for every symbol
+        :type symbols: list[str] | None
+        :param dates: ISO dates to refresh, None for every date
+        :type dates: list[str] | None
+        """
+
+        if symbols is None or symbols:
+            self.symbols.update(fetch_all(SELECT_SYMBOL_KEYS, {"symbols": symbols}, conn=conn))
+
+        if dates is None or dates:
+            self.dates.update(fetch_all(SELECT_DATE_KEYS, {"dates": dates}, conn=conn))
+
+    def ensure(self, conn, symbols: set[str], dates: set[str]):
+
+        """
+        Create missing dimension rows in bulk and cache their keys
+
+        Symbols are created from staging.stocks_meta, a symbol
+        without metadata stays unresolved.
+
+        :param conn: Open connection, inside the load transaction
+        :param symbols: Symbols referenced by the chunk
+        :type symbols: set[str]
+        :param dates: ISO trade dates referenced by the chunk
+        :type dates: set[str]
+        """
+
+        missing_symbols = sorted(symbols - self.symbols.keys())
+        missing_dates = sorted(dates - self.dates.keys())
+
+        if missing_symbols:
+            execute(INSERT_SYMBOLS, {"symbols": missing_symbols}, conn=conn)
+
+        if missing_dates:
+            execute(INSERT_DATES, {"dates": missing_dates}, conn=conn)
+
+        self.refresh(conn, missing_symbols, missing_dates)
+
+# --------------------------------------------------
+# COPY resolved facts
+# --------------------------------------------------
+
+def copy_facts(conn, cache: KeyCache, rows: list[list[str]]) -> int:
+
+    """
+    Swap symbol and date for surrogate keys and COPY into the temp table
+
+    :param conn: Open connection, temp table created
+    :param cache: Dimension key cache, chunk keys ensured
+    :type cache: KeyCache
+    :param rows: Staging COPY lines split as [symbol, date, measures]
+    :type rows: list[list[str]]
+    :return: Rows copied, rows without a symbol key are dropped
+    :rtype: int
+    """
+
+    symbol_keys = cache.symbols
+    date_keys = cache.dates
+
+    lines = [
+        f"{symbol_keys[symbol]}\t{date_keys[trade_date]}\t{trade_date}\t{measures}"
+        for symbol, trade_date, measures in rows
+        if symbol in symbol_keys
+    ]
+
+    if lines:
+        with conn.cursor() as cur, metrics.timer("etl_db_copy", table="curated_fact_load"):
+            with cur.copy(COPY) as copy:
+                copy.write("".join(lines))
+
+    return len(lines)
+
+# --------------------------------------------------
+# Load curated
+# --------------------------------------------------
+
+@metrics.stage("curated_bulk")
+def load_curated_bulk(full: bool = False, chunk_rows: int | None = None, shadow: bool = False) -> dict:
+
+    """
+    Load staging into curated with cached surrogate keys and COPY
+
+    Used for full rebuilds and for catching up many days at once.
+    Reads staging rows after the curated watermark, or all of
+    staging when full, and advances the watermark in the same
+    transaction. Candles staging queued behind the watermark are
+    left in etl.restated_candles for the incremental load. Staging
+    is streamed on a second connection while the load connection
+    resolves and writes each chunk.
+
+    :param full: Reload all of staging, existing facts are kept
+    :type full: bool
+    :param chunk_rows: Staging rows resolved per COPY, defaults to CURATED_CHUNK_ROWS
+    :type chunk_rows: int | None
+    :param shadow: Insert into the shadow of a full rebuild, the
+        watermark is then advanced by the swap
+    :type shadow: bool
+    :return: Facts inserted, rows without a symbol key and the
+        latest trade date read
+    :rtype: dict
+    """
+
+    chunk_rows = chunk_rows or settings.get_int("CURATED_CHUNK_ROWS", 50000)
+
+    try:
+
+        with transaction() as conn, transaction() as reader:
+
+            watermark = None
+
+            if not full:
+                watermark = get_watermark(conn, STAGE)
+
+                if watermark is None:
+                    watermark = fetch_all(SEED_WATERMARK, conn=conn)[0][0]
+
+            target = shadow_table(TABLE) if shadow else TABLE
+
+            cache = KeyCache()
+            cache.refresh(conn)
+
+            execute(CREATE_TEMP, conn=conn)
+
+            read = 0
+            copied = 0
+            high_water_date = None
+
+            def flush(rows):
+                nonlocal read, copied, high_water_date
+
+                dates = {row[1] for row in rows}
+                cache.ensure(conn, {row[0] for row in rows}, dates)
+                ensure_partitions(conn, target, {trade_date[:4] for trade_date in dates})
+
+                copied += copy_facts(conn, cache, rows)
+                read += len(rows)
+
+                # ISO dates order as text
+                high_water_date = max(high_water_date or "", max(dates))
+
+            with reader.cursor() as cur:
+                with cur.copy(COPY_STAGING, {"watermark": watermark}) as staging:
+                    rows = []
+
+                    for line in staging:
+                        rows.append(bytes(line).decode().split("\t", 2))
+
+                        if len(rows) >= chunk_rows:
+                            flush(rows)
+                            rows = []
+
+                    if rows:
+                        flush(rows)
+
+            facts = execute_with_rowcount(MERGE_REBUILD if shadow else MERGE, conn=conn)
+
+            if high_water_date is not None:
+                high_water_date = date.fromisoformat(high_water_date)
+
+                if not shadow:
+                    advance_watermark(conn, STAGE, high_water_date)
+
+        if read > copied:
+            print(f"[WARN] {read - copied} staging rows without curated stock meta")
+
+        print(f"[INSERTED] {facts} into {target} bulk load")
+
+        metrics.rows("curated_bulk", read)
+
+        return {"facts": facts, "unresolved": read - copied, "high_water_date": high_water_date}
+
+    except SQLError as e:
+
+        raise RuntimeError(f"[REJECTED] curated bulk load: {e}")
+
+# --------------------------------------------------
+# Rebuild curated
+# --------------------------------------------------
+
+def rebuild_curated_bulk(chunk_rows: int | None = None, keep_old: bool | None = None) -> dict:
+
+    """
+    Rebuild curated.fact_stock_prices from all of staging into a
+    fresh shadow table, indexed after the load and swapped in, see
+    src/utils/rebuild.py. The curated watermark commits with the swap.
+
+    :param chunk_rows: Staging rows resolved per COPY, defaults to CURATED_CHUNK_ROWS
+    :type chunk_rows: int | None
+    :param keep_old: Keep the replaced table as curated.fact_stock_prices_old,
+        defaults to REBUILD_KEEP_OLD
+    :type keep_old: bool | None
+    :return: Facts inserted, rows without a symbol key and the
+        latest trade date read
+    :rtype: dict
+    """
+
+    def on_swap(conn, result: dict):
+        if result["high_water_date"] is not None:
+            advance_watermark(conn, STAGE, result["high_water_date"])
+
+    return rebuild(TABLE, lambda: load_curated_bulk(full=True, chunk_rows=chunk_rows, shadow=True), on_swap=on_swap, keep_old=keep_old)
+
+# --------------------------------------------------
+# Entry point
+# --------------------------------------------------
+
+def main():
+    load_curated_bulk(full=True)
+
+if __name__ == "__main__":
+    main()
@@ -51,11 +51,14 @@ ON CONFLICT (date) DO NOTHING;
 -- =========================================================
 -- Fact Stock Price
 -- =========================================================
+-- Yearly partitions must exist for every staging year,
+-- see src/utils/partitions.py
 -- EXPLAIN - Testing efficiency of query
 
 INSERT INTO curated.fact_stock_prices (
     symbol_sk,
     trade_date_sk,
+    trade_date,
     open,
     high,
     low,
@@ -67,6 +70,7 @@ INSERT INTO curated.fact_stock_prices (
 SELECT
     sm.stock_meta_sk,
     td.date_sk,
+    sp.trade_date,
     sp.open,
     sp.high,
     sp.low,
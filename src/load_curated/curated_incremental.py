@@ -4,11 +4,91 @@ Extract and load incremental data from staging into curated
 
 from src.utils.db import *
 from src.utils.custom_exceptions import *
+from src.utils.watermark import ALL_SYMBOLS, get_watermark, advance_watermark, advance_symbol_watermarks
+from src.utils.partitions import ensure_partitions
+from src.utils import metrics
+
+# --------------------------------------------------
+# Watermark stage
+# --------------------------------------------------
+
+STAGE = "curated"
 
 # --------------------------------------------------
 # SQL
 # --------------------------------------------------
 
+CREATE_DELTA = """
+CREATE TEMP TABLE curated_delta
+(LIKE staging.stocks)
+ON COMMIT DROP;
+"""
+
+# Staging rows after the stage-wide watermark
+
+INSERT_DELTA = """
+INSERT INTO curated_delta
+SELECT sp.*
+FROM staging.stocks as sp
+WHERE sp.trade_date > COALESCE(%(watermark)s::DATE, '-infinity'::DATE);
+"""
+
+# Staging rows after each symbol's own watermark,
+# symbols without a watermark load in full
+
+INSERT_DELTA_PER_SYMBOL = """
+INSERT INTO curated_delta
+SELECT sp.*
+FROM (SELECT DISTINCT symbol FROM curated.dim_stock_meta) as sm
+LEFT JOIN etl.load_watermark as w
+    ON w.stage = %(stage)s
+    AND w.symbol = sm.symbol
+JOIN LATERAL (
+    SELECT *
+    FROM staging.stocks as s
+    WHERE s.symbol = sm.symbol
+      AND s.trade_date > COALESCE(w.high_water_date, '-infinity'::DATE)
+) as sp ON TRUE;
+"""
+
+# Restated staging candles, and new ones behind the watermark,
+# consumed from the queue in the same transaction that applies them.
+# Candles of symbols not yet in dim_stock_meta cannot be merged and
+# stay queued until the symbol is added.
+
+CONSUME_RESTATED = """
+WITH consumed AS (
+    DELETE FROM etl.restated_candles as r
+    WHERE r.stage = 'curated'
+      AND EXISTS (
+          SELECT 1
+          FROM curated.dim_stock_meta as sm
+          WHERE sm.symbol = r.symbol
+      )
+    RETURNING r.symbol, r.trade_date
+)
+
+INSERT INTO curated_delta
+SELECT sp.*
+FROM consumed as r
+JOIN staging.stocks as sp
+    ON sp.symbol = r.symbol
+    AND sp.trade_date = r.trade_date
+WHERE NOT EXISTS (
+    SELECT 1
+    FROM curated_delta as d
+    WHERE d.symbol = r.symbol
+      AND d.trade_date = r.trade_date
+);
+"""
+
+# First run without a watermark, seed from curated
+
+SEED_WATERMARK = """
+SELECT MAX(trade_date)
+FROM curated.fact_stock_prices;
+"""
+
 INSERT_DATES = """
 INSERT INTO curated.dim_trade_date (
     date,
@@ -18,80 +98,189 @@ INSERT INTO curated.dim_trade_date (
     day_of_week
 )
 
-SELECT DISTINCT 
+SELECT DISTINCT
     td.trade_date,
     EXTRACT(day FROM td.trade_date),
     EXTRACT(month FROM td.trade_date),
     EXTRACT(year FROM td.trade_date),
     EXTRACT(ISODOW FROM td.trade_date)::INT
 
-FROM staging.stocks td
+FROM curated_delta td
 ON CONFLICT (date) DO NOTHING;
 """
 
+# Existing facts are updated only when row_hash differs,
+# updated facts are queued for a mart recompute, with new facts at
+# or behind the mart watermark. As in the staging merge, facts found
+# in the pre-merge snapshot were updated.
+
 INSERT = """
-INSERT INTO curated.fact_stock_prices (
-    symbol_sk,
-    trade_date_sk,
-    open,
-    high,
-    low,
-    close,
-    adjusted_close,
-    volume
+WITH merged AS (
+    INSERT INTO curated.fact_stock_prices (
+        symbol_sk,
+        trade_date_sk,
+        trade_date,
+        open,
+        high,
+        low,
+        close,
+        adjusted_close,
+        volume
+    )
+
+    SELECT
+        sm.stock_meta_sk,
+        td.date_sk,
+        sp.trade_date,
+        sp.open,
+        sp.high,
+        sp.low,
+        sp.close,
+        sp.adjusted_close,
+        sp.volume
+    FROM curated_delta as sp
+    JOIN curated.dim_stock_meta as sm
+        ON sp.symbol = sm.symbol
+    JOIN curated.dim_trade_date as td
+        ON sp.trade_date = td.date
+
+    ON CONFLICT ON CONSTRAINT fact_stock_grain DO UPDATE
+    SET open = EXCLUDED.open,
+        high = EXCLUDED.high,
+        low = EXCLUDED.low,
+        close = EXCLUDED.close,
+        adjusted_close = EXCLUDED.adjusted_close,
+        volume = EXCLUDED.volume
+    WHERE curated.fact_stock_prices.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+    RETURNING symbol_sk, trade_date
+),
+
+classified AS (
+    SELECT
+        m.symbol_sk,
+        m.trade_date,
+        NOT EXISTS (
+            SELECT 1
+            FROM curated.fact_stock_prices as f
+            WHERE f.symbol_sk = m.symbol_sk
+              AND f.trade_date = m.trade_date
+        ) as inserted
+    FROM merged as m
+),
+
+restated AS (
+    INSERT INTO etl.restated_candles (stage, symbol, trade_date)
+    SELECT DISTINCT 'mart', sm.symbol, c.trade_date
+    FROM classified as c
+    JOIN curated.dim_stock_meta as sm
+        ON sm.stock_meta_sk = c.symbol_sk
+    LEFT JOIN etl.load_watermark as w
+        ON w.stage = 'mart'
+       AND w.symbol = '*'
+    WHERE NOT c.inserted
+       OR c.trade_date <= w.high_water_date
+    ON CONFLICT (stage, symbol, trade_date) DO UPDATE
+    SET restated_at = now()
 )
 
 SELECT
-    sm.stock_meta_sk,
-    td.date_sk,
-    sp.open,
-    sp.high,
-    sp.low,
-    sp.close,
-    sp.adjusted_close,
-    sp.volume
-FROM staging.stocks as sp
-JOIN curated.dim_stock_meta as sm
-    ON sp.symbol = sm.symbol
-JOIN curated.dim_trade_date as td
-    ON sp.trade_date = td.date
-WHERE sp.trade_date > 
-    (
-        SELECT MAX(td2.date)
-        FROM curated.fact_stock_prices as sp2
-        JOIN curated.dim_trade_date as td2
-        ON sp2.trade_date_sk = td2.date_sk
-    )
+    COUNT(*) FILTER (WHERE inserted),
+    COUNT(*) FILTER (WHERE NOT inserted)
+FROM classified;
+"""
 
-ON CONFLICT ON CONSTRAINT fact_stock_grain DO NOTHING
-RETURNING 1;
+DELTA_YEARS = """
+SELECT DISTINCT EXTRACT(year FROM trade_date)::INT
+FROM curated_delta;
+"""
+
+HIGH_WATER = """
+SELECT MAX(trade_date)
+FROM curated_delta;
+"""
+
+HIGH_WATER_PER_SYMBOL = """
+SELECT symbol, MAX(trade_date)
+FROM curated_delta
+GROUP BY symbol;
 """
 
 # --------------------------------------------------
-# Load curated 
+# Load curated
 # --------------------------------------------------
 
-def load_curated_incremental():
+@metrics.stage("curated_incremental")
+def load_curated_incremental(per_symbol: bool = False) -> dict:
 
     """
     Execute SQL to extract incremental data from staging
     and load into curated
+
+    Only staging rows after the curated watermark are read, plus
+    candles staging queued as restated, which update their facts, or
+    inserted behind the watermark (backfills, refilled gaps).
+    The watermark is advanced in the same transaction as the load.
+
+    :param per_symbol: Track a watermark per symbol instead of stage-wide
+    :type per_symbol: bool
+    :return: Dates and facts inserted, facts updated
+    :rtype: dict
     """
 
     try:
 
-        dates = execute_with_rowcount(INSERT_DATES)
+        with transaction() as conn:
+
+            execute(CREATE_DELTA, conn=conn)
+
+            if per_symbol:
+                execute(INSERT_DELTA_PER_SYMBOL, {"stage": STAGE}, conn=conn)
+
+            else:
+                watermark = get_watermark(conn, STAGE)
 
-        data = execute_with_rowcount(INSERT)
+                if watermark is None:
+                    watermark = fetch_all(SEED_WATERMARK, conn=conn)[0][0]
+
+                execute(INSERT_DELTA, {"watermark": watermark}, conn=conn)
+
+            # High water of new rows, before restated rows join the delta
+            if per_symbol:
+                high_water_dates = dict(fetch_all(HIGH_WATER_PER_SYMBOL, conn=conn))
+            else:
+                high_water_date = fetch_all(HIGH_WATER, conn=conn)[0][0]
+
+            execute(CONSUME_RESTATED, conn=conn)
+
+            dates = execute_with_rowcount(INSERT_DATES, conn=conn)
+
+            years = [row[0] for row in fetch_all(DELTA_YEARS, conn=conn)]
+            ensure_partitions(conn, "curated.fact_stock_prices", years)
+
+            data, updated = fetch_all(INSERT, conn=conn)[0]
+
+            if per_symbol:
+                advance_symbol_watermarks(conn, STAGE, high_water_dates)
+
+            elif high_water_date is not None:
+                advance_watermark(conn, STAGE, high_water_date, symbol=ALL_SYMBOLS)
 
         print(f"[INSERTED] {dates} into curated dim dates incremental data")
 
         print(f"[INSERTED] {data} into curated fact stock price incremental data")
 
+        if updated:
+            print(f"[OK] {updated} restated curated facts updated, queued for mart")
+
+        metrics.rows("curated_incremental", data + updated)
+        metrics.count("etl_restated_total", updated, stage="curated")
+
+        return {"dates": dates, "facts": data, "updated": updated}
+
     except SQLError as e:
 
         raise RuntimeError(f"[REJECTED] curated incremental load: {e}")
-    
+
 # --------------------------------------------------
 # Entry point
 # --------------------------------------------------
@@ -100,4 +289,4 @@ def main():
     load_curated_incremental()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,284 @@
+"""
+Refresh mart.stock_perf_current from curated
+Reads each symbol's last 181 candles, returns computed in NumPy
+"""
+
+import numpy as np
+from src.utils.db import *
+from src.utils.custom_exceptions import *
+from src.utils.watermark import get_watermark, advance_watermark
+from src.utils import metrics
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+STAGE = "mart"
+
+PERIODS = (30, 60, 90, 180)
+
+# Latest close plus the 180 trading days before it
+WINDOW = max(PERIODS) + 1
+
+# --------------------------------------------------
+# SQL
+# --------------------------------------------------
+
+LATEST_DATES = """
+SELECT date
+FROM curated.dim_trade_date
+ORDER BY date DESC
+LIMIT %(window)s;
+"""
+
+# Each symbol's own last candles, as LAG(close, N) over its history,
+# so missing sessions reach further back. Symbols without a candle
+# in the latest window dates (delisted) are left out.
+
+WINDOW_PRICES = """
+SELECT
+    sm.stock_meta_sk,
+    f.trade_date,
+    f.close::FLOAT8
+FROM curated.dim_stock_meta as sm
+JOIN LATERAL (
+    SELECT trade_date, close
+    FROM curated.fact_stock_prices
+    WHERE symbol_sk = sm.stock_meta_sk
+    ORDER BY trade_date DESC
+    LIMIT %(window)s
+) as f ON TRUE
+WHERE (%(symbol_sks)s::BIGINT[] IS NULL OR sm.stock_meta_sk = ANY(%(symbol_sks)s))
+  AND EXISTS (
+      SELECT 1
+      FROM curated.fact_stock_prices as recent
+      WHERE recent.symbol_sk = sm.stock_meta_sk
+        AND recent.trade_date >= %(window_start)s
+  );
+"""
+
+# Facts curated updated or inserted behind the mart watermark,
+# consumed from the queue, symbols they touch
+
+CONSUME_RESTATED = """
+WITH consumed AS (
+    DELETE FROM etl.restated_candles
+    WHERE stage = 'mart'
+    RETURNING symbol
+)
+
+SELECT DISTINCT sm.stock_meta_sk
+FROM consumed as r
+JOIN curated.dim_stock_meta as sm
+    ON sm.symbol = r.symbol;
+"""
+
+STOCK_META = """
+SELECT
+    stock_meta_sk,
+    symbol,
+    sector,
+    sub_industry
+FROM curated.dim_stock_meta
+WHERE stock_meta_sk = ANY(%(stock_meta_sks)s);
+"""
+
+UPSERT = """
+INSERT INTO mart.stock_perf_current (
+    stock_meta_sk,
+    symbol,
+    sector,
+    industry,
+    latest_close,
+    perf_30td,
+    perf_60td,
+    perf_90td,
+    perf_180td,
+    as_of_date
+) VALUES (
+    %(stock_meta_sk)s,
+    %(symbol)s,
+    %(sector)s,
+    %(industry)s,
+    %(latest_close)s,
+    %(perf_30td)s,
+    %(perf_60td)s,
+    %(perf_90td)s,
+    %(perf_180td)s,
+    %(as_of_date)s
+)
+ON CONFLICT (stock_meta_sk, as_of_date) DO UPDATE
+SET symbol = EXCLUDED.symbol,
+    sector = EXCLUDED.sector,
+    industry = EXCLUDED.industry,
+    latest_close = EXCLUDED.latest_close,
+    perf_30td = EXCLUDED.perf_30td,
+    perf_60td = EXCLUDED.perf_60td,
+    perf_90td = EXCLUDED.perf_90td,
+    perf_180td = EXCLUDED.perf_180td,
+    refreshed_at = now();
+"""
+
+# --------------------------------------------------
+# Compute returns
+# --------------------------------------------------
+
+def compute_performance(symbol_sks: np.ndarray, dates: np.ndarray, closes: np.ndarray) -> dict:
+
+    """
+    Compute trading-day returns over a symbol x day close matrix
+
+    Each symbol's own trading days are packed to the right of its row,
+    so column -1-N is N trading days before the symbol's latest close,
+    matching LAG(close, N) over the symbol's history.
+
+    :param symbol_sks: Symbol key per price row
+    :type symbol_sks: np.ndarray
+    :param dates: Trade date per price row, datetime64[D]
+    :type dates: np.ndarray
+    :param closes: Close per price row
+    :type closes: np.ndarray
+    :return: Symbol keys, as of dates, latest close and return per period
+    :rtype: dict
+    """
+
+    sks, rows = np.unique(symbol_sks, return_inverse=True)
+    days, cols = np.unique(dates, return_inverse=True)
+
+    matrix = np.full((len(sks), len(days)), np.nan)
+    matrix[rows, cols] = closes
+
+    # NaN (no candle) first, trading days after, order preserved
+    order = np.argsort(~np.isnan(matrix), axis=1, kind="stable")
+    packed = np.take_along_axis(matrix, order, axis=1)
+
+    latest = packed[:, -1]
+
+    result = {
+        "stock_meta_sk": sks,
+        "as_of_date": days[order[:, -1]],
+        "latest_close": latest
+    }
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for period in PERIODS:
+            if period < packed.shape[1]:
+                perf = latest / packed[:, -1 - period] - 1
+            else:
+                perf = np.full(len(sks), np.nan)
+
+            result[f"perf_{period}td"] = np.where(np.isfinite(perf), perf, np.nan)
+
+    return result
+
+# --------------------------------------------------
+# Refresh mart
+# --------------------------------------------------
+
+@metrics.stage("mart_perf_current")
+def load_mart_perf_current(force: bool = False) -> dict:
+
+    """
+    Refresh the performance snapshot for the latest trading day
+
+    When the mart watermark already covers the latest curated trade
+    date, only symbols with restated or late loaded closes are
+    recomputed, unless forced. Returns are over each symbol's own
+    trading days, as LAG in src/transform/mart_perf_snapshot.sql.
+
+    :param force: Refresh every symbol even if the snapshot is current
+    :type force: bool
+    :return: Snapshot rows upserted and as of date
+    :rtype: dict
+    """
+
+    with transaction() as conn:
+
+        restated = [row[0] for row in fetch_all(CONSUME_RESTATED, conn=conn)]
+
+        window_dates = [row[0] for row in fetch_all(LATEST_DATES, {"window": WINDOW}, conn=conn)]
+
+        if not window_dates:
+            print("[SKIP] No curated trade dates")
+            return {"rows": 0, "as_of_date": None}
+
+        latest_date = window_dates[0]
+        watermark = get_watermark(conn, STAGE)
+
+        # A symbol missing sessions reads back past the window dates,
+        # so every restated symbol is recomputed
+        symbol_sks = None
+
+        if not force and watermark is not None and watermark >= latest_date:
+            symbol_sks = restated
+
+            if not symbol_sks:
+                print(f"[SKIP] Mart performance already current for {latest_date}")
+                return {"rows": 0, "as_of_date": latest_date}
+
+            print(f"[OK] recomputing mart performance for {len(symbol_sks)} restated symbols")
+
+        prices = fetch_all(WINDOW_PRICES, {"window": WINDOW, "window_start": window_dates[-1], "symbol_sks": symbol_sks}, conn=conn)
+
+        if not prices:
+            print("[SKIP] No curated prices in window")
+            return {"rows": 0, "as_of_date": latest_date}
+
+        symbol_sks, dates, closes = zip(*prices)
+
+        perf = compute_performance(
+            np.asarray(symbol_sks, dtype=np.int64),
+            np.asarray(dates, dtype="datetime64[D]"),
+            np.asarray(closes, dtype=np.float64)
+        )
+
+        # Same rule as the SQL snapshot, a 30 trading day return is required
+        keep = np.flatnonzero(~np.isnan(perf["perf_30td"]))
+
+        meta = {
+            row[0]: row[1:]
+            for row in fetch_all(STOCK_META, {"stock_meta_sks": perf["stock_meta_sk"][keep].tolist()}, conn=conn)
+        }
+
+        def value(column, i):
+            v = perf[column][i]
+            return None if np.isnan(v) else float(v)
+
+        snapshot = []
+
+        for i in keep:
+            stock_meta_sk = int(perf["stock_meta_sk"][i])
+            symbol, sector, industry = meta[stock_meta_sk]
+
+            snapshot.append({
+                "stock_meta_sk": stock_meta_sk,
+                "symbol": symbol,
+                "sector": sector,
+                "industry": industry,
+                "latest_close": value("latest_close", i),
+                "perf_30td": value("perf_30td", i),
+                "perf_60td": value("perf_60td", i),
+                "perf_90td": value("perf_90td", i),
+                "perf_180td": value("perf_180td", i),
+                "as_of_date": perf["as_of_date"][i].item()
+            })
+
+        rows = execute_many(UPSERT, snapshot, conn=conn)
+
+        advance_watermark(conn, STAGE, latest_date)
+
+    print(f"[INSERTED] {rows} mart performance rows as of {latest_date}")
+
+    metrics.rows("mart_perf_current", len(prices))
+
+    return {"rows": rows, "as_of_date": latest_date}
+
+# --------------------------------------------------
+# Entry point
+# --------------------------------------------------
+
+def main():
+    load_mart_perf_current()
+
+if __name__ == "__main__":
+    main()
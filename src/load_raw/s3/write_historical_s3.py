@@ -1,80 +1,405 @@
 """
 Connect to EODHD API and retrieve historical data
-Write payloads to S3 bucket
+Write payloads to raw storage, S3 by default (STORAGE_BACKEND)
 
 """
-import json
-from datetime import timezone, datetime
-from src.extract.eod_client import fetch_historical
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timezone, datetime, date, timedelta
+from src.extract.eod_client import fetch_historical, get_client
+from src.utils import checkpoint, manifest, metrics, settings
+from src.utils.db import fetch_all
 from src.utils.custom_exceptions import *
 from src.utils.get_sp500_tickers import get_symbols
-from src.utils.s3config import s3_bucket, client
+from src.utils.rate_limit import TokenBucket
+from src.utils.raw_format import raw_key, encode_payload, content_digest
+from src.utils.storage import get_storage
+
+# --------------------------------------------------
+# Extraction config
+# --------------------------------------------------
+
+# Read on use: EOD_WORKERS fetch workers (8), EOD_RATE_PER_MINUTE
+# API requests per minute (1000), S3_UPLOAD_WORKERS upload workers (4)
+
+# --------------------------------------------------
+# SQL
+# --------------------------------------------------
+
+# Latest staged trade date per symbol, one index probe each
+
+LATEST_TRADE_DATES = """
+SELECT
+    s.symbol,
+    (
+        SELECT MAX(sp.trade_date)
+        FROM staging.stocks as sp
+        WHERE sp.symbol = s.symbol
+    )
+FROM unnest(%(symbols)s::TEXT[]) as s(symbol);
+"""
+
+# --------------------------------------------------
+# Raw keys
+# --------------------------------------------------
+
+def historical_prefix(symbol: str, domain: str = "sp500") -> str:
+
+    """
+    Raw historical prefix for a symbol, holds the full history
+    and its dated deltas
+
+    :param symbol: Stock symbol
+    :type symbol: str
+    :param domain: Stock domain eg sp500
+    :type domain: str
+    :return: Key prefix without trailing slash
+    :rtype: str
+    """
+
+    return f"raw/stocks/daily/historical/domain={domain}/symbol={symbol}"
+
+def delta_stem(symbol: str, from_date: date, domain: str = "sp500", to_date: date | None = None) -> str:
+
+    """
+    Key stem of a delta object starting at from_date, bounded deltas
+    re-fetching a gap also carry their to_date
+
+    :param symbol: Stock symbol
+    :type symbol: str
+    :param from_date: First trade date requested
+    :type from_date: date
+    :param domain: Stock domain eg sp500
+    :type domain: str
+    :param to_date: Last trade date requested, None if open ended
+    :type to_date: date | None
+    :return: Key stem without extension
+    :rtype: str
+    """
+
+    stem = f"{historical_prefix(symbol, domain)}/eod_delta_{from_date.isoformat()}"
+
+    if to_date is not None:
+        stem += f"_{to_date.isoformat()}"
+
+    return stem
+
+# --------------------------------------------------
+# Staging high-water marks
+# --------------------------------------------------
+
+def latest_trade_dates(symbols: list[str]) -> dict[str, date]:
+
+    """
+    Latest trade date in staging per symbol
+
+    :param symbols: Symbols to look up
+    :type symbols: list[str]
+    :return: Latest trade date per symbol, symbols not staged are omitted
+    :rtype: dict[str, date]
+    """
+
+    rows = fetch_all(LATEST_TRADE_DATES, {"symbols": symbols})
+
+    return {symbol: latest for symbol, latest in rows if latest is not None}
 
 # --------------------------------------------------
 # Write historical data to S3
 # --------------------------------------------------
 
-def write_historical(symbol: str, api_response: list[dict], domain:str="sp500", source: str="https://eodhd.com/api/eod/"):
+def write_historical(symbol: str, api_response: list[dict], domain:str="sp500", source: str="https://eodhd.com/api/eod/", from_date: date | None = None, to_date: date | None = None) -> dict:
 
     """
-    Write raw historical data to S3
+    Write raw historical data to raw storage
+
+    The upload is skipped when the object already holds the same
+    candles, checked with one HEAD against its content digest.
     
     :param symbol: selected stock symbol
     :type symbol: str
     :param api_response: response payload
     :type api_response: list[dict]
-    :param base_path: project root dir, local data_lake
-    :type base_path: Path
     :param domain: Stock domain eg sp500
     :type domain: str
     :param source: API Source
     :type source: str
+    :param from_date: First trade date of a delta, None for full history
+    :type from_date: date | None
+    :param to_date: Last trade date of a bounded delta
+    :type to_date: date | None
+    :return: Key, ETag, content digest, row count and whether the
+        object was unchanged
+    :rtype: dict
     """
 
-    key = (f"raw/stocks/daily/historical/domain={domain}/symbol={symbol}/eod_history.json")
+    if from_date is None:
+        key = raw_key(f"{historical_prefix(symbol, domain)}/eod_history")
+    else:
+        key = raw_key(delta_stem(symbol, from_date, domain, to_date))
 
-    payload = {
+    meta = {
         "symbol": symbol,
         "domain": domain,
         "source": source,
         "ingestion_type": "historical",
-        "ingested_at": datetime.now(timezone.utc).isoformat(),
-        "data": api_response
+        "ingested_at": datetime.now(timezone.utc).isoformat()
     }
 
-    client.put_object(
-        Bucket=s3_bucket,
-        Key=key,
-        Body=json.dumps(payload, indent=2),
-        ContentType="application/json"
-    )
+    if from_date is not None:
+        meta["from_date"] = from_date.isoformat()
+    if to_date is not None:
+        meta["to_date"] = to_date.isoformat()
+
+    digest = content_digest(api_response)
+    stored = manifest.current(key)
+
+    if stored is not None and stored["digest"] == digest:
+        metrics.count("etl_raw_unchanged_total", stage="raw")
+        return {"key": key, "etag": stored["etag"], "digest": digest, "row_count": len(api_response), "unchanged": True}
 
-    print(f"[OK] historical data written to s3://{s3_bucket}/{key}")
+    body, put_args = encode_payload(meta, api_response, digest=digest)
+
+    storage = get_storage()
+    etag = storage.put(key, body, **put_args)
+
+    manifest.record_written(key, symbol, digest, etag, len(api_response))
+
+    metrics.log("raw_written", uri=storage.uri(key), rows=len(api_response), bytes=len(body))
+
+    return {"key": key, "etag": etag, "digest": digest, "row_count": len(api_response), "unchanged": False}
 
 # --------------------------------------------------
 # Fetch symbols and call write_historical
 # --------------------------------------------------
 
-def get_historical_data():
+@metrics.stage("extract_historical")
+def get_historical_data(
+    symbols: list[str] | None = None,
+    workers: int | None = None,
+    rate_per_minute: float | None = None,
+    upload_workers: int | None = None,
+    run_id: str | None = None,
+    resume: bool = True,
+    delta: bool = False
+) -> dict:
+
+    """
+    Fetch historical data concurrently and write each payload to S3
+
+    API requests are spread over a pool of fetch workers and gated by a
+    token bucket sized to the EODHD per-minute quota. Completed fetches
+    are handed to a separate upload pool so S3 writes overlap with the
+    next HTTP requests. Failures are isolated per symbol.
+
+    Each symbol is checkpointed per storage backend as it is written or
+    fails, so a rerun of the same run id only fetches symbols not yet
+    written. Payloads
+    whose candles match the stored object are not uploaded again.
+
+    In delta mode only candles after each symbol's latest staged trade
+    date are requested and written as dated delta objects. Symbols not
+    yet staged get their full history. Deltas are not checkpointed,
+    a rerun starts again from staging.
+
+    :param symbols: Symbols to fetch, defaults to config symbols
+    :type symbols: list[str] | None
+    :param workers: Concurrent API fetch workers, defaults to EOD_WORKERS
+    :type workers: int | None
+    :param rate_per_minute: EODHD API requests allowed per minute,
+        defaults to EOD_RATE_PER_MINUTE
+    :type rate_per_minute: float | None
+    :param upload_workers: Concurrent S3 upload workers, defaults to S3_UPLOAD_WORKERS
+    :type upload_workers: int | None
+    :param run_id: Backfill run id for checkpoints, pass a previous
+        run's id to resume it, defaults to checkpoint.current_run_id()
+    :type run_id: str | None
+    :param resume: Skip symbols already written in this run
+    :type resume: bool
+    :param delta: Fetch only candles newer than staging
+    :type delta: bool
+    :return: Written and unchanged symbols, failed symbols with reason and HTTP counters
+    :rtype: dict
+    """
+
+    if symbols is None:
+        symbols = get_symbols()
+
+    run_id = run_id or checkpoint.current_run_id()
+    stage = checkpoint.raw_stage()
+    from_dates = {}
+
+    if delta:
+        from_dates = {symbol: latest + timedelta(days=1) for symbol, latest in latest_trade_dates(symbols).items()}
+
+    elif resume:
+        remaining = checkpoint.pending(symbols, stage, run_id)
+
+        if len(remaining) < len(symbols):
+            print(f"[SKIP] {len(symbols) - len(remaining)} symbols already written in run {run_id}")
+
+        symbols = remaining
+
+    workers = workers or settings.get_int("EOD_WORKERS", 8)
+    upload_workers = upload_workers or settings.get_int("S3_UPLOAD_WORKERS", 4)
+    limiter = TokenBucket(rate_per_minute or settings.get_float("EOD_RATE_PER_MINUTE", 1000))
+
+    def fetch(symbol: str) -> list[dict]:
+        limiter.acquire()
+
+        if symbol in from_dates:
+            return fetch_historical(symbol, from_date=from_dates[symbol])
+
+        return fetch_historical(symbol)
+
+    def record(symbol: str, result: dict):
+        if not delta:
+            checkpoint.record(stage, {symbol: result}, run_id)
+
+    written = []
+    unchanged = []
+    failed = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as fetchers, ThreadPoolExecutor(max_workers=upload_workers) as uploaders:
+
+        fetches = {fetchers.submit(fetch, symbol): symbol for symbol in symbols}
+        uploads = {}
+
+        for future in as_completed(fetches):
+            symbol = fetches[future]
+
+            try:
+                data = future.result()
+
+            except (APIError, ValidationError) as e:
+                print(f"[WARN] {symbol} skipped: {e}")
+                failed[symbol] = str(e)
+                record(symbol, {"error": str(e)})
+                continue
+
+            except Exception as e:
+                print(f"[ERROR] Unexpected failure for {symbol}: {e}")
+                failed[symbol] = str(e)
+                record(symbol, {"error": str(e)})
+                continue
+
+            if not data:
+                metrics.log("no_new_candles", "SKIP", symbol=symbol)
+                continue
+
+            uploads[uploaders.submit(write_historical, symbol, data, from_date=from_dates.get(symbol))] = symbol
+
+        for future in as_completed(uploads):
+            symbol = uploads[future]
+
+            try:
+                result = future.result()
+
+                if result["unchanged"]:
+                    unchanged.append(symbol)
+                else:
+                    written.append(symbol)
+                    metrics.rows("extract_historical", result["row_count"])
+
+            except Exception as e:
+                print(f"[ERROR] Unexpected failure for {symbol}: {e}")
+                failed[symbol] = str(e)
+                result = {"error": str(e)}
+
+            record(symbol, result)
+
+    http = get_client().stats()
+
+    print(f"[OK] historical extract: written={len(written)} unchanged={len(unchanged)} failed={len(failed)}")
+    print(
+        f"[OK] EODHD requests={http["requests"]} retries={http["retries"]} "
+        f"avg={http["avg_seconds"]:.3f}s max={http["max_seconds"]:.3f}s "
+        f"wire={http["wire_bytes"] / 1e6:.1f}MB decoded={http["bytes"] / 1e6:.1f}MB"
+    )
+
+    return {"written": written, "unchanged": unchanged, "failed": failed, "http": http}
+
+# --------------------------------------------------
+# Re-fetch staging gaps
+# --------------------------------------------------
+
+@metrics.stage("extract_gaps")
+def get_gap_data(
+    gaps: dict[str, list[date]],
+    workers: int | None = None,
+    rate_per_minute: float | None = None
+) -> dict:
+
+    """
+    Re-fetch the span of missing sessions per symbol as bounded deltas
+
+    One request per symbol covers its first to last missing session,
+    candles already staged in between merge as duplicates. A re-fetch
+    matching the stored object is still handed back for loading unless
+    the manifest shows that version was staged, so a gap whose first
+    load failed is retried.
+
+    :param gaps: Missing sessions per symbol, see presence_index.find_gaps
+    :type gaps: dict[str, list[date]]
+    :param workers: Concurrent API fetch workers, defaults to EOD_WORKERS
+    :type workers: int | None
+    :param rate_per_minute: EODHD API requests allowed per minute,
+        defaults to EOD_RATE_PER_MINUTE
+    :type rate_per_minute: float | None
+    :return: Written keys per symbol and failed symbols with reason
+    :rtype: dict
+    """
+
+    workers = workers or settings.get_int("EOD_WORKERS", 8)
+    limiter = TokenBucket(rate_per_minute or settings.get_float("EOD_RATE_PER_MINUTE", 1000))
+
+    def refetch(symbol: str) -> dict | None:
+        from_date, to_date = min(gaps[symbol]), max(gaps[symbol])
+
+        limiter.acquire()
+        data = fetch_historical(symbol, from_date=from_date, to_date=to_date)
+
+        if not data:
+            return None
+
+        result = write_historical(symbol, data, from_date=from_date, to_date=to_date)
+        result["staged"] = result["unchanged"] and manifest.loaded_digest(result["key"]) == result["digest"]
+
+        return result
+
+    written = {}
+    failed = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(refetch, symbol): symbol for symbol, days in gaps.items() if days}
+
+        for future in as_completed(futures):
+            symbol = futures[future]
+
+            try:
+                result = future.result()
+
+            except Exception as e:
+                print(f"[WARN] {symbol} gap re-fetch failed: {e}")
+                failed[symbol] = str(e)
+                continue
 
-    symbols = get_symbols()
+            if result is None:
+                print(f"[SKIP] No candles returned for {symbol} gaps")
+                continue
 
-    for symbol in symbols:
+            # Same candles as an earlier re-fetch that was staged
+            if result["staged"]:
+                print(f"[SKIP] {symbol} gap re-fetch unchanged and staged")
+                continue
 
-        try: 
-            data = fetch_historical(symbol)
-            write_historical(symbol, data)
+            written[symbol] = result["key"]
+            metrics.rows("extract_gaps", result["row_count"])
 
-        except (APIError, ValidationError) as e:
-            print(f"[WARN] {symbol} skipped: {e}")
-            continue
+    print(f"[OK] gap re-fetch: written={len(written)} failed={len(failed)}")
 
-        except Exception as e:
-            print(f"[ERROR] Unexpected failure for {symbol}: {e}")
-            continue
+    return {"written": written, "failed": failed}
 
 def main():
     get_historical_data()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,21 +1,23 @@
 """
 Connect to EODHD API and retrieve incremental data
-Write payloads to S3 bucket
+Write payloads to raw storage, S3 by default (STORAGE_BACKEND)
 """
-import json
 from datetime import datetime, timezone, timedelta
 from src.extract import eod_client
-from src.utils import s3config as s3
+from src.utils.storage import get_storage
+from src.utils import metrics
 from src.utils import get_sp500_tickers as get_ticker
+from src.utils.raw_format import raw_key, encode_payload
 
 # --------------------------------------------------
 # Write incremental data to S3
 # --------------------------------------------------
 
+@metrics.stage("extract_incremental")
 def write_incremental(api_response: list[dict], domain: str = "sp500", source: str = "https://eodhd.com/api/eod-bulk-last-day/US"):
 
     """
-    Write incremental EOD data to S3
+    Write incremental EOD data to raw storage
     
     :param api_response: EODHD json
     :type api_response: list[dict]
@@ -27,34 +29,35 @@ def write_incremental(api_response: list[dict], domain: str = "sp500", source: s
     
     eod_date = datetime.now(timezone.utc).date() - timedelta(days=1)
 
-    key = (
+    stem = (
         f"raw/stocks/daily/incremental/"
         f"domain={domain}/"
         f"date={eod_date.isoformat()}/"
-        f"eod_incremental.json"
+        f"eod_incremental"
     )
 
-    if s3.s3_key_exists(s3.s3_bucket, key):
+    storage = get_storage()
+
+    if storage.find_raw(stem):
         print(f"[SKIP] Incremental data already exists for {eod_date}")
         return
 
-    payload = {
+    key = raw_key(stem)
+
+    meta = {
         "eod_date": eod_date.isoformat(),
         "domain": domain,
         "source": source,
         "ingestion_type": "incremental",
-        "ingested_at": datetime.now(timezone.utc).isoformat(),
-        "data": api_response
+        "ingested_at": datetime.now(timezone.utc).isoformat()
     }
 
-    s3.client.put_object(
-        Bucket=s3.s3_bucket,
-        Key=key,
-        Body=json.dumps(payload, indent=2),
-        ContentType="application/json"
-    )
+    body, put_args = encode_payload(meta, api_response)
+
+    storage.put(key, body, **put_args)
+    metrics.rows("extract_incremental", len(api_response), len(body))
 
-    print(f"[OK] {len(api_response)} records written to s3://{s3.s3_bucket}/{key}")
+    print(f"[OK] {len(api_response)} records written to {storage.uri(key)}")
 
 # --------------------------------------------------
 # Orchestration
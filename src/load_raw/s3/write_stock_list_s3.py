@@ -3,14 +3,12 @@ Create json file with list of stock symbol,
 full name and industry
 """
 
-import pandas as pd
-import json
-import requests
 from pathlib import Path
 from datetime import datetime, timezone, date
 from src.utils.custom_exceptions import *
-from src.utils.s3config import s3_bucket, client
-from botocore.exceptions import ClientError, NoCredentialsError, EndpointConnectionError
+from src.utils.storage import get_storage
+from src.utils import metrics
+from src.utils.raw_format import raw_key, encode_payload
 
 # --------------------------------------------------
 # Wiki URL
@@ -37,6 +35,9 @@ def fetch_symbol_meta() -> list[dict]:
     a list of ticker names and sector.
     """
 
+    import pandas as pd
+    import requests
+
     symbol_meta_list = []
 
     try:
@@ -98,25 +99,30 @@ def payload_meta(data: list[dict]) -> dict:
 # Write Stock Symbol List to S3
 # --------------------------------------------------
 
+@metrics.stage("extract_stock_list")
 def write_symbol_data_to_s3():
 
     """
     Write Stock Symbol List to S3
     """
 
+    from botocore.exceptions import ClientError, NoCredentialsError, EndpointConnectionError
+
     symbol_list = fetch_symbol_meta()
     payload = payload_meta(data=symbol_list)
-    key = (f"raw/stocks/stock_lists/domain={payload["domain"]}/stock_list_{date.today().isoformat()}.json")
+    key = raw_key(f"raw/stocks/stock_lists/domain={payload["domain"]}/stock_list_{date.today().isoformat()}")
+
+    meta = {k: v for k, v in payload.items() if k != "data"}
+
+    body, put_args = encode_payload(meta, payload["data"])
+
+    storage = get_storage()
 
     try:
-        client.put_object(
-            Bucket=s3_bucket,
-            Key=key,
-            Body=json.dumps(payload, indent=2),
-            ContentType="application/json"
-        )
+        storage.put(key, body, **put_args)
+        metrics.rows("extract_stock_list", len(symbol_list), len(body))
 
-        print(f"[OK] historical data written to s3://{s3_bucket}/{key}")
+        print(f"[OK] stock list written to {storage.uri(key)}")
 
     except NoCredentialsError as exc:
         raise RuntimeError("AWS credentials not configured") from exc
@@ -124,7 +130,7 @@ def write_symbol_data_to_s3():
         raise RuntimeError("Unable to reach S3") from exc
     except ClientError as exc:
         error_code = exc.response["Error"]["Code"]
-        raise RuntimeError(f"S3 put_object failed ({error_code}) for {s3_bucket}/{key}") from exc
+        raise RuntimeError(f"S3 put_object failed ({error_code}) for {storage.uri(key)}") from exc
 
 # --------------------------------------------------
 # Entry Point
@@ -0,0 +1,290 @@
+"""
+Columnar helpers for validating EOD candles a payload at a time
+Shared by the historical and incremental batch contracts
+"""
+
+import numpy as np
+from dataclasses import dataclass
+from datetime import datetime, timezone, date
+from decimal import ROUND_HALF_UP, Decimal
+
+# --------------------------------------------------
+# Fixed point scale, prices held as int64 at 4dp
+# --------------------------------------------------
+
+PRICE_SCALE = 10_000
+
+PRICE_FIELDS = [
+    "open",
+    "high",
+    "low",
+    "close",
+    "adjusted_close"
+]
+
+# --------------------------------------------------
+# Validated column batch
+# --------------------------------------------------
+
+@dataclass
+class CandleBatch:
+
+    """
+    Validated candles held as column arrays
+
+    Prices are int64 scaled by PRICE_SCALE (4dp), volume is int64
+    and trade_date is datetime64[D]. Payload meta is held once.
+    """
+
+    domain: str
+    source: str
+    ingestion_type: str
+    ingested_at: datetime
+    symbol: np.ndarray
+    trade_date: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    adjusted_close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.trade_date)
+
+    def rows(self):
+
+        """
+        Yield one tuple per candle, in COPY column order
+        """
+
+        n = len(self)
+
+        yield from zip(
+            self.symbol.tolist(),
+            [self.domain] * n,
+            [self.source] * n,
+            [self.ingestion_type] * n,
+            [self.ingested_at] * n,
+            self.trade_date.tolist(),
+            self.open.tolist(),
+            self.high.tolist(),
+            self.low.tolist(),
+            self.close.tolist(),
+            self.adjusted_close.tolist(),
+            self.volume.tolist()
+        )
+
+# --------------------------------------------------
+# Payload meta, checked once per file
+# --------------------------------------------------
+
+def validate_payload_meta(payload: dict, required_fields: list[str], ingestion_type: str) -> datetime:
+
+    """
+    Validates payload meta and parses ingested_at
+
+    :param payload: Payload meta
+    :type payload: dict
+    :param required_fields: Required payload fields
+    :type required_fields: list[str]
+    :param ingestion_type: Expected ingestion type
+    :type ingestion_type: str
+    :return: ingested_at as UTC datetime
+    :rtype: datetime
+    """
+
+    for field in required_fields:
+        if field not in payload:
+            raise ValueError(f"Missing payload field {field}")
+
+    if payload["ingestion_type"] != ingestion_type:
+        raise ValueError(f"EOD data not {ingestion_type}")
+
+    return datetime.fromisoformat(payload["ingested_at"]).replace(tzinfo=timezone.utc)
+
+# --------------------------------------------------
+# Column conversions
+# --------------------------------------------------
+
+def _quantize(value) -> int:
+
+    """
+    Reference Decimal rounding, returns price scaled to int
+    """
+
+    price = Decimal(str(value)).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
+    return int(price.scaleb(4))
+
+def to_float_column(values: list) -> tuple[np.ndarray, np.ndarray]:
+
+    """
+    Convert a column to float64, flagging values that do not parse
+
+    :param values: Raw column values
+    :type values: list
+    :return: Float column and valid mask
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+
+    try:
+        column = np.asarray(values, dtype=np.float64)
+
+    except (TypeError, ValueError):
+        column = np.full(len(values), np.nan)
+
+        for i, value in enumerate(values):
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+
+    return column, np.isfinite(column)
+
+def scale_prices(values: list) -> tuple[np.ndarray, np.ndarray]:
+
+    """
+    Round prices to 4dp ROUND_HALF_UP as int64 scaled by PRICE_SCALE
+
+    Matches Decimal(str(x)).quantize(Decimal("0.0001"), ROUND_HALF_UP).
+    Values whose scaled fraction is within float error of .5 are
+    re-rounded with Decimal so ties resolve exactly as before.
+
+    :param values: Raw price values
+    :type values: list
+    :return: Scaled prices and valid mask
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+
+    column, valid = to_float_column(values)
+    column = np.where(valid, column, 0.0)
+
+    scaled = np.abs(column) * PRICE_SCALE
+    floor = np.floor(scaled)
+    rounded = np.copysign(floor + (scaled - floor >= 0.5), column)
+
+    near_tie = np.abs(scaled - floor - 0.5) <= 4 * np.spacing(scaled)
+    result = rounded.astype(np.int64)
+
+    for i in np.flatnonzero(near_tie & valid):
+        result[i] = _quantize(values[i])
+
+    return result, valid
+
+def to_volume(values: list) -> tuple[np.ndarray, np.ndarray]:
+
+    """
+    Convert volume to int64, flagging unparseable or negative values
+
+    :param values: Raw volume values
+    :type values: list
+    :return: Volume column and valid mask
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+
+    try:
+        column = np.asarray(values, dtype=np.int64)
+        valid = np.ones(len(values), dtype=bool)
+
+    except (TypeError, ValueError, OverflowError):
+        column = np.zeros(len(values), dtype=np.int64)
+        valid = np.zeros(len(values), dtype=bool)
+
+        for i, value in enumerate(values):
+            try:
+                column[i] = int(value)
+                valid[i] = True
+            except (TypeError, ValueError, OverflowError):
+                pass
+
+    return column, valid
+
+def to_dates(values: list) -> tuple[np.ndarray, np.ndarray]:
+
+    """
+    Convert ISO date strings to datetime64[D], flagging bad dates
+
+    :param values: Raw date values
+    :type values: list
+    :return: Date column and valid mask
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+
+    try:
+        column = np.asarray(values, dtype="datetime64[D]")
+        valid = ~np.isnat(column)
+
+    except (TypeError, ValueError):
+        column = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[D]")
+        valid = np.zeros(len(values), dtype=bool)
+
+        for i, value in enumerate(values):
+            try:
+                column[i] = date.fromisoformat(value)
+                valid[i] = True
+            except (TypeError, ValueError):
+                pass
+
+    return column, valid
+
+# --------------------------------------------------
+# Validate candle columns
+# --------------------------------------------------
+
+def validate_candles(data: list[dict], required_data: list[str]) -> tuple[dict, np.ndarray, list[dict]]:
+
+    """
+    Validates a payload's candles column-wise
+
+    :param data: Raw candles
+    :type data: list[dict]
+    :param required_data: Required candle fields
+    :type required_data: list[str]
+    :return: Valid columns, valid row indices, rejected rows with reason
+    :rtype: tuple[dict, np.ndarray, list[dict]]
+    """
+
+    n = len(data)
+    reasons = [None] * n
+
+    required = set(required_data)
+
+    for i, candle in enumerate(data):
+        if not isinstance(candle, dict):
+            reasons[i] = "Candle is not an object"
+        elif not required <= candle.keys():
+            missing = next(field for field in required_data if field not in candle)
+            reasons[i] = f"Missing EOD data field: {missing}"
+
+    present = [candle if reason is None else {} for candle, reason in zip(data, reasons)]
+
+    def column(field):
+        return [candle.get(field) for candle in present]
+
+    def reject(mask, reason):
+        for i in np.flatnonzero(~mask):
+            if reasons[i] is None:
+                reasons[i] = reason
+
+    columns = {}
+
+    for field in PRICE_FIELDS:
+        columns[field], valid = scale_prices(column(field))
+        reject(valid, f"Invalid {field} price")
+
+    columns["volume"], valid = to_volume(column("volume"))
+    reject(valid, "Invalid volume")
+    reject(columns["volume"] >= 0, "Negative volume")
+
+    columns["trade_date"], valid = to_dates(column("date"))
+    reject(valid, "Invalid trade date")
+
+    keep = np.fromiter((reason is None for reason in reasons), dtype=bool, count=n)
+    index = np.flatnonzero(keep)
+
+    rejected = [
+        {"candle": data[i], "reason": reasons[i]}
+        for i in np.flatnonzero(~keep)
+    ]
+
+    return {name: values[index] for name, values in columns.items()}, index, rejected
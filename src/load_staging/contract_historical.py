@@ -3,9 +3,11 @@ Contract for validating historical EOD json payload
 Ensuring fields are present and casting types
 """
 
+import numpy as np
 from datetime import datetime, timezone, date
 from decimal import ROUND_HALF_UP, Decimal #For converting timestamp
 from src.utils.custom_exceptions import *
+from src.load_staging.contract_columnar import CandleBatch, validate_payload_meta, validate_candles
 
 # --------------------------------------------------
 # Required JSON elements, else raise exception
@@ -38,6 +40,7 @@ def validate_historical_data(payload: dict, data: dict) -> dict:
     """
     Validates historical payload and data
     Enforces Types
+    Per-row reference for validate_historical_batch, which the loads use
     
     :param payload: Payload meta to validate
     :type payload: dict
@@ -100,4 +103,37 @@ def validate_historical_data(payload: dict, data: dict) -> dict:
         "close": close_price,
         "adjusted_close": adjusted_close,
         "volume": volume
-    }
\ No newline at end of file
+    }
+
+# --------------------------------------------------
+# Validate whole payload, column-wise
+# --------------------------------------------------
+
+def validate_historical_batch(payload: dict, data: list[dict]) -> tuple[CandleBatch, list[dict]]:
+
+    """
+    Validates historical payload meta once and candles column-wise
+    Rounding matches validate_historical_data
+
+    :param payload: Payload meta
+    :type payload: dict
+    :param data: EOD data for the whole payload
+    :type data: list[dict]
+    :return: Valid candle batch, rejected candles with reason
+    :rtype: tuple[CandleBatch, list[dict]]
+    """
+
+    ingested_at = validate_payload_meta(payload, required_fields, "historical")
+
+    columns, index, rejected = validate_candles(data, required_data)
+
+    batch = CandleBatch(
+        domain=payload["domain"],
+        source=payload["source"],
+        ingestion_type="historical",
+        ingested_at=ingested_at,
+        symbol=np.full(len(index), payload["symbol"], dtype=object),
+        **columns
+    )
+
+    return batch, rejected
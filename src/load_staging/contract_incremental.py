@@ -3,9 +3,11 @@ Contract for validating incremental EOD json payload
 Ensuring fields are present and casting types
 """
 
+import numpy as np
 from datetime import datetime, timezone, date
 from decimal import ROUND_HALF_UP, Decimal #For converting timestamp
 from src.utils.custom_exceptions import *
+from src.load_staging.contract_columnar import CandleBatch, validate_payload_meta, validate_candles
 
 # --------------------------------------------------
 # Required JSON elements, else raise exception
@@ -37,6 +39,7 @@ def validate_incremental_data(payload: dict, data: dict) -> dict:
 
     """
     Validation of payload meta and EOD data
+    Per-row reference for validate_incremental_batch, which the loads use
     
     :param payload: Payload meta
     :type payload: dict
@@ -99,4 +102,37 @@ def validate_incremental_data(payload: dict, data: dict) -> dict:
         "close": close_price,
         "adjusted_close": adjusted_close,
         "volume": volume
-    }
\ No newline at end of file
+    }
+
+# --------------------------------------------------
+# Validate whole payload, column-wise
+# --------------------------------------------------
+
+def validate_incremental_batch(payload: dict, data: list[dict]) -> tuple[CandleBatch, list[dict]]:
+
+    """
+    Validates incremental payload meta once and candles column-wise
+    Rounding matches validate_incremental_data
+
+    :param payload: Payload meta
+    :type payload: dict
+    :param data: EOD data for the whole payload
+    :type data: list[dict]
+    :return: Valid candle batch, rejected candles with reason
+    :rtype: tuple[CandleBatch, list[dict]]
+    """
+
+    ingested_at = validate_payload_meta(payload, required_fields, "incremental")
+
+    columns, index, rejected = validate_candles(data, required_data)
+
+    batch = CandleBatch(
+        domain=payload["domain"],
+        source=payload["source"],
+        ingestion_type="incremental",
+        ingested_at=ingested_at,
+        symbol=np.asarray([data[i]["code"] for i in index], dtype=object),
+        **columns
+    )
+
+    return batch, rejected
@@ -0,0 +1,422 @@
+"""
+Per-symbol presence bitmap of staged candles over the NYSE calendar
+Built once from staging.stocks, kept current by the staging loaders
+and cached as a compressed npz file
+"""
+
+import fcntl
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+import numpy as np
+from src.utils import settings
+from src.utils.db import fetch_all
+from src.utils.trading_calendar import sessions as calendar_sessions
+from src.utils.custom_exceptions import *
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+def index_path() -> Path:
+
+    """
+    Cache file, PRESENCE_INDEX_PATH or cache/staging_presence.npz in the project
+    """
+
+    return Path(settings.get("PRESENCE_INDEX_PATH") or PROJECT_ROOT / "cache" / "staging_presence.npz")
+
+# --------------------------------------------------
+# SQL
+# --------------------------------------------------
+
+# Trade dates as day numbers, parsed with numpy instead of per value
+
+STAGED_SESSIONS = """
+SELECT symbol, string_agg((trade_date - DATE '1970-01-01')::TEXT, ',')
+FROM staging.stocks
+GROUP BY symbol;
+"""
+
+# --------------------------------------------------
+# Helpers
+# --------------------------------------------------
+
+def parse_days(days: str) -> np.ndarray:
+
+    """
+    Parse comma separated day numbers since 1970-01-01
+
+    :param days: Day numbers eg "19723,19724"
+    :type days: str
+    :return: datetime64[D] array
+    :rtype: np.ndarray
+    """
+
+    return np.fromstring(days, dtype=np.int64, sep=",").astype("datetime64[D]")
+
+# --------------------------------------------------
+# Presence bitmap
+# --------------------------------------------------
+
+@dataclass
+class PresenceIndex:
+
+    """
+    One packed bit row per symbol, one bit per session. first and
+    last hold each symbol's first and last staged session, -1 if none
+    """
+
+    sessions: np.ndarray = field(default_factory=calendar_sessions)
+    symbols: list[str] = field(default_factory=list)
+    bits: np.ndarray = None
+    first: np.ndarray = None
+    last: np.ndarray = None
+
+    def __post_init__(self):
+
+        if self.bits is None:
+            self.bits = np.zeros((0, (len(self.sessions) + 7) // 8), dtype=np.uint8)
+            self.first = np.zeros(0, dtype=np.int64)
+            self.last = np.zeros(0, dtype=np.int64)
+
+        self.rows = {symbol: row for row, symbol in enumerate(self.symbols)}
+
+    def _add_symbols(self, symbols):
+
+        new = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.rows]
+
+        if not new:
+            return
+
+        for symbol in new:
+            self.rows[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+
+        self.bits = np.vstack([self.bits, np.zeros((len(new), self.bits.shape[1]), dtype=np.uint8)])
+        self.first = np.concatenate([self.first, np.full(len(new), -1, dtype=np.int64)])
+        self.last = np.concatenate([self.last, np.full(len(new), -1, dtype=np.int64)])
+
+    def record(self, staged: dict[str, np.ndarray]) -> dict[str, list[date]]:
+
+        """
+        Mark staged trade dates as present
+
+        :param staged: datetime64[D] trade dates per symbol
+        :type staged: dict[str, np.ndarray]
+        :return: Trade dates inside the calendar that are not sessions, per symbol
+        :rtype: dict[str, list[date]]
+        """
+
+        self._add_symbols(staged)
+
+        off_calendar = {}
+        lower, upper = self.sessions[0], self.sessions[-1]
+
+        for symbol, days in staged.items():
+            days = days[(days >= lower) & (days <= upper)]
+            index = np.searchsorted(self.sessions, days)
+
+            on_calendar = self.sessions[index] == days
+
+            if not on_calendar.all():
+                off_calendar[symbol] = days[~on_calendar].tolist()
+                index = index[on_calendar]
+
+            if not index.size:
+                continue
+
+            row = self.rows[symbol]
+            np.bitwise_or.at(self.bits[row], index >> 3, (128 >> (index & 7)).astype(np.uint8))
+
+            low, high = index.min(), index.max()
+            self.first[row] = low if self.first[row] < 0 else min(self.first[row], low)
+            self.last[row] = max(self.last[row], high)
+
+        return off_calendar
+
+    def missing(self, symbols: list[str] | None = None, start: date | None = None, end: date | None = None) -> dict[str, list[date]]:
+
+        """
+        Sessions without a staged candle, per symbol
+
+        Only sessions between a symbol's first and last staged candle
+        count, sessions before a listing or after the latest load are
+        not gaps.
+
+        :param symbols: Symbols to check, None for every indexed symbol
+        :type symbols: list[str] | None
+        :param start: First session to check
+        :type start: date | None
+        :param end: Last session to check
+        :type end: date | None
+        :return: Missing sessions per symbol, symbols without gaps omitted
+        :rtype: dict[str, list[date]]
+        """
+
+        if symbols is None:
+            rows = np.arange(len(self.symbols))
+        else:
+            rows = np.array([self.rows[symbol] for symbol in symbols if symbol in self.rows], dtype=np.int64)
+
+        # Symbols with every session between first and last present have no gaps
+        present_count = np.bitwise_count(self.bits[rows]).sum(axis=1, dtype=np.int64)
+        rows = rows[present_count < self.last[rows] - self.first[rows] + 1]
+
+        lower = 0 if start is None else int(np.searchsorted(self.sessions, np.datetime64(start, "D")))
+        upper = len(self.sessions) if end is None else int(np.searchsorted(self.sessions, np.datetime64(end, "D"), side="right"))
+
+        if not rows.size or lower >= upper:
+            return {}
+
+        # Unpack only the bytes covering the window
+        byte_lower = lower >> 3
+        present = np.unpackbits(self.bits[rows, byte_lower:(upper + 7) >> 3], axis=1)
+        present = present[:, lower - (byte_lower << 3):upper - (byte_lower << 3)]
+
+        columns = np.arange(lower, upper)
+        gaps = (present == 0) & (columns >= self.first[rows, None]) & (columns <= self.last[rows, None])
+
+        gap_rows, gap_columns = np.nonzero(gaps)
+
+        if not gap_rows.size:
+            return {}
+
+        days = self.sessions[lower + gap_columns]
+        splits = np.flatnonzero(np.diff(gap_rows)) + 1
+
+        return {
+            self.symbols[rows[group_rows[0]]]: group_days.tolist()
+            for group_rows, group_days in zip(np.split(gap_rows, splits), np.split(days, splits))
+        }
+
+    def remap(self, sessions: np.ndarray) -> "PresenceIndex":
+
+        """
+        Move the bitmap onto another calendar, eg after a new year is added
+
+        :param sessions: New ordered sessions
+        :type sessions: np.ndarray
+        :return: Index over the new calendar
+        :rtype: PresenceIndex
+        """
+
+        remapped = PresenceIndex(sessions=sessions)
+        present = np.unpackbits(self.bits, axis=1, count=len(self.sessions)).astype(bool)
+
+        remapped.record({
+            symbol: self.sessions[present[row]]
+            for row, symbol in enumerate(self.symbols)
+        })
+
+        return remapped
+
+    # --------------------------------------------------
+    # Cache file
+    # --------------------------------------------------
+
+    def save(self, path: Path | None = None):
+
+        """
+        Write the index atomically as a compressed npz file
+
+        :param path: Cache file, defaults to PRESENCE_INDEX_PATH
+        :type path: Path | None
+        """
+
+        path = path or index_path()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = path.with_name(path.name + ".tmp")
+
+        with temp_file.open("wb") as f:
+            np.savez_compressed(
+                f,
+                sessions=self.sessions,
+                symbols=np.array(self.symbols, dtype=str),
+                bits=self.bits,
+                first=self.first,
+                last=self.last
+            )
+
+        temp_file.replace(path)
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> "PresenceIndex":
+
+        """
+        Read a cached index, remapped if the calendar has moved on
+
+        :param path: Cache file, defaults to PRESENCE_INDEX_PATH
+        :type path: Path | None
+        :return: Presence index
+        :rtype: PresenceIndex
+        """
+
+        path = path or index_path()
+
+        with np.load(path, allow_pickle=False) as cached:
+            index = cls(
+                sessions=cached["sessions"],
+                symbols=cached["symbols"].tolist(),
+                bits=cached["bits"],
+                first=cached["first"],
+                last=cached["last"]
+            )
+
+        current = calendar_sessions()
+
+        if not np.array_equal(index.sessions, current):
+            index = index.remap(current)
+
+        return index
+
+# --------------------------------------------------
+# Build and maintain
+# --------------------------------------------------
+
+@contextmanager
+def locked(path: Path | None = None):
+
+    """
+    Hold an exclusive lock on the cache file across read-modify-write,
+    staging worker processes update it concurrently
+    """
+
+    path = path or index_path()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path.with_name(path.name + ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def tracking(path: Path | None = None) -> bool:
+
+    """
+    True once an index has been built, loaders only maintain an existing one
+    """
+
+    path = path or index_path()
+
+    return path.exists()
+
+def build_presence(path: Path | None = None) -> PresenceIndex:
+
+    """
+    Rebuild the index from staging.stocks and cache it
+
+    :param path: Cache file, defaults to PRESENCE_INDEX_PATH
+    :type path: Path | None
+    :return: Presence index
+    :rtype: PresenceIndex
+    """
+
+    path = path or index_path()
+
+    index = PresenceIndex()
+
+    with locked(path):
+        off_calendar = index.record({symbol: parse_days(days) for symbol, days in fetch_all(STAGED_SESSIONS)})
+        index.save(path)
+
+    for symbol, days in off_calendar.items():
+        print(f"[WARN] {symbol}: {len(days)} candles on non-session dates, first {days[0]}")
+
+    print(f"[OK] presence index built: {len(index.symbols)} symbols x {len(index.sessions)} sessions")
+
+    return index
+
+def load_presence(path: Path | None = None) -> PresenceIndex:
+
+    """
+    Cached index, built from staging when there is no cache yet
+
+    :param path: Cache file, defaults to PRESENCE_INDEX_PATH
+    :type path: Path | None
+    :return: Presence index
+    :rtype: PresenceIndex
+    """
+
+    path = path or index_path()
+
+    if not path.exists():
+        return build_presence(path)
+
+    return PresenceIndex.load(path)
+
+def record_staged(staged: dict[str, np.ndarray], path: Path | None = None):
+
+    """
+    Mark candles committed by a staging load in the cached index
+
+    Called after the load commits. Without a cache there is nothing
+    to maintain, the next build reads staging.
+
+    :param staged: datetime64[D] trade dates per symbol
+    :type staged: dict[str, np.ndarray]
+    :param path: Cache file, defaults to PRESENCE_INDEX_PATH
+    :type path: Path | None
+    """
+
+    path = path or index_path()
+
+    if not staged or not path.exists():
+        return
+
+    try:
+        with locked(path):
+            index = PresenceIndex.load(path)
+            off_calendar = index.record(staged)
+            index.save(path)
+
+    except (OSError, ValueError) as e:
+        # The index is derived, a stale cache is rebuilt, never fails a load
+        print(f"[WARN] presence index not updated, rebuild it: {e}")
+        return
+
+    for symbol, days in off_calendar.items():
+        print(f"[WARN] {symbol}: {len(days)} candles on non-session dates, first {days[0]}")
+
+def find_gaps(symbols: list[str] | None = None, start: date | None = None, end: date | None = None, path: Path | None = None) -> dict[str, list[date]]:
+
+    """
+    Sessions missing from staging per symbol, see PresenceIndex.missing
+
+    :param symbols: Symbols to check, None for every staged symbol
+    :type symbols: list[str] | None
+    :param start: First session to check
+    :type start: date | None
+    :param end: Last session to check
+    :type end: date | None
+    :param path: Cache file, defaults to PRESENCE_INDEX_PATH
+    :type path: Path | None
+    :return: Missing sessions per symbol
+    :rtype: dict[str, list[date]]
+    """
+
+    path = path or index_path()
+
+    gaps = load_presence(path).missing(symbols, start, end)
+
+    print(f"[OK] {sum(len(days) for days in gaps.values())} missing sessions across {len(gaps)} symbols")
+
+    return gaps
+
+# --------------------------------------------------
+# Entry point
+# --------------------------------------------------
+
+def main():
+    build_presence()
+    find_gaps()
+
+if __name__ == "__main__":
+    main()
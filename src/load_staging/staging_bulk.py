@@ -0,0 +1,367 @@
+"""
+Bulk load validated candles into staging
+COPY into a temp table, merge with one INSERT ... SELECT
+"""
+
+from collections import Counter
+import numpy as np
+from src.load_staging.contract_columnar import CandleBatch, PRICE_SCALE
+from src.load_staging.presence_index import parse_days
+from src.utils.partitions import ensure_partitions, shadow_table
+from src.utils import metrics, settings
+from src.utils.custom_exceptions import *
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+# upsert: update conflicting candles whose row_hash changed (restatements)
+# insert: keep the first candle loaded for a symbol and trade date
+# STAGING_MERGE_MODE picks one, upsert by default
+MERGE_MODES = ("upsert", "insert")
+
+# Full rebuilds insert into the unindexed shadow, see src/utils/rebuild.py
+REBUILD = "rebuild"
+
+TABLE = "staging.stocks"
+
+# --------------------------------------------------
+# Columns / COPY types
+# --------------------------------------------------
+
+COLUMNS = [
+    "symbol",
+    "domain",
+    "source",
+    "ingestion_type",
+    "ingested_at",
+    "trade_date",
+    "open",
+    "high",
+    "low",
+    "close",
+    "adjusted_close",
+    "volume"
+]
+
+# Prices are copied as int64 scaled to 4dp, see CandleBatch
+
+COPY_TYPES = [
+    "text",
+    "text",
+    "text",
+    "text",
+    "timestamptz",
+    "date",
+    "int8",
+    "int8",
+    "int8",
+    "int8",
+    "int8",
+    "int8"
+]
+
+# --------------------------------------------------
+# SQL
+# --------------------------------------------------
+
+CREATE_TEMP = """
+CREATE TEMP TABLE staging_stocks_load (
+    symbol          TEXT NOT NULL,
+    domain          TEXT NOT NULL,
+    source          TEXT NOT NULL,
+    ingestion_type  TEXT NOT NULL,
+    ingested_at     TIMESTAMPTZ NOT NULL,
+    trade_date      DATE NOT NULL,
+    open            BIGINT NOT NULL,
+    high            BIGINT NOT NULL,
+    low             BIGINT NOT NULL,
+    close           BIGINT NOT NULL,
+    adjusted_close  BIGINT NOT NULL,
+    volume          BIGINT NOT NULL
+)
+ON COMMIT DROP;
+"""
+
+COPY = f"""
+COPY staging_stocks_load ({", ".join(COLUMNS)})
+FROM STDIN (FORMAT BINARY);
+"""
+
+LOAD_YEARS = """
+SELECT DISTINCT EXTRACT(year FROM trade_date)::INT
+FROM staging_stocks_load;
+"""
+
+# Every copied candle is in staging after the merge, inserted or not
+
+LOADED_SESSIONS = """
+SELECT symbol, string_agg((trade_date - DATE '1970-01-01')::TEXT, ',')
+FROM staging_stocks_load
+GROUP BY symbol;
+"""
+
+LOAD_ROWS = f"""
+SELECT
+    symbol,
+    domain,
+    source,
+    ingestion_type,
+    ingested_at,
+    trade_date,
+    open::NUMERIC / {PRICE_SCALE},
+    high::NUMERIC / {PRICE_SCALE},
+    low::NUMERIC / {PRICE_SCALE},
+    close::NUMERIC / {PRICE_SCALE},
+    adjusted_close::NUMERIC / {PRICE_SCALE},
+    volume
+FROM staging_stocks_load
+"""
+
+# Curated reads staging after its watermark (stage-wide or per
+# symbol) and the candles queued in etl.restated_candles. A candle
+# inserted at or behind that watermark, eg a backfilled symbol or a
+# refilled gap, is queued too or curated would never read it.
+
+QUEUE_BEHIND_CURATED = """
+LEFT JOIN etl.load_watermark as w
+    ON w.stage = 'curated'
+   AND w.symbol IN (c.symbol, '*')
+"""
+
+MERGE_INSERT = f"""
+WITH inserted AS (
+    INSERT INTO staging.stocks ({", ".join(COLUMNS)})
+    {LOAD_ROWS}
+    ON CONFLICT (symbol, trade_date) DO NOTHING
+    RETURNING symbol, trade_date
+),
+
+queued AS (
+    INSERT INTO etl.restated_candles (stage, symbol, trade_date)
+    SELECT DISTINCT 'curated', c.symbol, c.trade_date
+    FROM inserted as c
+    {QUEUE_BEHIND_CURATED}
+    WHERE c.trade_date <= w.high_water_date
+    ON CONFLICT (stage, symbol, trade_date) DO UPDATE
+    SET restated_at = now()
+)
+
+SELECT symbol, COUNT(*), 0
+FROM inserted
+GROUP BY symbol;
+"""
+
+# A candle may be copied twice in one load (history and a delta),
+# the latest ingested wins. Updated rows are queued for curated,
+# with inserted rows behind its watermark.
+# Every sub-statement sees staging as it was before the merge, so
+# a merged row that already existed was updated, not inserted
+# (xmax cannot be returned from a partitioned table).
+
+MERGE_UPSERT = f"""
+WITH merged AS (
+    INSERT INTO staging.stocks ({", ".join(COLUMNS)})
+    SELECT DISTINCT ON (symbol, trade_date) *
+    FROM ({LOAD_ROWS}) as load
+    ORDER BY symbol, trade_date, ingested_at DESC
+    ON CONFLICT (symbol, trade_date) DO UPDATE
+    SET domain = EXCLUDED.domain,
+        source = EXCLUDED.source,
+        ingestion_type = EXCLUDED.ingestion_type,
+        ingested_at = EXCLUDED.ingested_at,
+        open = EXCLUDED.open,
+        high = EXCLUDED.high,
+        low = EXCLUDED.low,
+        close = EXCLUDED.close,
+        adjusted_close = EXCLUDED.adjusted_close,
+        volume = EXCLUDED.volume
+    WHERE staging.stocks.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+    RETURNING symbol, trade_date
+),
+
+classified AS (
+    SELECT
+        m.symbol,
+        m.trade_date,
+        NOT EXISTS (
+            SELECT 1
+            FROM staging.stocks as s
+            WHERE s.symbol = m.symbol
+              AND s.trade_date = m.trade_date
+        ) as inserted
+    FROM merged as m
+),
+
+queued AS (
+    INSERT INTO etl.restated_candles (stage, symbol, trade_date)
+    SELECT DISTINCT 'curated', c.symbol, c.trade_date
+    FROM classified as c
+    {QUEUE_BEHIND_CURATED}
+    WHERE NOT c.inserted
+       OR c.trade_date <= w.high_water_date
+    ON CONFLICT (stage, symbol, trade_date) DO UPDATE
+    SET restated_at = now()
+)
+
+SELECT
+    symbol,
+    COUNT(*) FILTER (WHERE inserted),
+    COUNT(*) FILTER (WHERE NOT inserted)
+FROM classified
+GROUP BY symbol;
+"""
+
+# Rebuild: each symbol is loaded once into the shadow, which has no
+# unique index yet, so duplicates within the load are dropped here
+
+MERGE_REBUILD = f"""
+WITH inserted AS (
+    INSERT INTO {shadow_table(TABLE)} ({", ".join(COLUMNS)})
+    SELECT DISTINCT ON (symbol, trade_date) *
+    FROM ({LOAD_ROWS}) as load
+    ORDER BY symbol, trade_date, ingested_at DESC
+    RETURNING symbol
+)
+
+SELECT symbol, COUNT(*), 0
+FROM inserted
+GROUP BY symbol;
+"""
+
+# Candles only in the live table, eg loaded from daily incremental
+# objects, or of symbols whose raw history failed to load
+
+CARRY_OVER = f"""
+INSERT INTO {shadow_table(TABLE)} ({", ".join(COLUMNS)})
+SELECT {", ".join(COLUMNS)}
+FROM {TABLE} as live
+WHERE NOT EXISTS (
+    SELECT 1
+    FROM {shadow_table(TABLE)} as s
+    WHERE s.symbol = live.symbol
+      AND s.trade_date = live.trade_date
+);
+"""
+
+MERGES = {"upsert": MERGE_UPSERT, "insert": MERGE_INSERT, REBUILD: MERGE_REBUILD}
+
+# --------------------------------------------------
+# Temp table
+# --------------------------------------------------
+
+def create_load_table(conn):
+
+    """
+    Create the transaction scoped temp table used for COPY
+
+    :param conn: Open connection, inside a transaction
+    """
+
+    with conn.cursor() as cur:
+        cur.execute(CREATE_TEMP)
+
+# --------------------------------------------------
+# COPY validated candles
+# --------------------------------------------------
+
+def copy_batch(conn, batch: CandleBatch) -> Counter:
+
+    """
+    Stream a validated candle batch into the temp table with binary COPY
+
+    :param conn: Open connection, temp table created
+    :param batch: Validated candles
+    :type batch: CandleBatch
+    :return: Rows copied per symbol
+    :rtype: Counter
+    """
+
+    with conn.cursor() as cur, metrics.timer("etl_db_copy", table="staging_stocks_load"):
+        with cur.copy(COPY) as copy:
+            copy.set_types(COPY_TYPES)
+
+            for row in batch.rows():
+                copy.write_row(row)
+
+    return Counter(batch.symbol.tolist())
+
+# --------------------------------------------------
+# Merge temp table into staging
+# --------------------------------------------------
+
+def merge_into_staging(conn, mode: str | None = None) -> tuple[Counter, Counter]:
+
+    """
+    Merge copied candles into staging.stocks
+
+    In upsert mode an existing (symbol, trade_date) is updated only
+    when its row_hash differs, i.e. the candle was restated, and is
+    queued in etl.restated_candles for curated. In insert mode
+    existing candles are left as they are. Either way new candles at
+    or behind the curated watermark are queued as well. In rebuild
+    mode candles are inserted into the shadow of a full rebuild
+    instead.
+
+    :param conn: Open connection, candles copied
+    :param mode: upsert, insert or rebuild, defaults to STAGING_MERGE_MODE
+    :type mode: str | None
+    :return: Rows inserted and rows updated per symbol
+    :rtype: tuple[Counter, Counter]
+    """
+
+    mode = mode or settings.get("STAGING_MERGE_MODE", "upsert")
+
+    if mode not in MERGES:
+        raise ConfigError(f"Unknown staging merge mode: {mode}")
+
+    table = shadow_table(TABLE) if mode == REBUILD else TABLE
+
+    with conn.cursor() as cur:
+        cur.execute(LOAD_YEARS)
+        ensure_partitions(conn, table, [row[0] for row in cur.fetchall()])
+
+        with metrics.timer("etl_db_merge", table=table):
+            cur.execute(MERGES[mode])
+            rows = cur.fetchall()
+
+    inserted = Counter({symbol: count for symbol, count, _ in rows if count})
+    updated = Counter({symbol: count for symbol, _, count in rows if count})
+
+    metrics.count("etl_restated_total", sum(updated.values()), stage="staging")
+
+    return inserted, updated
+
+def carry_over(conn) -> int:
+
+    """
+    Copy candles missing from a rebuilt shadow from the live table,
+    raw history is not the only source of staging
+
+    :param conn: Open connection, shadow loaded
+    :return: Candles carried over
+    :rtype: int
+    """
+
+    with conn.cursor() as cur, metrics.timer("etl_db_merge", table=shadow_table(TABLE)):
+        cur.execute(CARRY_OVER)
+        return cur.rowcount
+
+# --------------------------------------------------
+# Trade dates loaded, for the presence index
+# --------------------------------------------------
+
+def loaded_sessions(conn) -> dict[str, np.ndarray]:
+
+    """
+    Trade dates copied into the temp table per symbol, read after
+    the merge so the presence index can be updated once it commits
+
+    :param conn: Open connection, candles merged
+    :return: datetime64[D] trade dates per symbol
+    :rtype: dict[str, np.ndarray]
+    """
+
+    with conn.cursor() as cur:
+        cur.execute(LOADED_SESSIONS)
+        return {symbol: parse_days(days) for symbol, days in cur.fetchall()}
@@ -1,87 +1,782 @@
 """
-Extract and load EOD historical from s3 raw to staging
+Extract and load EOD historical from raw storage to staging
 """
 
-import json
-import sys
-from src.utils.s3config import s3_bucket, client
+from collections import Counter
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import closing
+from functools import partial
+from itertools import chain, islice
+from typing import Iterator
+from src.utils.storage import get_storage, newest_raw_key
 from src.utils.get_sp500_tickers import get_symbols
-from src.load_staging.contract_historical import validate_historical_data
-from src.utils.db import execute
+from src.load_staging.contract_columnar import CandleBatch
+from src.load_staging.contract_historical import validate_historical_batch
+from src.load_staging.staging_bulk import create_load_table, copy_batch, merge_into_staging, carry_over, loaded_sessions, REBUILD, TABLE
+from src.load_staging.presence_index import tracking, record_staged
+from src.utils import db, checkpoint, manifest, metrics, settings
+from src.utils.db import transaction
+from src.utils.raw_format import open_payload, ContentDigest, DIGEST_FIELD, RAW_EXTENSIONS
+from src.utils.pipelined import pipelined, Handoff
+from src.utils.rebuild import rebuild
+from src.utils.watermark import get_symbol_watermarks, advance_symbol_watermarks
 from src.utils.custom_exceptions import *
 
 # --------------------------------------------------
-# SQL
-# --------------------------------------------------
-
-INSERT = """
-
-INSERT INTO staging.stocks (
-    symbol,
-    domain,
-    source,
-    ingestion_type,
-    ingested_at,
-    trade_date,
-    open,
-    high,
-    low,
-    close,
-    adjusted_close,
-    volume
-) VALUES (
-    %(symbol)s,
-    %(domain)s,
-    %(source)s,
-    %(ingestion_type)s,
-    %(ingested_at)s,
-    %(trade_date)s,
-    %(open)s,
-    %(high)s,
-    %(low)s,
-    %(close)s,
-    %(adjusted_close)s,
-    %(volume)s
-)
-ON CONFLICT (symbol, trade_date) DO NOTHING;
+# Config
+# --------------------------------------------------
 
-"""
+# Read on use: STAGING_BATCH_SIZE symbols per transaction (25),
+# STAGING_WORKERS worker processes, 1 loads in-process (1)
+
+# Watermark stage, latest delta from_date loaded per symbol
+DELTA_STAGE = "staging_delta"
 
 # --------------------------------------------------
-# Load EOD Historical into staging
+# Open raw payload
+# --------------------------------------------------
+
+def historical_prefix(symbol: str, domain: str = "sp500") -> str:
+
+    """
+    Raw historical prefix for a symbol, holds the full history
+    and its dated deltas
+
+    :param symbol: Stock symbol
+    :type symbol: str
+    :param domain: Stock domain eg sp500
+    :type domain: str
+    :return: Key prefix without trailing slash
+    :rtype: str
+    """
+
+    return f"raw/stocks/daily/historical/domain={domain}/symbol={symbol}"
+
+def open_raw(key: str) -> tuple:
+
+    """
+    Open a raw object from storage as a stream
+
+    :param key: Object key
+    :type key: str
+    :return: Streaming body and ETag
+    :rtype: tuple
+    """
+
+    return get_storage().open(key)
+
+def list_deltas(symbol: str, domain: str = "sp500", after: date | None = None) -> list[tuple[date, str]]:
+
+    """
+    List dated delta objects written for a symbol, open ended deltas
+    (eod_delta_<from>) and bounded gap re-fetches (eod_delta_<from>_<to>)
+
+    :param symbol: Stock symbol
+    :type symbol: str
+    :param domain: Stock domain eg sp500
+    :type domain: str
+    :param after: Only deltas starting after this date
+    :type after: date | None
+    :return: (from_date, key) in from_date order
+    :rtype: list[tuple[date, str]]
+    """
+
+    prefix = f"{historical_prefix(symbol, domain)}/eod_delta_"
+
+    return [(from_date, obj["key"]) for from_date, obj in select_deltas(get_storage().list(prefix), prefix, after)]
+
+def select_deltas(objects: list[dict], prefix: str, after: date | None = None) -> list[tuple[date, dict]]:
+
+    """
+    Pick the delta objects from a listing, the newest raw format of each
+
+    :param objects: Listed objects
+    :type objects: list[dict]
+    :param prefix: Delta key prefix, ending in eod_delta_
+    :type prefix: str
+    :param after: Only deltas starting after this date
+    :type after: date | None
+    :return: (from_date, object) in from_date order
+    :rtype: list[tuple[date, dict]]
+    """
+
+    latest = {}
+
+    for obj in objects:
+        if not obj["key"].startswith(prefix):
+            continue
+
+        name = obj["key"][len(prefix):]
+        dates = name[:21] if name[10:11] == "_" else name[:10]
+
+        if name[len(dates):] not in RAW_EXTENSIONS:
+            continue
+
+        # Same delta in several raw formats, newest wins
+        if dates not in latest or obj["last_modified"] > latest[dates]["last_modified"]:
+            latest[dates] = obj
+
+    deltas = [(date.fromisoformat(dates[:10]), latest[dates]) for dates in sorted(latest)]
+
+    return [(from_date, obj) for from_date, obj in deltas if after is None or from_date > after]
+
+# --------------------------------------------------
+# Parse and validate one raw object
+# --------------------------------------------------
+
+def parse_raw(body, entry: dict) -> Iterator[CandleBatch]:
+
+    """
+    Decode and validate a raw historical payload chunk by chunk,
+    yielding each chunk's valid candles as it is read
+
+    Once the body is read, entry holds its content digest and the
+    rows it held, valid or rejected.
+
+    :param body: Streaming body of the raw payload
+    :param entry: Manifest entry of the object, digest and row_count are set
+    :type entry: dict
+    :return: Valid candle batches
+    :rtype: Iterator[CandleBatch]
+    """
+
+    rows = 0
+
+    with closing(body):
+        meta, chunks = open_payload(body)
+
+        # Payloads written before digests were added are hashed as read
+        digest = meta.get(DIGEST_FIELD)
+        hashed = ContentDigest() if digest is None else None
+
+        for chunk in chunks:
+            if hashed is not None:
+                hashed.update(chunk)
+
+            with metrics.timer("etl_validate", stage="staging_historical"):
+                batch, rejects = validate_historical_batch(meta, chunk)
+
+            for reject in rejects:
+                metrics.log("candle_rejected", "REJECTED", symbol=meta.get("symbol"), candle=reject["candle"], reason=reject["reason"])
+
+            metrics.count("etl_rejected_total", len(rejects), stage="staging_historical")
+            rows += len(batch) + len(rejects)
+
+            yield batch
+
+    entry["digest"] = digest or hashed.hexdigest()
+    entry["row_count"] = rows
+
+def copy_raw(conn, body) -> tuple[Counter, int, str]:
+
+    """
+    Validate a raw historical payload chunk by chunk and COPY each
+    chunk as it is read
+
+    :param conn: Open connection, temp table created
+    :param body: Streaming body of the raw payload
+    :return: Rows copied per symbol, rows rejected and content digest
+    :rtype: tuple[Counter, int, str]
+    """
+
+    entry = {}
+    copied = Counter()
+
+    for batch in parse_raw(body, entry):
+        copied.update(copy_batch(conn, batch))
+
+    return copied, entry["row_count"] - copied.total(), entry["digest"]
+
 # --------------------------------------------------
+# List and parse a symbol ahead of the loader
+# --------------------------------------------------
+
+def list_symbol(symbol: str, loaded: dict[str, dict] | None = None) -> dict:
+
+    """
+    List a symbol's full history and all of its deltas with one
+    listing, picking the objects not loaded at their current version
+
+    :param symbol: Stock symbol
+    :type symbol: str
+    :param loaded: Manifest entries of loaded objects, see manifest.loaded
+    :type loaded: dict[str, dict] | None
+    :return: symbol, etag of the history, deltas, objects to load and
+        rows in unchanged objects
+    :rtype: dict
+    """
+
+    prefix = historical_prefix(symbol)
+    objects = get_storage().list(f"{prefix}/")
+
+    key = newest_raw_key(objects, f"{prefix}/eod_history")
+
+    if key is None:
+        raise ConfigError(f"No raw historical object for {symbol}")
+
+    history = next(obj for obj in objects if obj["key"] == key)
+    deltas = select_deltas(objects, f"{prefix}/eod_delta_")
+
+    load = []
+    unchanged = 0
+
+    for obj in [history] + [obj for _, obj in deltas]:
+        if loaded and manifest.is_loaded(loaded, obj):
+            unchanged += loaded[obj["key"]]["row_count"] or 0
+            metrics.count("etl_raw_unchanged_total", stage="staging")
+            continue
+
+        load.append(obj["key"])
+
+    return {
+        "symbol": symbol,
+        "etag": history["etag"],
+        "deltas": [(from_date, obj["key"]) for from_date, obj in deltas],
+        "keys": load,
+        "unchanged": unchanged
+    }
+
+def parse_symbol(listed: dict, depth: int = 2) -> Handoff:
+
+    """
+    Stream a symbol's listed objects to the loader, opened, decoded
+    and validated a chunk at a time on the parse thread
+
+    :param listed: Output of list_symbol
+    :type listed: dict
+    :param depth: Chunks parsed ahead of the COPY
+    :type depth: int
+    :return: Handoff of candle batches, its value the listing with rows
+        rejected and manifest entries of the objects, complete once
+        every batch is read
+    :rtype: Handoff
+    """
+
+    parsed = {**listed, "rejected": 0, "objects": {}}
+
+    def batches() -> Iterator[CandleBatch]:
+        for key in listed["keys"]:
+            stream, etag = open_raw(key)
+            entry = {"symbol": listed["symbol"], "etag": etag}
+            valid = 0
 
-def load_staging_historical():
+            for batch in parse_raw(stream, entry):
+                valid += len(batch)
+                yield batch
+
+            parsed["rejected"] += entry["row_count"] - valid
+            parsed["objects"][key] = entry
+
+    return Handoff(parsed, batches(), depth)
+
+def prefetched(symbols: list[str], skip_loaded: bool = True):
 
     """
-    Inserts EOD historical staging data into db
+    List and parse symbols ahead of the loader on worker threads
+
+    A symbol is handed to the loader as soon as its parse starts and
+    is streamed to it at most STAGING_PARSE_CHUNKS chunks ahead of the
+    COPY, so the bytes held do not grow with a symbol's history.
+    Symbols in flight are bounded by the queue depth of each step.
+
+    :param symbols: Symbols to load
+    :type symbols: list[str]
+    :param skip_loaded: Skip raw objects already loaded at their digest
+    :type skip_loaded: bool
+    :return: (symbol, handoff, error) per symbol as its parse starts
     """
 
-    symbols = get_symbols()
+    loaded = manifest.loaded(symbols) if skip_loaded else None
 
-    for symbol in symbols:
-        key = (f"raw/stocks/daily/historical/domain=sp500/symbol={symbol}/eod_history.json")
-        request = client.get_object(
-            Bucket=s3_bucket,
-            Key=key
+    # Listing, parsing and loading overlap: threads per step, and
+    # symbols held between steps before the upstream step blocks
+    return pipelined(symbols, [
+        (
+            "prefetch",
+            partial(list_symbol, loaded=loaded),
+            settings.get_int("STAGING_PREFETCH_WORKERS", 8),
+            settings.get_int("STAGING_PREFETCH_DEPTH", 16)
+        ),
+        (
+            "parse",
+            partial(parse_symbol, depth=settings.get_int("STAGING_PARSE_CHUNKS", 2)),
+            settings.get_int("STAGING_PARSE_WORKERS", 2),
+            settings.get_int("STAGING_PARSE_DEPTH", 8)
         )
+    ])
+
+# --------------------------------------------------
+# Load a batch of symbols in one transaction
+# --------------------------------------------------
+
+def run_batch(symbols: list[str], run_id: str, skip_loaded: bool, merge_mode: str | None) -> tuple[dict, dict]:
+
+    """
+    Worker task, load a batch and hand back the metrics it recorded
+    """
+
+    return load_symbol_batch(symbols, run_id, skip_loaded, merge_mode), metrics.drain()
+
+def load_symbol_batch(symbols: list[str], run_id: str | None = None, skip_loaded: bool = True, merge_mode: str | None = None) -> dict[str, dict]:
 
-        raw = request["Body"].read()
-    
-        payload = json.loads(raw)
+    """
+    Load a batch of symbols in a single transaction, downloads and
+    parsing overlapping the COPY
+
+    :param symbols: Symbols to load
+    :type symbols: list[str]
+    :param run_id: Backfill run id for checkpoints
+    :type run_id: str | None
+    :param skip_loaded: Skip raw objects already loaded at their digest
+    :type skip_loaded: bool
+    :param merge_mode: upsert, insert or rebuild, see merge_into_staging
+    :type merge_mode: str | None
+    :return: Inserted/updated/duplicate/rejected/unchanged counts per symbol
+    :rtype: dict[str, dict]
+    """
+
+    with closing(prefetched(symbols, skip_loaded)) as parsed:
+        return load_parsed(parsed, run_id, merge_mode)
+
+def load_prefetched(symbols: list[str], batch_size: int, run_id: str | None = None, skip_loaded: bool = True, merge_mode: str | None = None):
+
+    """
+    Stream all symbols through one prefetch/parse pipeline, loading
+    them in transactions of batch_size symbols. The next symbols are
+    listed and parsed while the current one is copied.
 
-        data = payload["data"] 
+    :param symbols: Symbols to load
+    :type symbols: list[str]
+    :param batch_size: Symbols per COPY/merge transaction
+    :type batch_size: int
+    :param run_id: Backfill run id for checkpoints
+    :type run_id: str | None
+    :param skip_loaded: Skip raw objects already loaded at their digest
+    :type skip_loaded: bool
+    :param merge_mode: upsert, insert or rebuild, see merge_into_staging
+    :type merge_mode: str | None
+    :return: Per-symbol counts for each committed batch
+    """
+
+    with closing(prefetched(symbols, skip_loaded)) as parsed:
+        for first in parsed:
+            yield load_parsed(chain([first], islice(parsed, batch_size - 1)), run_id, merge_mode)
 
-        meta = {k: v for k, v in payload.items() if k != "data"}
+def load_parsed(parsed, run_id: str | None = None, merge_mode: str | None = None) -> dict[str, dict]:
+
+    """
+    COPY parsed symbols into a temp table chunk by chunk as they
+    arrive and merge into staging.stocks in a single transaction
+
+    Each symbol's full history is loaded with all of its deltas,
+    except objects already loaded at their digest. Staging checkpoints
+    and the raw manifest for the batch commit with the merged rows.
+    A rebuild writes none of them, they describe the live table.
+
+    :param parsed: (symbol, handoff, error) from prefetched
+    :param run_id: Backfill run id for checkpoints
+    :type run_id: str | None
+    :param merge_mode: upsert, insert or rebuild, see merge_into_staging
+    :type merge_mode: str | None
+    :return: Inserted/updated/duplicate/rejected/unchanged counts per symbol
+    :rtype: dict[str, dict]
+    """
 
-        for candle in data:
+    copied = Counter()
+    rejected = Counter()
+    unchanged = Counter()
+    checkpoints = {}
+    delta_dates = {}
+    objects = {}
+
+    with transaction() as conn:
+        create_load_table(conn)
+
+        for symbol, handoff, error in parsed:
+            symbol_copied = Counter()
+
+            try:
+                if error is not None:
+                    raise error
+
+                # Savepoint per symbol, a bad payload only discards its own rows
+                with closing(handoff), conn.transaction(), metrics.timer("etl_pipeline_step", step="load"):
+                    for batch in handoff:
+                        symbol_copied.update(copy_batch(conn, batch))
+
+            except Exception as e:
+                print(f"[WARN] {symbol} skipped: {e}")
+                checkpoints[symbol] = {"error": str(e)}
+                continue
+
+            loaded = handoff.value
+
+            copied.update(symbol_copied)
+            rejected[symbol] += loaded["rejected"]
+            unchanged[symbol] += loaded["unchanged"]
+            objects.update(loaded["objects"])
+            checkpoints[symbol] = {"etag": loaded["etag"], "row_count": symbol_copied[symbol] + loaded["rejected"] + loaded["unchanged"]}
+
+            if loaded["deltas"]:
+                delta_dates[symbol] = loaded["deltas"][-1][0]
+
+        inserted, updated = merge_into_staging(conn, merge_mode)
+
+        if merge_mode == REBUILD:
+            staged = {}
+        else:
+            staged = loaded_sessions(conn) if tracking() else {}
+
+            checkpoint.record(checkpoint.STAGING, checkpoints, run_id, conn=conn)
+            manifest.record_loaded(objects, conn=conn)
+            advance_symbol_watermarks(conn, DELTA_STAGE, delta_dates)
+
+    record_staged(staged)
+
+    return {
+        symbol: {
+            "inserted": inserted[symbol],
+            "updated": updated[symbol],
+            "duplicate": copied[symbol] - inserted[symbol] - updated[symbol],
+            "rejected": rejected[symbol],
+            "unchanged": unchanged[symbol]
+        }
+        for symbol, result in checkpoints.items()
+        if "error" not in result
+    }
+
+# --------------------------------------------------
+# Worker processes
+# --------------------------------------------------
+
+def init_worker():
+
+    """
+    Give each worker process its own single-connection pool
+    """
+
+    db.discard_pool()
+    db.init_pool(min_size=1, max_size=1)
+
+    # Metrics inherited from the parent are already counted there
+    metrics.reset()
+
+def load_parallel(batches: list[list[str]], workers: int, run_id: str, skip_loaded: bool = True, merge_mode: str | None = None):
+
+    """
+    Load symbol batches across a process pool, yielding results
+    as each batch completes
+
+    :param batches: Symbol batches, one COPY/merge transaction each
+    :type batches: list[list[str]]
+    :param workers: Worker processes
+    :type workers: int
+    :param run_id: Backfill run id for checkpoints
+    :type run_id: str
+    :param skip_loaded: Skip raw objects already loaded at their digest
+    :type skip_loaded: bool
+    :param merge_mode: upsert, insert or rebuild, see merge_into_staging
+    :type merge_mode: str | None
+    :return: Per-symbol counts for each completed batch
+    """
+
+    # Pooled connections cannot be shared with forked children
+    db.close_pool()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        futures = {executor.submit(run_batch, batch, run_id, skip_loaded, merge_mode): batch for batch in batches}
+
+        for future in as_completed(futures):
             try:
-                grain = validate_historical_data(meta, candle)
+                result, worker_metrics = future.result()
+                metrics.merge(worker_metrics)
+                yield result
+
+            except Exception as e:
+                print(f"[ERROR] batch {futures[future][0]}..{futures[future][-1]} failed: {e}")
+                yield {}
+
+# --------------------------------------------------
+# Load symbol batches
+# --------------------------------------------------
+
+def load_symbols(
+    symbols: list[str],
+    batch_size: int,
+    workers: int,
+    run_id: str,
+    skip_loaded: bool = True,
+    merge_mode: str | None = None,
+    stage_name: str = "staging_historical"
+) -> dict[str, dict]:
+
+    """
+    Load symbols in batches, in-process or across worker processes
+
+    :param symbols: Symbols to load
+    :type symbols: list[str]
+    :param batch_size: Symbols per COPY/merge transaction
+    :type batch_size: int
+    :param workers: Worker processes, 1 loads in-process
+    :type workers: int
+    :param run_id: Backfill run id for checkpoints
+    :type run_id: str
+    :param skip_loaded: Skip raw objects already loaded at their digest
+    :type skip_loaded: bool
+    :param merge_mode: upsert, insert or rebuild, see merge_into_staging
+    :type merge_mode: str | None
+    :param stage_name: Stage the rows are reported under
+    :type stage_name: str
+    :return: Inserted/updated/duplicate/rejected/unchanged counts per symbol
+    :rtype: dict[str, dict]
+    """
+
+    batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+
+    if workers > 1 and len(batches) > 1:
+        completed = load_parallel(batches, min(workers, len(batches)), run_id, skip_loaded, merge_mode)
+    else:
+        completed = load_prefetched(symbols, batch_size, run_id, skip_loaded, merge_mode)
+
+    results = {}
+
+    for batch in completed:
+        for symbol, counts in batch.items():
+            metrics.log("symbol_staged", symbol=symbol, **counts)
+
+        results.update(batch)
+
+    totals = Counter()
+
+    for counts in results.values():
+        totals.update(counts)
+
+    metrics.rows(stage_name, sum(totals.values()) - totals["unchanged"])
+
+    print(
+        f"[OK] {stage_name.replace("_", " ")}: {len(results)}/{len(symbols)} symbols "
+        f"inserted={totals["inserted"]} updated={totals["updated"]} duplicate={totals["duplicate"]} "
+        f"rejected={totals["rejected"]} unchanged={totals["unchanged"]}"
+    )
+
+    return results
+
+# --------------------------------------------------
+# Load EOD Historical into staging
+# --------------------------------------------------
+
+@metrics.stage("staging_historical")
+def load_staging_historical(
+    symbols: list[str] | None = None,
+    batch_size: int | None = None,
+    workers: int | None = None,
+    run_id: str | None = None,
+    resume: bool = True
+) -> dict[str, dict]:
+
+    """
+    Bulk loads EOD historical staging data into db
+
+    Raw objects are listed and parsed on worker threads ahead of the
+    loader through bounded queues (STAGING_PREFETCH_*/PARSE_*), and
+    streamed to the COPY a chunk at a time.
+    With more than one worker the symbol batches are sharded across
+    a process pool, each worker loading with its own connection.
+
+    Symbols already loaded in this run are skipped unless their raw
+    object has been rewritten since, failed symbols are retried. Raw
+    objects already loaded at their content digest, in any run, are
+    not downloaded again (etl.raw_manifest).
+
+    :param symbols: Symbols to load, defaults to config symbols
+    :type symbols: list[str] | None
+    :param batch_size: Symbols per COPY/merge transaction, defaults to STAGING_BATCH_SIZE
+    :type batch_size: int | None
+    :param workers: Worker processes, 1 loads in-process, defaults to STAGING_WORKERS
+    :type workers: int | None
+    :param run_id: Backfill run id for checkpoints, pass a previous
+        run's id to resume it, defaults to checkpoint.current_run_id()
+    :type run_id: str | None
+    :param resume: Skip symbols and raw objects already loaded, False
+        reloads everything, eg after staging was truncated
+    :type resume: bool
+    :return: Inserted/updated/duplicate/rejected/unchanged counts per symbol
+    :rtype: dict[str, dict]
+    """
+
+    if symbols is None:
+        symbols = get_symbols()
+
+    batch_size = batch_size or settings.get_int("STAGING_BATCH_SIZE", 25)
+    workers = workers or settings.get_int("STAGING_WORKERS", 1)
+    run_id = run_id or checkpoint.current_run_id()
+
+    if resume:
+        remaining = checkpoint.pending(symbols, checkpoint.STAGING, run_id, upstream=checkpoint.raw_stage())
+
+        if len(remaining) < len(symbols):
+            print(f"[SKIP] {len(symbols) - len(remaining)} symbols already loaded in run {run_id}")
+
+        symbols = remaining
+
+    return load_symbols(symbols, batch_size, workers, run_id, skip_loaded=resume)
+
+# --------------------------------------------------
+# Rebuild staging from raw
+# --------------------------------------------------
+
+@metrics.stage("staging_rebuild")
+def rebuild_staging_historical(
+    symbols: list[str] | None = None,
+    batch_size: int | None = None,
+    workers: int | None = None,
+    keep_old: bool | None = None
+) -> dict[str, dict]:
+
+    """
+    Rebuild staging.stocks from all raw history into a fresh shadow
+    table, indexed after the load and swapped in, see src/utils/rebuild.py
+
+    Every raw object is reloaded regardless of the manifest. Candles
+    the raw history does not hold (daily incremental loads, symbols
+    that failed) are carried over from the live table. Checkpoints,
+    the raw manifest and delta watermarks are left as they are, the
+    rebuilt table holds everything they record.
+
+    :param symbols: Symbols to load, defaults to config symbols
+    :type symbols: list[str] | None
+    :param batch_size: Symbols per COPY/insert transaction, defaults to STAGING_BATCH_SIZE
+    :type batch_size: int | None
+    :param workers: Worker processes, 1 loads in-process, defaults to STAGING_WORKERS
+    :type workers: int | None
+    :param keep_old: Keep the replaced table as staging.stocks_old, defaults to REBUILD_KEEP_OLD
+    :type keep_old: bool | None
+    :return: Inserted/duplicate/rejected counts per symbol
+    :rtype: dict[str, dict]
+    """
+
+    if symbols is None:
+        symbols = get_symbols()
+
+    batch_size = batch_size or settings.get_int("STAGING_BATCH_SIZE", 25)
+    workers = workers or settings.get_int("STAGING_WORKERS", 1)
+
+    def load() -> dict[str, dict]:
+        results = load_symbols(symbols, batch_size, workers, checkpoint.current_run_id(), skip_loaded=False, merge_mode=REBUILD, stage_name="staging_rebuild")
+
+        with transaction() as conn:
+            carried = carry_over(conn)
+
+        print(f"[OK] {carried} candles carried over from {TABLE}")
+
+        return results
+
+    return rebuild(TABLE, load, keep_old=keep_old)
+
+# --------------------------------------------------
+# Load new historical deltas into staging
+# --------------------------------------------------
+
+@metrics.stage("staging_deltas")
+def load_staging_deltas(symbols: list[str] | None = None, keys: dict[str, str] | None = None) -> dict[str, dict]:
+
+    """
+    Load delta objects not yet staged, in a single transaction
+
+    Each delta is loaded once, tracked by a per-symbol watermark on
+    the delta from_date advanced with the merge. Gap re-fetches are
+    older than the watermark and are loaded by key instead, without
+    moving it. Loaded objects are marked in the raw manifest with the
+    merge, so an unchanged gap re-fetch is only skipped once staged.
+
+    :param symbols: Symbols to load, defaults to config symbols
+    :type symbols: list[str] | None
+    :param keys: Delta key per symbol to load regardless of watermark
+    :type keys: dict[str, str] | None
+    :return: Inserted/updated/duplicate/rejected counts per symbol
+    :rtype: dict[str, dict]
+    """
+
+    if keys is not None:
+        symbols = list(keys)
+
+    elif symbols is None:
+        symbols = get_symbols()
+
+    copied = Counter()
+    rejected = Counter()
+    delta_dates = {}
+    objects = {}
+
+    with transaction() as conn:
+        create_load_table(conn)
+
+        loaded = get_symbol_watermarks(conn, DELTA_STAGE)
+
+        for symbol in symbols:
+            symbol_copied = Counter()
+            symbol_rejected = 0
+            symbol_objects = {}
+
+            try:
+                if keys is not None:
+                    deltas = [(None, keys[symbol])]
+                else:
+                    deltas = list_deltas(symbol, after=loaded.get(symbol))
+
+                if not deltas:
+                    continue
+
+                with conn.transaction():
+                    for _, key in deltas:
+                        stream, etag = open_raw(key)
+                        delta_copied, delta_rejected, digest = copy_raw(conn, stream)
+                        symbol_copied.update(delta_copied)
+                        symbol_rejected += delta_rejected
+
+                        symbol_objects[key] = {
+                            "symbol": symbol,
+                            "digest": digest,
+                            "etag": etag,
+                            "row_count": sum(delta_copied.values()) + delta_rejected
+                        }
+
+            except Exception as e:
+                print(f"[WARN] {symbol} deltas skipped: {e}")
+                continue
+
+            copied.update(symbol_copied)
+            rejected[symbol] += symbol_rejected
+            delta_dates[symbol] = deltas[-1][0]
+            objects.update(symbol_objects)
+
+        inserted, updated = merge_into_staging(conn)
+        staged = loaded_sessions(conn) if tracking() else {}
+
+        manifest.record_loaded(objects, conn=conn)
+
+        if keys is None:
+            advance_symbol_watermarks(conn, DELTA_STAGE, delta_dates)
+
+    record_staged(staged)
+
+    results = {
+        symbol: {
+            "inserted": inserted[symbol],
+            "updated": updated[symbol],
+            "duplicate": copied[symbol] - inserted[symbol] - updated[symbol],
+            "rejected": rejected[symbol]
+        }
+        for symbol in delta_dates
+    }
+
+    for symbol, counts in results.items():
+        metrics.log("symbol_deltas_staged", symbol=symbol, **counts)
 
-                execute(INSERT, grain)
+    metrics.rows("staging_deltas", sum(sum(counts.values()) for counts in results.values()))
 
-            except RuntimeError as e:
-                print(f"[REJECTED] candle: {candle}: {e}")
+    return results
 
 # --------------------------------------------------
 # Entrypoint
@@ -91,4 +786,4 @@ def main():
     load_staging_historical()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
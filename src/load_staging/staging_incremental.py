@@ -1,86 +1,108 @@
 """
-Extract and load EOD incremental from s3 raw to staging
+Extract and load EOD incremental from raw storage to staging
 """
 
-import json
-from datetime import datetime, timedelta, timezone
-from src.utils.s3config import s3_bucket, client
-from src.load_staging.contract_incremental import validate_incremental_data
-from src.utils.db import execute
+from collections import Counter
+from contextlib import closing
+from datetime import datetime, timedelta, timezone, date
+from src.utils.storage import get_storage
+from src.load_staging.contract_incremental import validate_incremental_batch
+from src.load_staging.staging_bulk import create_load_table, copy_batch, merge_into_staging, loaded_sessions
+from src.load_staging.presence_index import tracking, record_staged
+from src.utils.db import transaction
+from src.utils import metrics
+from src.utils.raw_format import open_payload
 from src.utils.custom_exceptions import *
 
 # --------------------------------------------------
-# SQL
+# Reject policies
 # --------------------------------------------------
 
-INSERT = """
-INSERT INTO staging.stocks (
-    symbol,
-    domain,
-    source,
-    ingestion_type,
-    ingested_at,
-    trade_date,
-    open,
-    high,
-    low,
-    close,
-    adjusted_close,
-    volume
-) VALUES (
-    %(symbol)s,
-    %(domain)s,
-    %(source)s,
-    %(ingestion_type)s,
-    %(ingested_at)s,
-    %(trade_date)s,
-    %(open)s,
-    %(high)s,
-    %(low)s,
-    %(close)s,
-    %(adjusted_close)s,
-    %(volume)s
-)
-ON CONFLICT (symbol, trade_date) DO NOTHING;
-"""
+# quarantine: load valid candles, report rejected candles
+# all_or_nothing: load nothing if any candle is rejected
+
+POLICIES = ("quarantine", "all_or_nothing")
 
 # --------------------------------------------------
 # Load EOD Incremental into staging
 # --------------------------------------------------
 
-def load_staging_incremental():
+@metrics.stage("staging_incremental")
+def load_staging_incremental(eod_date: date | None = None, policy: str = "quarantine") -> dict:
 
     """
-    Loads incremental EOD data into db
+    Loads incremental EOD data into db as one atomic batch
+
+    :param eod_date: Trade date to load, defaults to yesterday (UTC)
+    :type eod_date: date | None
+    :param policy: Reject policy, quarantine or all_or_nothing
+    :type policy: str
+    :return: Inserted/updated/duplicate/rejected summary
+    :rtype: dict
     """
 
-    eod_date = datetime.now(timezone.utc).date() - timedelta(days=1)
+    if policy not in POLICIES:
+        raise ConfigError(f"Unknown reject policy: {policy}")
 
-    key = (f"raw/stocks/daily/incremental/domain=sp500/date={eod_date.isoformat()}/eod_incremental.json")
-    request = client.get_object(
-        Bucket=s3_bucket,
-        Key=key
-    )
+    if eod_date is None:
+        eod_date = datetime.now(timezone.utc).date() - timedelta(days=1)
+
+    stem = (f"raw/stocks/daily/incremental/domain=sp500/date={eod_date.isoformat()}/eod_incremental")
+
+    storage = get_storage()
+    key = storage.find_raw(stem)
+
+    if key is None:
+        raise ConfigError(f"No raw incremental object for {eod_date}")
+
+    stream, _ = storage.open(key)
 
-    raw = request["Body"].read()
+    copied = Counter()
+    rejected = []
 
-    payload = json.loads(raw)
+    with transaction() as conn, closing(stream) as body:
+        create_load_table(conn)
 
-    data = payload["data"] 
+        meta, chunks = open_payload(body)
 
-    meta = {k: v for k, v in payload.items() if k != "data"}
+        for chunk in chunks:
+            with metrics.timer("etl_validate", stage="staging_incremental"):
+                batch, rejects = validate_incremental_batch(meta, chunk)
 
-    for candle in data:
- 
-        try:
-            grain = validate_incremental_data(meta, candle)
+            for reject in rejects:
+                metrics.log("candle_rejected", "REJECTED", candle=reject["candle"], reason=reject["reason"])
 
-            execute(INSERT, grain)
+            metrics.count("etl_rejected_total", len(rejects), stage="staging_incremental")
 
-            print(f"[INSERTED] candle for: {candle["code"]}")
+            # Raising inside the transaction rolls back anything copied so far
+            if rejects and policy == "all_or_nothing":
+                raise ValidationError(f"{len(rejects)} candles rejected for {eod_date}, nothing loaded")
+
+            rejected.extend(rejects)
+            copied.update(copy_batch(conn, batch))
+
+        inserted, updated = merge_into_staging(conn)
+        staged = loaded_sessions(conn) if tracking() else {}
+
+    record_staged(staged)
+
+    summary = {
+        "eod_date": eod_date.isoformat(),
+        "inserted": sum(inserted.values()),
+        "updated": sum(updated.values()),
+        "duplicate": sum(copied.values()) - sum(inserted.values()) - sum(updated.values()),
+        "rejected": len(rejected),
+        "rejected_rows": rejected
+    }
+
+    metrics.rows("staging_incremental", summary["inserted"] + summary["updated"] + summary["duplicate"] + summary["rejected"])
+
+    print(
+        f"[OK] staging incremental {summary["eod_date"]}: inserted={summary["inserted"]} "
+        f"updated={summary["updated"]} duplicate={summary["duplicate"]} rejected={summary["rejected"]}"
+    )
 
-        except SQLError as e:
-            print(f"[REJECTED] candle: {candle}: {e}")
+    return summary
 
 # --------------------------------------------------
 # Entrypoint
@@ -90,4 +112,4 @@ def main():
     load_staging_incremental()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
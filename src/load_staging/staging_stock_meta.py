@@ -1,13 +1,23 @@
 """
-Extract and load stock meta data from s3 raw to staging
+Extract and load stock meta data from raw storage to staging
 """
 
-import json
-from src.utils.s3config import s3_bucket, client
+from contextlib import closing
+from src.utils.storage import get_storage
+from src.utils.raw_format import open_payload
 from src.load_staging.contract_stock_meta import validate_symbol_metadata
-from src.utils.db import execute
+from src.utils.db import execute, transaction
+from src.utils import metrics
 from src.utils.custom_exceptions import *
 
+# --------------------------------------------------
+# Raw stock lists
+# --------------------------------------------------
+
+# Written daily as stock_list_<YYYY-MM-DD>, the latest one is loaded
+
+STOCK_LIST_PREFIX = "raw/stocks/stock_lists/domain=sp500/stock_list_"
+
 # --------------------------------------------------
 # SQL
 # --------------------------------------------------
@@ -35,39 +45,64 @@ INSERT INTO staging.stocks_meta (
 ON CONFLICT (symbol, cik) DO NOTHING;
 """
 
+# --------------------------------------------------
+# Find latest stock list
+# --------------------------------------------------
+
+def latest_stock_list(storage) -> str | None:
+
+    """
+    Key of the most recent raw stock list
+
+    :param storage: Raw storage backend
+    :return: Key, None if no stock list has been written
+    :rtype: str | None
+    """
+
+    listed = storage.list(STOCK_LIST_PREFIX)
+
+    if not listed:
+        return None
+
+    # ISO dates sort chronologically, the date is the 10 characters after the prefix
+    stem = max(STOCK_LIST_PREFIX + obj["key"][len(STOCK_LIST_PREFIX):][:10] for obj in listed)
+
+    return storage.find_raw(stem)
+
 # --------------------------------------------------
 # Load stock meta into staging
 # --------------------------------------------------
 
+@metrics.stage("staging_stock_meta")
 def load_stock_meta():
 
     """
     Loads stock meta into staging table
     """
 
-    key = (f"raw/stocks/stock_lists/domain=sp500/stock_list_2026-01-17.json")
-
-    request = client.get_object(
-        Bucket=s3_bucket,
-        Key=key
-    )
+    storage = get_storage()
+    key = latest_stock_list(storage)
 
-    raw = request["Body"].read()
+    if key is None:
+        raise ConfigError("No raw stock list object")
 
-    payload = json.loads(raw)
+    stream, _ = storage.open(key)
 
-    data = payload["data"] 
+    with closing(stream) as body:
+        meta, chunks = open_payload(body)
+        data = [stock for chunk in chunks for stock in chunk]
 
-    meta = {k: v for k, v in payload.items() if k != "data"}
+    with transaction() as conn:
+        for stock in data:
+            try:
+                grain = validate_symbol_metadata(meta, stock)
 
-    for stock in data:
-        try:
-            grain = validate_symbol_metadata(meta, stock)
+                execute(INSERT, grain, conn=conn, prepare=True)
 
-            execute(INSERT, grain)
+            except RuntimeError as e:
+                metrics.log("stock_rejected", "REJECTED", symbol=stock["symbol"], reason=str(e))
 
-        except RuntimeError as e:
-            print(f"[REJECTED] stock: {stock["symbol"]}: {e}")
+    metrics.rows("staging_stock_meta", len(data))
 
     print(f"[OK] Stocks inserted into staging.stocks_meta")
 
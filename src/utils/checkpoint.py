@@ -0,0 +1,199 @@
+"""
+Per-symbol checkpoints for resumable historical backfills
+A rerun of the same run id skips done symbols and retries the rest
+"""
+
+from datetime import datetime, timezone
+from src.utils import settings
+from src.utils.db import execute_many, fetch_all
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+# Run id of this process, see current_run_id()
+_run_id = None
+
+# Stages, raw checkpoints are kept per storage backend, see raw_stage()
+
+RAW = "raw"
+STAGING = "staging"
+
+# Statuses
+
+DONE = "done"
+FAILED = "failed"
+
+# --------------------------------------------------
+# SQL
+# --------------------------------------------------
+
+SELECT_DONE = """
+SELECT symbol, etag, row_count
+FROM etl.backfill_checkpoint
+WHERE run_id = %(run_id)s
+  AND stage = %(stage)s
+  AND status = 'done';
+"""
+
+UPSERT = """
+INSERT INTO etl.backfill_checkpoint (
+    run_id,
+    stage,
+    symbol,
+    status,
+    etag,
+    row_count,
+    error
+) VALUES (
+    %(run_id)s,
+    %(stage)s,
+    %(symbol)s,
+    %(status)s,
+    %(etag)s,
+    %(row_count)s,
+    %(error)s
+)
+ON CONFLICT (run_id, stage, symbol) DO UPDATE
+SET status = EXCLUDED.status,
+    etag = EXCLUDED.etag,
+    row_count = EXCLUDED.row_count,
+    error = EXCLUDED.error,
+    updated_at = now();
+"""
+
+# --------------------------------------------------
+# Run id and stages
+# --------------------------------------------------
+
+def current_run_id() -> str:
+
+    """
+    Backfill run id of this invocation
+
+    Set BACKFILL_RUN_ID to resume that run. Otherwise each process
+    starts a fresh run named by its start time, so a default call
+    never skips symbols an earlier backfill completed.
+
+    :return: Backfill run id
+    :rtype: str
+    """
+
+    global _run_id
+
+    if _run_id is None:
+        _run_id = settings.get("BACKFILL_RUN_ID") or f"historical-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}"
+
+    return _run_id
+
+def raw_stage() -> str:
+
+    """
+    Raw checkpoint stage of the active storage backend
+
+    The S3 bucket and a local mirror hold different objects, so a
+    symbol written to one is not done for the other.
+
+    :return: raw for S3, raw_<backend> otherwise
+    :rtype: str
+    """
+
+    from src.utils.storage import get_storage
+
+    backend = get_storage().backend
+
+    return RAW if backend == "s3" else f"{RAW}_{backend}"
+
+# --------------------------------------------------
+# Read checkpoints
+# --------------------------------------------------
+
+def completed(stage: str, run_id: str | None = None, conn=None) -> dict[str, dict]:
+
+    """
+    Symbols completed by a stage in a backfill run
+
+    :param stage: Backfill stage eg raw, staging
+    :type stage: str
+    :param run_id: Backfill run id, defaults to current_run_id()
+    :type run_id: str | None
+    :param conn: Open connection, own transaction if None
+    :return: ETag and row count per completed symbol
+    :rtype: dict[str, dict]
+    """
+
+    rows = fetch_all(SELECT_DONE, {"run_id": run_id or current_run_id(), "stage": stage}, conn=conn)
+
+    return {symbol: {"etag": etag, "row_count": row_count} for symbol, etag, row_count in rows}
+
+def pending(symbols: list[str], stage: str, run_id: str | None = None, upstream: str | None = None) -> list[str]:
+
+    """
+    Symbols a stage still has to process in a backfill run
+
+    A symbol is pending when the stage has not completed it, or when
+    the upstream stage has since written a different raw object.
+
+    :param symbols: Symbols in the backfill
+    :type symbols: list[str]
+    :param stage: Backfill stage eg staging
+    :type stage: str
+    :param run_id: Backfill run id, defaults to current_run_id()
+    :type run_id: str | None
+    :param upstream: Stage producing the raw objects eg raw
+    :type upstream: str | None
+    :return: Symbols to process, in input order
+    :rtype: list[str]
+    """
+
+    run_id = run_id or current_run_id()
+    done = completed(stage, run_id)
+    produced = completed(upstream, run_id) if upstream else {}
+
+    return [
+        symbol for symbol in symbols
+        if symbol not in done
+        or (symbol in produced and produced[symbol]["etag"] != done[symbol]["etag"])
+    ]
+
+# --------------------------------------------------
+# Record checkpoints
+# --------------------------------------------------
+
+def record(stage: str, results: dict[str, dict], run_id: str | None = None, conn=None):
+
+    """
+    Record done or failed symbols for a stage in one pipelined batch
+
+    Pass the load connection so checkpoints commit with the data.
+
+    :param stage: Backfill stage eg raw, staging
+    :type stage: str
+    :param results: Per symbol {"etag", "row_count"} when done or {"error"} when failed
+    :type results: dict[str, dict]
+    :param run_id: Backfill run id, defaults to current_run_id()
+    :type run_id: str | None
+    :param conn: Open connection, own transaction if None
+    """
+
+    if not results:
+        return
+
+    run_id = run_id or current_run_id()
+
+    execute_many(
+        UPSERT,
+        [
+            {
+                "run_id": run_id,
+                "stage": stage,
+                "symbol": symbol,
+                "status": FAILED if "error" in result else DONE,
+                "etag": result.get("etag"),
+                "row_count": result.get("row_count"),
+                "error": result.get("error")
+            }
+            for symbol, result in results.items()
+        ],
+        conn=conn
+    )
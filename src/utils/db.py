@@ -1,67 +1,200 @@
-import os
-import psycopg
-from dotenv import load_dotenv
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable
+from weakref import WeakKeyDictionary
+from src.utils import metrics, settings
+
+# psycopg is imported on first connection, jobs that never reach the
+# database do not pay for it at startup
+
+if TYPE_CHECKING:
+    from psycopg_pool import ConnectionPool
 
 # --------------------------------------------------
-# Load environment variables
+# Pool
 # --------------------------------------------------
 
-load_dotenv()
+_pool = None
 
 # --------------------------------------------------
 # Create connection to Postgresql
 # --------------------------------------------------
 
+def connection_kwargs() -> dict:
+    """
+    Connection parameters read from environment variables.
+    """
+    return {
+        "host": settings.get("DB_HOST"),
+        "port": settings.get("DB_PORT"),
+        "dbname": settings.get("DB_NAME"),
+        "user": settings.get("DB_USER"),
+        "password": settings.get("DB_PASSWORD"),
+    }
+
 def get_connection():
     """
     Create and return a PostgreSQL connection using environment variables.
     """
-    return psycopg.connect(
-        host=os.getenv("DB_HOST"),
-        port=os.getenv("DB_PORT"),
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
+    import psycopg
+
+    return psycopg.connect(**connection_kwargs())
+
+# --------------------------------------------------
+# Connection pool
+# --------------------------------------------------
+
+def init_pool(min_size: int | None = None, max_size: int | None = None, configure=None) -> "ConnectionPool":
+    """
+    Open the process-wide connection pool, replacing any existing one.
+
+    :param min_size: Connections kept open, defaults to DB_POOL_MIN
+    :type min_size: int | None
+    :param max_size: Upper bound on open connections, defaults to DB_POOL_MAX
+    :type max_size: int | None
+    :param configure: Callback run on each new connection
+    :return: Open connection pool
+    :rtype: ConnectionPool
+    """
+    from psycopg_pool import ConnectionPool
+
+    global _pool
+
+    close_pool()
+
+    _pool = ConnectionPool(
+        kwargs=connection_kwargs(),
+        min_size=min_size or settings.get_int("DB_POOL_MIN", 1),
+        max_size=max_size or settings.get_int("DB_POOL_MAX", 4),
+        configure=configure,
+        open=True,
     )
+    return _pool
+
+def get_pool() -> "ConnectionPool":
+    """
+    Return the process-wide connection pool, opening it on first use.
+    """
+    if _pool is None:
+        return init_pool()
+    return _pool
+
+def close_pool():
+    """
+    Close the process-wide connection pool if open.
+    """
+    global _pool
+
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+def discard_pool():
+    """
+    Forget an inherited pool without closing it, for forked worker
+    processes. The connections belong to the parent process.
+    """
+    global _pool
+
+    _pool = None
+
+# --------------------------------------------------
+# Unit of work
+# --------------------------------------------------
+
+# Callbacks waiting on the commit of a connection's transaction
+_after_commit: WeakKeyDictionary = WeakKeyDictionary()
+
+@contextmanager
+def transaction():
+    """
+    Borrow a pooled connection for a single unit of work.
+    Commits when the block exits cleanly and rolls back on error.
+    """
+    with get_pool().connection() as conn:
+        _after_commit.pop(conn, None)
+
+        try:
+            yield conn
+
+            with metrics.timer("etl_db_commit"):
+                conn.commit()
+
+        finally:
+            callbacks = _after_commit.pop(conn, [])
+
+    for callback in callbacks:
+        callback()
+
+def after_commit(conn, callback: Callable):
+    """
+    Run callback once the connection's transaction commits, for state
+    that must not outlive a rollback. Only transaction() runs them,
+    callbacks on other connections are dropped with the connection.
+    """
+    _after_commit.setdefault(conn, []).append(callback)
 
 # --------------------------------------------------
 # Execute query INSERT/UPDATE/DELETE
 # --------------------------------------------------
 
-def execute(query, params=None):
+def execute(query, params=None, conn=None, prepare=None):
     """
     Execute a query that does not return rows (INSERT, UPDATE, DDL).
+    Runs in its own transaction unless a connection is passed in.
     """
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-        conn.commit()
+    if conn is None:
+        with transaction() as conn:
+            return execute(query, params, conn=conn, prepare=prepare)
+
+    with conn.cursor() as cur, metrics.timer("etl_db_execute", op="execute"):
+        cur.execute(query, params, prepare=prepare)
+
+# --------------------------------------------------
+# Execute query for many parameter sets
+# --------------------------------------------------
+
+def execute_many(query, params_seq, conn=None):
+    """
+    Execute a query once per parameter set in a single round of
+    pipelined statements. Returns number of affected rows.
+    """
+    if conn is None:
+        with transaction() as conn:
+            return execute_many(query, params_seq, conn=conn)
+
+    with conn.cursor() as cur, metrics.timer("etl_db_execute", op="execute_many"):
+        cur.executemany(query, params_seq)
+        return cur.rowcount
 
 # --------------------------------------------------
 # Execute query returning all rows
 # --------------------------------------------------
 
-def fetch_all(query, params=None):
+def fetch_all(query, params=None, conn=None):
     """
     Execute a query and return all rows.
     """
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            return cur.fetchall()
-        
+    if conn is None:
+        with transaction() as conn:
+            return fetch_all(query, params, conn=conn)
+
+    with conn.cursor() as cur, metrics.timer("etl_db_execute", op="fetch_all"):
+        cur.execute(query, params)
+        return cur.fetchall()
+
 # --------------------------------------------------
-# Execute query INSERT/UPDATE/DELETE 
+# Execute query INSERT/UPDATE/DELETE
 # and return rowcount
 # --------------------------------------------------
 
-def execute_with_rowcount(query, params=None):
+def execute_with_rowcount(query, params=None, conn=None):
     """
     Execute a query and return number of affected rows.
     """
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            rowcount = cur.rowcount
-        conn.commit()
-    return rowcount
\ No newline at end of file
+    if conn is None:
+        with transaction() as conn:
+            return execute_with_rowcount(query, params, conn=conn)
+
+    with conn.cursor() as cur, metrics.timer("etl_db_execute", op="execute_with_rowcount"):
+        cur.execute(query, params)
+        return cur.rowcount
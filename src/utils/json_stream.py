@@ -0,0 +1,206 @@
+"""
+Streaming reader for raw JSON payloads
+Yields payload meta, then data rows in bounded chunks
+"""
+
+import codecs
+import json
+from src.utils import settings
+from src.utils.custom_exceptions import *
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+READ_SIZE = 1 << 16
+
+def stream_chunk_rows() -> int:
+
+    """
+    Rows per streamed chunk, STREAM_CHUNK_ROWS
+    """
+
+    return settings.get_int("STREAM_CHUNK_ROWS", 5000)
+
+WHITESPACE = " \t\n\r"
+
+decoder = json.JSONDecoder()
+
+# --------------------------------------------------
+# Payload stream
+# --------------------------------------------------
+
+class PayloadStream:
+
+    """
+    Incremental parser for {meta..., "data": [rows...]} payloads
+
+    Reads the body READ_SIZE bytes at a time, so only the current
+    chunk of rows is held in memory. Meta fields must precede the
+    data array, as written by every raw writer.
+    """
+
+    def __init__(self, body, data_field: str = "data", read_size: int = READ_SIZE):
+
+        """
+        :param body: File-like object with read(n), eg S3 StreamingBody
+        :param data_field: Payload field holding the rows
+        :type data_field: str
+        :param read_size: Bytes read per call
+        :type read_size: int
+        """
+
+        self.body = body
+        self.data_field = data_field
+        self.read_size = read_size
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+
+        if self.eof:
+            raise ParsingError("Unexpected end of payload")
+
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+
+        raw = self.body.read(self.read_size)
+
+        if not raw:
+            self.eof = True
+            self.buffer += self.utf8.decode(b"", final=True)
+        else:
+            self.buffer += self.utf8.decode(raw)
+
+    def _peek(self) -> str:
+
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if self.eof:
+                return ""
+
+            self._fill()
+
+    def _expect(self, char: str):
+
+        if self._peek() != char:
+            raise ParsingError(f"Expected '{char}' at offset {self.pos} of payload")
+
+        self.pos += 1
+
+    def _value(self):
+
+        self._peek()
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+
+                # A number at the buffer edge may continue in the next read
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise ParsingError(f"Invalid JSON payload: {e}") from e
+
+            self._fill()
+
+    def read_meta(self) -> dict:
+
+        """
+        Parse payload fields up to the start of the data array
+
+        :return: Payload meta
+        :rtype: dict
+        """
+
+        meta = {}
+
+        self._expect("{")
+
+        while self._peek() != "}":
+            key = self._value()
+            self._expect(":")
+
+            if key == self.data_field:
+                self._expect("[")
+                return meta
+
+            meta[key] = self._value()
+
+            separator = self._peek()
+
+            if separator == ",":
+                self.pos += 1
+            elif separator != "}":
+                raise ParsingError(f"Expected ',' or '}}' at offset {self.pos} of payload")
+
+        raise ParsingError(f"Payload has no {self.data_field} field")
+
+    def iter_chunks(self, chunk_rows: int | None = None):
+
+        """
+        Yield data rows in lists of at most chunk_rows
+
+        :param chunk_rows: Rows per chunk, defaults to STREAM_CHUNK_ROWS
+        :type chunk_rows: int | None
+        """
+
+        chunk_rows = chunk_rows or stream_chunk_rows()
+        chunk = []
+
+        if self._peek() == "]":
+            self.pos += 1
+
+        else:
+            while True:
+                chunk.append(self._value())
+
+                if len(chunk) >= chunk_rows:
+                    yield chunk
+                    chunk = []
+
+                separator = self._peek()
+                self.pos += 1
+
+                if separator == "]":
+                    break
+                if separator != ",":
+                    raise ParsingError(f"Expected ',' or ']' at offset {self.pos - 1} of payload")
+
+        if chunk:
+            yield chunk
+
+        if self._peek() != "}":
+            raise ParsingError("Payload meta must precede data")
+
+# --------------------------------------------------
+# Helpers
+# --------------------------------------------------
+
+def iter_payload(body, chunk_rows: int | None = None):
+
+    """
+    Stream a raw payload body
+
+    :param body: File-like object with read(n)
+    :param chunk_rows: Rows per chunk, defaults to STREAM_CHUNK_ROWS
+    :type chunk_rows: int | None
+    :return: Payload meta and an iterator of row chunks
+    :rtype: tuple[dict, Iterator[list[dict]]]
+    """
+
+    stream = PayloadStream(body)
+    meta = stream.read_meta()
+
+    return meta, stream.iter_chunks(chunk_rows)
@@ -0,0 +1,201 @@
+"""
+Manifest of raw historical objects and the content digest of each
+Writers skip uploads whose digest is unchanged, loaders skip objects
+already merged at their current version
+"""
+
+from src.utils.db import execute, execute_many, fetch_all
+from src.utils.raw_format import DIGEST_METADATA
+from src.utils.storage import get_storage
+
+# --------------------------------------------------
+# SQL
+# --------------------------------------------------
+
+SELECT_KEY = """
+SELECT digest, etag
+FROM etl.raw_manifest
+WHERE object_key = %(key)s;
+"""
+
+SELECT_LOADED_DIGEST = """
+SELECT loaded_digest
+FROM etl.raw_manifest
+WHERE object_key = %(key)s;
+"""
+
+SELECT_LOADED = """
+SELECT object_key, etag, digest, row_count
+FROM etl.raw_manifest
+WHERE symbol = ANY(%(symbols)s)
+  AND loaded_digest = digest;
+"""
+
+UPSERT_WRITTEN = """
+INSERT INTO etl.raw_manifest (
+    object_key,
+    symbol,
+    digest,
+    etag,
+    row_count
+) VALUES (
+    %(key)s,
+    %(symbol)s,
+    %(digest)s,
+    %(etag)s,
+    %(row_count)s
+)
+ON CONFLICT (object_key) DO UPDATE
+SET digest = EXCLUDED.digest,
+    etag = EXCLUDED.etag,
+    row_count = EXCLUDED.row_count,
+    written_at = now();
+"""
+
+UPSERT_LOADED = """
+INSERT INTO etl.raw_manifest (
+    object_key,
+    symbol,
+    digest,
+    etag,
+    row_count,
+    loaded_digest,
+    loaded_at
+) VALUES (
+    %(key)s,
+    %(symbol)s,
+    %(digest)s,
+    %(etag)s,
+    %(row_count)s,
+    %(digest)s,
+    now()
+)
+ON CONFLICT (object_key) DO UPDATE
+SET digest = EXCLUDED.digest,
+    etag = EXCLUDED.etag,
+    row_count = EXCLUDED.row_count,
+    loaded_digest = EXCLUDED.loaded_digest,
+    loaded_at = EXCLUDED.loaded_at;
+"""
+
+# --------------------------------------------------
+# Write side
+# --------------------------------------------------
+
+def current(key: str) -> dict | None:
+
+    """
+    Digest of the object stored at a key, with one HEAD
+
+    Read from the object's metadata, or from the manifest when the
+    backend keeps no metadata (local data lake) and the manifest
+    entry describes the same object version.
+
+    :param key: Object key
+    :type key: str
+    :return: etag and digest (None if unknown), None if absent
+    :rtype: dict | None
+    """
+
+    head = get_storage().head(key)
+
+    if head is None:
+        return None
+
+    digest = head["metadata"].get(DIGEST_METADATA)
+
+    if digest is None:
+        rows = fetch_all(SELECT_KEY, {"key": key})
+
+        if rows and rows[0][1] == head["etag"]:
+            digest = rows[0][0]
+
+    return {"etag": head["etag"], "digest": digest}
+
+def record_written(key: str, symbol: str, digest: str, etag: str, row_count: int):
+
+    """
+    Record a written object's digest, in its own transaction
+
+    :param key: Object key
+    :type key: str
+    :param symbol: Stock symbol
+    :type symbol: str
+    :param digest: Content digest of the rows
+    :type digest: str
+    :param etag: ETag returned by the write
+    :type etag: str
+    :param row_count: Rows in the object
+    :type row_count: int
+    """
+
+    execute(UPSERT_WRITTEN, {"key": key, "symbol": symbol, "digest": digest, "etag": etag, "row_count": row_count})
+
+# --------------------------------------------------
+# Load side
+# --------------------------------------------------
+
+def loaded(symbols: list[str], conn=None) -> dict[str, dict]:
+
+    """
+    Objects of the given symbols merged into staging at their
+    current digest
+
+    :param symbols: Stock symbols
+    :type symbols: list[str]
+    :param conn: Open connection, own transaction if None
+    :return: etag, digest and row_count per object key
+    :rtype: dict[str, dict]
+    """
+
+    rows = fetch_all(SELECT_LOADED, {"symbols": symbols}, conn=conn)
+
+    return {key: {"etag": etag, "digest": digest, "row_count": row_count} for key, etag, digest, row_count in rows}
+
+def loaded_digest(key: str) -> str | None:
+
+    """
+    Digest an object was last merged into staging at
+
+    :param key: Object key
+    :type key: str
+    :return: Loaded digest, None if never loaded
+    :rtype: str | None
+    """
+
+    rows = fetch_all(SELECT_LOADED_DIGEST, {"key": key})
+
+    return rows[0][0] if rows else None
+
+def is_loaded(entries: dict[str, dict], obj: dict) -> bool:
+
+    """
+    Whether a listed object is the version already loaded
+
+    :param entries: Output of loaded
+    :type entries: dict[str, dict]
+    :param obj: Listed object, key and etag
+    :type obj: dict
+    :rtype: bool
+    """
+
+    entry = entries.get(obj["key"])
+
+    return entry is not None and obj.get("etag") is not None and entry["etag"] == obj["etag"]
+
+def record_loaded(objects: dict[str, dict], conn=None):
+
+    """
+    Mark objects as merged at their digest in one pipelined batch
+
+    Pass the load connection so the manifest commits with the data.
+
+    :param objects: Per key {"symbol", "digest", "etag", "row_count"}
+    :type objects: dict[str, dict]
+    :param conn: Open connection, own transaction if None
+    """
+
+    if not objects:
+        return
+
+    execute_many(UPSERT_LOADED, [{"key": key, **obj} for key, obj in objects.items()], conn=conn)
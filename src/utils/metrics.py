@@ -0,0 +1,448 @@
+"""
+Lightweight pipeline metrics
+Counters, latency/size histograms and stage timers kept in-process,
+written per job as a Prometheus textfile and a JSON run report.
+Per-row events go through sampled structured logs.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import cache
+from pathlib import Path
+from src.utils import settings
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# Read on use: METRICS_DIR, point at the node_exporter textfile
+# collector directory in production (metrics in the project)
+
+# Every event is counted, the first N and then one in every M are
+# logged, read once per process
+@cache
+def log_sampling() -> tuple[int, int]:
+    return settings.get_int("LOG_SAMPLE_FIRST", 20), settings.get_int("LOG_SAMPLE_EVERY", 100)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+# --------------------------------------------------
+# Registry
+# --------------------------------------------------
+
+class Registry:
+
+    """
+    Thread-safe counters and histograms keyed by name and labels
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+
+        with self._lock:
+            self.counters = Counter()
+            self.histograms = {}
+            self.events = Counter()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def count(self, name: str, value: float = 1, **labels):
+
+        with self._lock:
+            self.counters[self._key(name, labels)] += value
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels):
+
+        key = self._key(name, labels)
+
+        with self._lock:
+            histogram = self.histograms.get(key)
+
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    "buckets": buckets,
+                    "counts": [0] * (len(buckets) + 1),
+                    "count": 0,
+                    "sum": 0.0,
+                    "max": 0.0
+                }
+
+            position = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+
+            histogram["counts"][position] += 1
+            histogram["count"] += 1
+            histogram["sum"] += value
+            histogram["max"] = max(histogram["max"], value)
+
+    def event(self, name: str) -> int:
+
+        with self._lock:
+            self.events[name] += 1
+            return self.events[name]
+
+    def snapshot(self) -> dict:
+
+        """
+        Picklable copy of every metric, eg to return from a worker process
+        """
+
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {key: {**h, "counts": list(h["counts"])} for key, h in self.histograms.items()},
+                "events": dict(self.events)
+            }
+
+    def merge(self, snapshot: dict):
+
+        """
+        Add a snapshot taken in another process
+
+        :param snapshot: Result of snapshot()
+        :type snapshot: dict
+        """
+
+        with self._lock:
+            self.counters.update(snapshot["counters"])
+            self.events.update(snapshot["events"])
+
+            for key, other in snapshot["histograms"].items():
+                histogram = self.histograms.get(key)
+
+                if histogram is None:
+                    self.histograms[key] = {**other, "counts": list(other["counts"])}
+                    continue
+
+                histogram["counts"] = [a + b for a, b in zip(histogram["counts"], other["counts"])]
+                histogram["count"] += other["count"]
+                histogram["sum"] += other["sum"]
+                histogram["max"] = max(histogram["max"], other["max"])
+
+_registry = Registry()
+
+count = _registry.count
+observe = _registry.observe
+snapshot = _registry.snapshot
+merge = _registry.merge
+reset = _registry.reset
+
+def drain() -> dict:
+
+    """
+    Snapshot and reset, a worker returns what it measured per task
+    """
+
+    taken = snapshot()
+    reset()
+
+    return taken
+
+# --------------------------------------------------
+# Timers
+# --------------------------------------------------
+
+@contextmanager
+def timer(name: str, **labels):
+
+    """
+    Time a block into the <name>_seconds histogram
+
+    :param name: Metric name without unit, eg etl_db_commit
+    :type name: str
+    """
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        observe(f"{name}_seconds", time.perf_counter() - start, **labels)
+
+@contextmanager
+def stage(name: str):
+
+    """
+    Time a pipeline stage, report rows/sec with rows()
+
+    :param name: Stage name eg staging_historical
+    :type name: str
+    """
+
+    with timer("etl_stage", stage=name):
+        yield
+
+def rows(stage_name: str, n: int, nbytes: int | None = None):
+
+    """
+    Count rows, and optionally bytes, processed by a stage
+
+    :param stage_name: Stage name eg staging_historical
+    :type stage_name: str
+    :param n: Rows processed
+    :type n: int
+    :param nbytes: Bytes processed
+    :type nbytes: int | None
+    """
+
+    count("etl_rows_total", n, stage=stage_name)
+
+    if nbytes is not None:
+        count("etl_bytes_total", nbytes, stage=stage_name)
+
+# --------------------------------------------------
+# Sampled structured logs
+# --------------------------------------------------
+
+def log(event: str, tag: str = "OK", **fields):
+
+    """
+    Log a per-row or per-object event as one JSON line, sampled
+
+    The first LOG_SAMPLE_FIRST events of a kind are logged, then one
+    in every LOG_SAMPLE_EVERY. All are counted in the run report.
+
+    :param event: Event name eg candle_rejected
+    :type event: str
+    :param tag: Log tag eg REJECTED
+    :type tag: str
+    """
+
+    seen = _registry.event(event)
+    first, every = log_sampling()
+
+    if seen <= first or seen % every == 0:
+        print(f"[{tag}] {json.dumps({"event": event, "seen": seen, **fields}, default=str)}")
+
+# --------------------------------------------------
+# Reports
+# --------------------------------------------------
+
+def _quantile(histogram: dict, q: float) -> float:
+
+    """
+    Quantile estimate, linear within the bucket holding it
+    """
+
+    target = q * histogram["count"]
+    seen = 0
+    lower = 0.0
+
+    for bound, bucket_count in zip(histogram["buckets"], histogram["counts"]):
+        if bucket_count and seen + bucket_count >= target:
+            return min(lower + (bound - lower) * (target - seen) / bucket_count, histogram["max"])
+
+        seen += bucket_count
+        lower = bound
+
+    return histogram["max"]
+
+def _labels(labels: tuple, **extra) -> str:
+
+    pairs = [*labels, *extra.items()]
+    escaped = (f'{k}="{str(v).replace("\\", "\\\\").replace("\"", "\\\"")}"' for k, v in pairs)
+
+    return "{" + ",".join(escaped) + "}" if pairs else ""
+
+def prometheus_text(job: str, status: str, seconds: float) -> str:
+
+    """
+    Render every metric in the Prometheus text exposition format
+
+    :param job: Job name, added as the etl_job label
+    :type job: str
+    :param status: success or failed
+    :type status: str
+    :param seconds: Job wall time
+    :type seconds: float
+    :return: Textfile contents
+    :rtype: str
+    """
+
+    taken = snapshot()
+    job_labels = (("etl_job", job),)
+    lines = [
+        "# TYPE etl_job_duration_seconds gauge",
+        f"etl_job_duration_seconds{_labels(job_labels)} {seconds:.6f}",
+        "# TYPE etl_job_success gauge",
+        f"etl_job_success{_labels(job_labels)} {int(status == "success")}",
+        "# TYPE etl_job_last_run_timestamp_seconds gauge",
+        f"etl_job_last_run_timestamp_seconds{_labels(job_labels)} {time.time():.0f}"
+    ]
+
+    typed = set()
+
+    for (name, labels), value in sorted(taken["counters"].items()):
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+
+        lines.append(f"{name}{_labels(job_labels + labels)} {value:g}")
+
+    for (name, labels), histogram in sorted(taken["histograms"].items()):
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+
+        cumulative = 0
+
+        for bound, bucket_count in zip(histogram["buckets"], histogram["counts"]):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_labels(job_labels + labels, le=f"{bound:g}")} {cumulative}")
+
+        lines.append(f"{name}_bucket{_labels(job_labels + labels, le="+Inf")} {histogram["count"]}")
+        lines.append(f"{name}_sum{_labels(job_labels + labels)} {histogram["sum"]:.6f}")
+        lines.append(f"{name}_count{_labels(job_labels + labels)} {histogram["count"]}")
+
+    if taken["events"]:
+        lines.append("# TYPE etl_log_events_total counter")
+
+    for event, seen in sorted(taken["events"].items()):
+        lines.append(f"etl_log_events_total{_labels(job_labels, event=event)} {seen}")
+
+    return "\n".join(lines) + "\n"
+
+def report(job: str, status: str, seconds: float) -> dict:
+
+    """
+    JSON run report: stage throughput, latency percentiles and counters
+
+    :param job: Job name
+    :type job: str
+    :param status: success or failed
+    :type status: str
+    :param seconds: Job wall time
+    :type seconds: float
+    :return: Run report
+    :rtype: dict
+    """
+
+    taken = snapshot()
+
+    def name_of(key: tuple) -> str:
+        name, labels = key
+        return name + _labels(labels)
+
+    stages = {}
+
+    for (name, labels), histogram in taken["histograms"].items():
+        if name == "etl_stage_seconds":
+            stages[dict(labels)["stage"]] = {"seconds": round(histogram["sum"], 3)}
+
+    for (name, labels), value in taken["counters"].items():
+        stage_name = dict(labels).get("stage")
+
+        if name in ("etl_rows_total", "etl_bytes_total") and stage_name is not None:
+            stages.setdefault(stage_name, {"seconds": None})[name[4:-6]] = value
+
+    for stage_metrics in stages.values():
+        if stage_metrics.get("seconds") and "rows" in stage_metrics:
+            stage_metrics["rows_per_sec"] = round(stage_metrics["rows"] / stage_metrics["seconds"], 1)
+
+    return {
+        "job": job,
+        "status": status,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "seconds": round(seconds, 3),
+        "stages": stages,
+        "latency": {
+            name_of(key): {
+                "count": histogram["count"],
+                "sum": round(histogram["sum"], 6),
+                "p50": round(_quantile(histogram, 0.5), 6),
+                "p95": round(_quantile(histogram, 0.95), 6),
+                "p99": round(_quantile(histogram, 0.99), 6),
+                "max": round(histogram["max"], 6)
+            }
+            for key, histogram in sorted(taken["histograms"].items())
+        },
+        "counters": {name_of(key): value for key, value in sorted(taken["counters"].items())},
+        "events": dict(sorted(taken["events"].items()))
+    }
+
+def write_report(job: str, status: str, seconds: float, directory: Path | None = None) -> dict:
+
+    """
+    Write <job>.prom for the textfile collector and a timestamped
+    JSON run report, both atomically
+
+    :param job: Job name
+    :type job: str
+    :param status: success or failed
+    :type status: str
+    :param seconds: Job wall time
+    :type seconds: float
+    :param directory: Output directory, defaults to METRICS_DIR
+    :type directory: Path | None
+    :return: Run report
+    :rtype: dict
+    """
+
+    directory = Path(directory or settings.get("METRICS_DIR") or PROJECT_ROOT / "metrics")
+    directory.mkdir(parents=True, exist_ok=True)
+
+    run_report = report(job, status, seconds)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    outputs = {
+        directory / f"{job}.prom": prometheus_text(job, status, seconds),
+        directory / f"{job}_{stamp}.json": json.dumps(run_report, indent=2)
+    }
+
+    for path, text in outputs.items():
+        temp_file = path.with_name(path.name + ".tmp")
+        temp_file.write_text(text, encoding="utf-8")
+        temp_file.replace(path)
+
+    return run_report
+
+# --------------------------------------------------
+# Job wrapper
+# --------------------------------------------------
+
+@contextmanager
+def job_run(job: str):
+
+    """
+    Measure a job from a clean registry and write its reports on exit,
+    including when it fails
+
+    :param job: Job name eg staging_incremental
+    :type job: str
+    """
+
+    reset()
+    start = time.perf_counter()
+    status = "failed"
+
+    try:
+        yield
+        status = "success"
+
+    finally:
+        seconds = time.perf_counter() - start
+
+        try:
+            run_report = write_report(job, status, seconds)
+
+        except OSError as e:
+            print(f"[WARN] metrics for {job} not written: {e}")
+            run_report = report(job, status, seconds)
+
+        for event, seen in run_report["events"].items():
+            if seen > log_sampling()[0]:
+                print(f"[OK] {event}: {seen} events, sampled in the log")
+
+        for stage_name, stage_metrics in run_report["stages"].items():
+            print(f"[OK] {job} {stage_name}: {stage_metrics}")
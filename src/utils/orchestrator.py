@@ -0,0 +1,416 @@
+"""
+Dependency-ordered pipeline runner with a run ledger
+Each stage starts once every stage it depends on has committed,
+independent stages run concurrently. Stages run in their own process
+so a timeout can stop them, failures are retried, and a rerun of the
+same run id resumes from the stages that did not finish.
+"""
+
+import importlib
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from src.utils.db import close_pool, execute, fetch_all
+from src.utils import metrics, settings
+from src.utils.custom_exceptions import *
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+# Read on use:
+# PIPELINE_RUN_ID            reuse to resume a failed run (the UTC date)
+# PIPELINE_WORKERS           stages running at the same time (4)
+# STAGE_RETRIES              per-stage defaults, overridable per stage (2)
+# STAGE_TIMEOUT_SECONDS      (3600, 0 waits without limit)
+# STAGE_RETRY_DELAY_SECONDS  (30)
+
+# Statuses
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+# --------------------------------------------------
+# SQL
+# --------------------------------------------------
+
+SELECT_RUN = """
+SELECT stage, status, attempts
+FROM etl.pipeline_run
+WHERE run_id = %(run_id)s;
+"""
+
+UPSERT = """
+INSERT INTO etl.pipeline_run (
+    run_id,
+    stage,
+    status,
+    attempts,
+    started_at,
+    finished_at,
+    seconds,
+    error
+) VALUES (
+    %(run_id)s,
+    %(stage)s,
+    %(status)s,
+    %(attempts)s,
+    CASE WHEN %(status)s = 'running' THEN now() END,
+    CASE WHEN %(status)s <> 'running' THEN now() END,
+    %(seconds)s,
+    %(error)s
+)
+ON CONFLICT (run_id, stage) DO UPDATE
+SET status = EXCLUDED.status,
+    attempts = EXCLUDED.attempts,
+    started_at = COALESCE(EXCLUDED.started_at, etl.pipeline_run.started_at),
+    finished_at = EXCLUDED.finished_at,
+    seconds = EXCLUDED.seconds,
+    error = EXCLUDED.error,
+    updated_at = now();
+"""
+
+# --------------------------------------------------
+# Stages
+# --------------------------------------------------
+
+@dataclass
+class Stage:
+
+    """
+    One pipeline stage
+
+    target is a "module:function" path, imported in the stage process
+    so the runner itself stays light. after lists the stages whose
+    committed output this stage reads.
+    """
+
+    name: str
+    target: str
+    after: tuple[str, ...] = ()
+    kwargs: dict = field(default_factory=dict)
+
+    # None reads the STAGE_* default when the stage runs
+    retries: int | None = None
+    timeout: float | None = None
+    retry_delay: float | None = None
+
+    def with_defaults(self) -> "Stage":
+
+        """
+        Copy of the stage with unset retries, timeout and delay read
+        from STAGE_RETRIES, STAGE_TIMEOUT_SECONDS and STAGE_RETRY_DELAY_SECONDS
+        """
+
+        return replace(
+            self,
+            retries=settings.get_int("STAGE_RETRIES", 2) if self.retries is None else self.retries,
+            timeout=settings.get_float("STAGE_TIMEOUT_SECONDS", 3600) if self.timeout is None else self.timeout,
+            retry_delay=settings.get_float("STAGE_RETRY_DELAY_SECONDS", 30) if self.retry_delay is None else self.retry_delay
+        )
+
+def default_run_id() -> str:
+
+    """
+    Pipeline run id, PIPELINE_RUN_ID or the UTC date
+    """
+
+    return settings.get("PIPELINE_RUN_ID") or datetime.now(timezone.utc).date().isoformat()
+
+def validate_stages(stages: list[Stage]) -> list[Stage]:
+
+    """
+    Check stage names are unique, dependencies exist and form no cycle
+
+    :param stages: Pipeline stages
+    :type stages: list[Stage]
+    :return: Stages in dependency order
+    :rtype: list[Stage]
+    """
+
+    by_name = {}
+
+    for stage in stages:
+        if stage.name in by_name:
+            raise ConfigError(f"Duplicate pipeline stage: {stage.name}")
+        by_name[stage.name] = stage
+
+    for stage in stages:
+        unknown = [name for name in stage.after if name not in by_name]
+        if unknown:
+            raise ConfigError(f"Stage {stage.name} depends on unknown stages: {', '.join(unknown)}")
+
+    # Kahn's algorithm, anything left over sits on a cycle
+    remaining = {stage.name: set(stage.after) for stage in stages}
+    ordered = []
+
+    while remaining:
+        ready = [name for name, after in remaining.items() if not after]
+
+        if not ready:
+            raise ConfigError(f"Pipeline stages form a cycle: {', '.join(sorted(remaining))}")
+
+        for name in ready:
+            del remaining[name]
+            ordered.append(by_name[name])
+        for after in remaining.values():
+            after.difference_update(ready)
+
+    return ordered
+
+# --------------------------------------------------
+# Run ledger
+# --------------------------------------------------
+
+def ledger(run_id: str | None = None) -> dict[str, dict]:
+
+    """
+    Stage statuses recorded for a run
+
+    :param run_id: Pipeline run id, defaults to default_run_id()
+    :type run_id: str | None
+    :return: {"status", "attempts"} per stage
+    :rtype: dict[str, dict]
+    """
+
+    rows = fetch_all(SELECT_RUN, {"run_id": run_id or default_run_id()})
+
+    return {stage: {"status": status, "attempts": attempts} for stage, status, attempts in rows}
+
+def record(run_id: str, stage: str, status: str, attempts: int, seconds: float | None = None, error: str | None = None):
+
+    """
+    Upsert a stage's status in the run ledger, in its own transaction
+
+    :param run_id: Pipeline run id
+    :type run_id: str
+    :param stage: Stage name
+    :type stage: str
+    :param status: running, done, failed or skipped
+    :type status: str
+    :param attempts: Attempts so far
+    :type attempts: int
+    :param seconds: Duration of the last attempt
+    :type seconds: float | None
+    :param error: Last error
+    :type error: str | None
+    """
+
+    execute(UPSERT, {
+        "run_id": run_id,
+        "stage": stage,
+        "status": status,
+        "attempts": attempts,
+        "seconds": seconds,
+        "error": error
+    })
+
+# --------------------------------------------------
+# Stage process
+# --------------------------------------------------
+
+def resolve(target: str):
+
+    """
+    Import a "module:function" target
+
+    :param target: eg src.load_mart.mart_perf_current:load_mart_perf_current
+    :type target: str
+    :return: Callable
+    """
+
+    module, _, function = target.partition(":")
+
+    return getattr(importlib.import_module(module), function)
+
+def stage_process(target: str, kwargs: dict, sender):
+
+    """
+    Stage process entry point, reports status and metrics to the runner
+    """
+
+    metrics.reset()
+
+    try:
+        resolve(target)(**kwargs)
+        sender.send((DONE, None, metrics.drain()))
+
+    except BaseException as e:
+        sender.send((FAILED, f"{type(e).__name__}: {e}", metrics.drain()))
+        raise
+
+    finally:
+        sender.close()
+        close_pool()
+
+def run_attempt(stage: Stage) -> str | None:
+
+    """
+    Run one attempt of a stage in a fresh process
+
+    A stage that outlives its timeout is terminated, its open
+    transaction is rolled back by the server when the connection drops.
+    A timeout of 0 waits without limit.
+
+    :param stage: Pipeline stage, see Stage.with_defaults
+    :type stage: Stage
+    :return: Error, None on success
+    :rtype: str | None
+    """
+
+    # Spawned, not forked: the runner holds a pool and threads
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+
+    process = context.Process(
+        target=stage_process,
+        args=(stage.target, stage.kwargs, sender),
+        name=f"stage-{stage.name}"
+    )
+    process.start()
+    sender.close()
+
+    try:
+        # Returns early with data, or at EOF if the process died
+        if not receiver.poll(stage.timeout or None):
+            process.terminate()
+            process.join(10)
+
+            if process.is_alive():
+                process.kill()
+
+            return f"timed out after {stage.timeout:.0f}s"
+
+        try:
+            status, error, snapshot = receiver.recv()
+
+        except EOFError:
+            process.join()
+            return f"stage process exited with code {process.exitcode}"
+
+        metrics.merge(snapshot)
+
+        return error if status == FAILED else None
+
+    finally:
+        process.join()
+        receiver.close()
+
+def run_stage(stage: Stage, run_id: str, attempts: int = 0) -> str:
+
+    """
+    Run a stage with retries, recording each attempt in the ledger
+
+    :param stage: Pipeline stage
+    :type stage: Stage
+    :param run_id: Pipeline run id
+    :type run_id: str
+    :param attempts: Attempts made by earlier runs of this run id
+    :type attempts: int
+    :return: done or failed
+    :rtype: str
+    """
+
+    stage = stage.with_defaults()
+
+    for retry in range(stage.retries + 1):
+        attempts += 1
+        record(run_id, stage.name, RUNNING, attempts)
+
+        start = time.perf_counter()
+
+        with metrics.timer("etl_pipeline_stage", stage=stage.name):
+            error = run_attempt(stage)
+
+        seconds = time.perf_counter() - start
+        metrics.count("etl_pipeline_attempts_total", stage=stage.name, status=FAILED if error else DONE)
+
+        if error is None:
+            record(run_id, stage.name, DONE, attempts, seconds)
+            print(f"[OK] stage {stage.name} done in {seconds:.1f}s")
+            return DONE
+
+        record(run_id, stage.name, FAILED, attempts, seconds, error)
+
+        if retry < stage.retries:
+            delay = stage.retry_delay * 2 ** retry
+            print(f"[WARN] stage {stage.name} failed: {error}, retry {retry + 1}/{stage.retries} in {delay:.0f}s")
+            time.sleep(delay)
+
+    print(f"[ERROR] stage {stage.name} failed after {stage.retries + 1} attempts: {error}")
+
+    return FAILED
+
+# --------------------------------------------------
+# Run the pipeline
+# --------------------------------------------------
+
+def run_pipeline(stages: list[Stage], run_id: str | None = None, workers: int | None = None) -> dict[str, str]:
+
+    """
+    Run stages in dependency order, each as soon as its inputs are done
+
+    Stages already done in the ledger for this run id are skipped.
+    When a stage fails, stages depending on it are skipped and the
+    rest of the pipeline carries on.
+
+    :param stages: Pipeline stages
+    :type stages: list[Stage]
+    :param run_id: Pipeline run id, reuse it to resume, defaults to default_run_id()
+    :type run_id: str | None
+    :param workers: Stages running at the same time, defaults to PIPELINE_WORKERS
+    :type workers: int | None
+    :return: Final status per stage
+    :rtype: dict[str, str]
+    """
+
+    run_id = run_id or default_run_id()
+    workers = workers or settings.get_int("PIPELINE_WORKERS", 4)
+    ordered = validate_stages(stages)
+    previous = ledger(run_id)
+
+    status = {stage.name: DONE for stage in ordered if previous.get(stage.name, {}).get("status") == DONE}
+
+    if status:
+        print(f"[SKIP] run {run_id}: {', '.join(sorted(status))} already done")
+
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stage") as executor:
+        while True:
+            # Dependency order, so skips propagate downstream in one pass
+            for stage in ordered:
+                if stage.name in status or stage.name in running.values():
+                    continue
+
+                upstream = [status.get(name) for name in stage.after]
+
+                if any(state in (FAILED, SKIPPED) for state in upstream):
+                    status[stage.name] = SKIPPED
+                    record(run_id, stage.name, SKIPPED, previous.get(stage.name, {}).get("attempts", 0))
+                    print(f"[SKIP] stage {stage.name}: upstream failed")
+
+                elif all(state == DONE for state in upstream):
+                    attempts = previous.get(stage.name, {}).get("attempts", 0)
+                    running[executor.submit(run_stage, stage, run_id, attempts)] = stage.name
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                status[running.pop(future)] = future.result()
+
+    failed = [name for name, state in status.items() if state == FAILED]
+
+    if failed:
+        raise RuntimeError(f"Pipeline run {run_id} failed at: {', '.join(failed)}, rerun with PIPELINE_RUN_ID={run_id} to resume")
+
+    print(f"[OK] pipeline run {run_id} done")
+
+    return status
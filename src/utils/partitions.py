@@ -0,0 +1,403 @@
+"""
+Yearly range partitions for staging.stocks and curated.fact_stock_prices
+Creates partitions ahead of time, attaches backfilled tables and
+partitions the shadow tables of full rebuilds
+"""
+
+import re
+from datetime import date
+from functools import partial
+from src.utils import settings
+from src.utils.db import transaction, fetch_all, after_commit
+from src.utils.custom_exceptions import *
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+# Partitioned tables, all ranged on trade_date by year
+
+TABLES = ("staging.stocks", "curated.fact_stock_prices")
+
+PARTITION_KEY = "trade_date"
+
+# Full rebuilds load an unlogged copy named <table>_shadow,
+# see src/utils/rebuild.py
+
+SHADOW_SUFFIX = "_shadow"
+SHADOWS = tuple(f"{table}{SHADOW_SUFFIX}" for table in TABLES)
+
+# Read on use: PARTITIONS_AHEAD years created ahead of the current year (1)
+
+# Years known to exist per table, saves the catalog read per batch.
+# Only filled once the transaction that read them commits, a read
+# sees that transaction's own uncommitted partitions.
+_known: dict[str, set[int]] = {}
+
+# Bumped by forget, drops years read before it but committed after
+_generation: dict[str, int] = {}
+
+# --------------------------------------------------
+# SQL
+# --------------------------------------------------
+
+LIST_PARTITIONS = """
+SELECT c.relname
+FROM pg_inherits as i
+JOIN pg_class as c
+    ON c.oid = i.inhrelid
+WHERE i.inhparent = %(table)s::REGCLASS;
+"""
+
+# One partition manager at a time per table, held to commit
+
+LOCK = """
+SELECT pg_advisory_xact_lock(hashtext(%(table)s));
+"""
+
+CREATE_PARTITION = """
+CREATE TABLE IF NOT EXISTS {partition}
+PARTITION OF {table}
+FOR VALUES FROM ({lower}) TO ({upper});
+"""
+
+# Shadow partitions skip WAL until the rebuild makes them durable
+
+CREATE_SHADOW_PARTITION = """
+CREATE UNLOGGED TABLE IF NOT EXISTS {partition}
+PARTITION OF {table}
+FOR VALUES FROM ({lower}) TO ({upper});
+"""
+
+CREATE_BACKFILL = """
+CREATE TABLE {backfill} (
+    LIKE {table} INCLUDING DEFAULTS INCLUDING GENERATED,
+
+    CONSTRAINT {bound} CHECK ({key} >= {lower} AND {key} < {upper})
+);
+"""
+
+# The bound CHECK lets ATTACH skip its validation scan
+
+ATTACH_PARTITION = """
+ALTER TABLE {table}
+ATTACH PARTITION {backfill}
+FOR VALUES FROM ({lower}) TO ({upper});
+"""
+
+LIST_INDEXES = """
+SELECT indexname
+FROM pg_indexes
+WHERE schemaname = %(schema)s
+  AND tablename = %(table)s;
+"""
+
+DETACH_PARTITION = """
+ALTER TABLE {table}
+DETACH PARTITION {partition};
+"""
+
+# --------------------------------------------------
+# Naming
+# --------------------------------------------------
+
+def split_table(table: str) -> tuple[str, str]:
+
+    """
+    Split a schema qualified partitioned table name
+
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :return: Schema and table name
+    :rtype: tuple[str, str]
+    """
+
+    if table not in TABLES and table not in SHADOWS:
+        raise ConfigError(f"{table} is not a partitioned table")
+
+    schema, name = table.split(".")
+
+    return schema, name
+
+def shadow_table(table: str) -> str:
+
+    """
+    Rebuild shadow of a partitioned table eg staging.stocks_shadow
+
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :return: Shadow table, schema qualified
+    :rtype: str
+    """
+
+    if table not in TABLES:
+        raise ConfigError(f"{table} is not a partitioned table")
+
+    return f"{table}{SHADOW_SUFFIX}"
+
+def partition_name(table: str, year: int) -> str:
+
+    """
+    Name of a yearly partition eg stocks_2024
+
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :param year: Trade year
+    :type year: int
+    :return: Partition name, unqualified
+    :rtype: str
+    """
+
+    return f"{split_table(table)[1]}_{year}"
+
+def format_sql(statement: str, table: str, year: int, **names) -> "sql.Composed":
+
+    """
+    Fill table, partition and bound placeholders of a DDL statement
+
+    :param statement: DDL with {table}/{partition}/{lower}/{upper} fields
+    :type statement: str
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :param year: Trade year
+    :type year: int
+    :return: Composed statement
+    :rtype: sql.Composed
+    """
+
+    from psycopg import sql
+
+    schema, name = split_table(table)
+
+    return sql.SQL(statement).format(
+        table=sql.Identifier(schema, name),
+        partition=sql.Identifier(schema, partition_name(table, year)),
+        key=sql.Identifier(PARTITION_KEY),
+        lower=sql.Literal(date(year, 1, 1)),
+        upper=sql.Literal(date(year + 1, 1, 1)),
+        **{field: sql.Identifier(*value) if isinstance(value, tuple) else sql.Identifier(value) for field, value in names.items()}
+    )
+
+# --------------------------------------------------
+# Existing partitions
+# --------------------------------------------------
+
+def list_partitions(conn, table: str, cache: bool = True) -> set[int]:
+
+    """
+    Read the years already partitioned for a table
+
+    :param conn: Open connection
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :param cache: Remember the years once the transaction commits
+    :type cache: bool
+    :return: Partitioned years
+    :rtype: set[int]
+    """
+
+    pattern = re.compile(rf"^{re.escape(split_table(table)[1])}_(\d{{4}})$")
+
+    years = set()
+
+    for (relname,) in fetch_all(LIST_PARTITIONS, {"table": table}, conn=conn):
+        match = pattern.match(relname)
+
+        if match:
+            years.add(int(match.group(1)))
+
+    if cache:
+        remember(conn, table, years)
+
+    return years
+
+def remember(conn, table: str, years: set[int]):
+
+    """
+    Cache a table's years once the connection's transaction commits,
+    unless the table is forgotten in between
+
+    :param conn: Connection the years were read or created on
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :param years: Partitioned years
+    :type years: set[int]
+    """
+
+    after_commit(conn, partial(_remember, table, set(years), _generation.get(table, 0)))
+
+def _remember(table: str, years: set[int], generation: int):
+
+    if _generation.get(table, 0) == generation:
+        _known[table] = _known.get(table, set()) | years
+
+# --------------------------------------------------
+# Ensure partitions
+# --------------------------------------------------
+
+def ensure_partitions(conn, table: str, years) -> list[int]:
+
+    """
+    Create any missing yearly partitions inside the caller's transaction
+
+    Only takes the partition lock when a year is missing, which is
+    rare once future partitions are created ahead of time.
+
+    :param conn: Open connection, inside the load transaction
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :param years: Trade years about to be written
+    :return: Years created
+    :rtype: list[int]
+    """
+
+    years = {int(year) for year in years}
+
+    if years <= _known.get(table, set()):
+        return []
+
+    # Not cached here, the caller may roll back partitions it created
+    # in an earlier call of the same transaction
+    existing = list_partitions(conn, table, cache=False)
+
+    if years <= existing:
+        remember(conn, table, existing)
+        return []
+
+    create = CREATE_SHADOW_PARTITION if table in SHADOWS else CREATE_PARTITION
+
+    with conn.cursor() as cur:
+        cur.execute(LOCK, {"table": table})
+
+        existing = list_partitions(conn, table, cache=False)
+        missing = sorted(years - existing)
+
+        for year in missing:
+            cur.execute(format_sql(create, table, year))
+            print(f"[OK] created partition {partition_name(table, year)}")
+
+    # Visible to other transactions and cached once the caller commits
+    remember(conn, table, existing | set(missing))
+
+    return missing
+
+def forget(table: str):
+
+    """
+    Drop the cached years of a table, after its partitions were
+    replaced, detached or swapped. Years read before but committed
+    after are dropped as well.
+
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    """
+
+    _known.pop(table, None)
+    _generation[table] = _generation.get(table, 0) + 1
+
+def ensure_future_partitions(ahead: int | None = None) -> dict[str, list[int]]:
+
+    """
+    Create this year's and the next years' partitions for every table
+
+    :param ahead: Years created ahead of the current year, defaults to PARTITIONS_AHEAD
+    :type ahead: int | None
+    :return: Years created per table
+    :rtype: dict[str, list[int]]
+    """
+
+    if ahead is None:
+        ahead = settings.get_int("PARTITIONS_AHEAD", 1)
+
+    this_year = date.today().year
+    years = range(this_year, this_year + ahead + 1)
+
+    with transaction() as conn:
+        return {table: ensure_partitions(conn, table, years) for table in TABLES}
+
+# --------------------------------------------------
+# Backfill and attach
+# --------------------------------------------------
+
+def create_backfill_table(conn, table: str, year: int) -> str:
+
+    """
+    Create a standalone table shaped like a yearly partition
+
+    Bulk load it without partitioned index maintenance, then
+    attach it with attach_partition.
+
+    :param conn: Open connection
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :param year: Trade year
+    :type year: int
+    :return: Backfill table, schema qualified
+    :rtype: str
+    """
+
+    schema, _ = split_table(table)
+    backfill = f"{partition_name(table, year)}_backfill"
+
+    with conn.cursor() as cur:
+        cur.execute(format_sql(
+            CREATE_BACKFILL, table, year,
+            backfill=(schema, backfill),
+            bound=f"{backfill}_bound"
+        ))
+
+    return f"{schema}.{backfill}"
+
+def attach_partition(conn, table: str, year: int, replace: bool = False):
+
+    """
+    Attach a loaded backfill table as the yearly partition
+
+    :param conn: Open connection
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :param year: Trade year
+    :type year: int
+    :param replace: Detach and drop an existing partition for the year
+    :type replace: bool
+    """
+
+    from psycopg import sql
+
+    schema, _ = split_table(table)
+    partition = partition_name(table, year)
+    backfill = f"{partition}_backfill"
+
+    with conn.cursor() as cur:
+        cur.execute(LOCK, {"table": table})
+
+        if year in list_partitions(conn, table):
+            if not replace:
+                raise ConfigError(f"Partition {partition} already exists")
+
+            cur.execute(format_sql(DETACH_PARTITION, table, year))
+            cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(schema, partition)))
+
+        cur.execute(format_sql(ATTACH_PARTITION, table, year, backfill=(schema, backfill)))
+
+        cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(schema, backfill), sql.Identifier(partition)))
+        cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {}").format(sql.Identifier(schema, partition), sql.Identifier(f"{backfill}_bound")))
+
+        # Index partitions were named after the backfill table
+        for (index,) in fetch_all(LIST_INDEXES, {"schema": schema, "table": partition}, conn=conn):
+            if index.startswith(backfill):
+                cur.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(sql.Identifier(schema, index), sql.Identifier(index.replace(backfill, partition, 1))))
+
+    forget(table)
+
+    print(f"[OK] attached partition {partition}")
+
+# --------------------------------------------------
+# Entry point
+# --------------------------------------------------
+
+def main():
+    ensure_future_partitions()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Bounded producer/consumer pipeline over worker threads
+Each step runs in its own workers and hands results to the next
+through a bounded queue, so a slow consumer blocks its producers
+instead of buffering without limit. Throughput follows the slowest
+step rather than the sum of all of them.
+"""
+
+import queue
+import threading
+from typing import Callable, Generator, Iterable, Iterator
+from src.utils import metrics
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+# Seconds between stop checks while blocked on a queue
+POLL_SECONDS = 0.1
+
+# Marks the end of a queue
+_DONE = object()
+
+# --------------------------------------------------
+# Handoff
+# --------------------------------------------------
+
+class Handoff:
+
+    """
+    One item streamed in parts from the last step to the consumer
+
+    A step returns a Handoff to pass its item on before producing it:
+    the Handoff is queued at once and the step's worker then runs the
+    parts generator, at most depth parts ahead of the consumer
+    iterating it. Memory held per item is bounded by depth parts, not
+    by the item's size. An error producing the parts is raised to the
+    consumer, and closing the Handoff stops its producer.
+
+    :param value: What the consumer needs besides the parts
+    :param parts: Generator of the item's parts
+    :type parts: Generator
+    :param depth: Parts produced ahead of the consumer
+    :type depth: int
+    """
+
+    def __init__(self, value, parts: Generator, depth: int = 2):
+        self.value = value
+        self._parts = parts
+        self._queue = queue.Queue(maxsize=max(depth, 1))
+        self._closed = threading.Event()
+
+    def _put(self, entry, stop: threading.Event, name: str) -> bool:
+
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            pass
+
+        with metrics.timer("etl_pipeline_blocked", step=name):
+            while not stop.is_set() and not self._closed.is_set():
+                try:
+                    self._queue.put(entry, timeout=POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    continue
+
+        return False
+
+    def produce(self, stop: threading.Event, name: str):
+
+        """
+        Run the parts generator into the Handoff, on the step's worker
+
+        :param stop: Set when the pipeline is closed
+        :type stop: threading.Event
+        :param name: Step name for metrics
+        :type name: str
+        """
+
+        try:
+            while not self._closed.is_set():
+                with metrics.timer("etl_pipeline_step", step=name):
+                    part = next(self._parts, _DONE)
+
+                if not self._put((part, None), stop, name) or part is _DONE:
+                    return
+
+        except Exception as e:
+            self._put((_DONE, e), stop, name)
+
+        finally:
+            self._parts.close()
+
+    def __iter__(self) -> Iterator:
+
+        while True:
+            with metrics.timer("etl_pipeline_starved", step="consumer"):
+                part, error = self._queue.get()
+
+            if error is not None:
+                raise error
+
+            if part is _DONE:
+                return
+
+            yield part
+
+    def close(self):
+
+        """
+        Stop the producer, eg when the consumer gives up on the item
+        """
+
+        self._closed.set()
+
+# --------------------------------------------------
+# Pipeline
+# --------------------------------------------------
+
+def pipelined(items: Iterable, steps: list[tuple[str, Callable, int, int]]) -> Iterator[tuple]:
+
+    """
+    Run items through steps concurrently, yielding results as they
+    complete, not in input order
+
+    Each step is (name, function, workers, depth): function maps the
+    previous step's output, depth bounds the queue it feeds. An item
+    that fails a step skips the remaining steps and is yielded with
+    its error. The last step may return a Handoff to stream an item
+    to the consumer in parts. Closing the generator stops the workers.
+
+    Time blocked on a full queue (the next step is the bottleneck) is
+    recorded as etl_pipeline_blocked, time the consumer waits on an
+    empty queue as etl_pipeline_starved.
+
+    :param items: Inputs to the first step
+    :type items: Iterable
+    :param steps: (name, function, workers, depth) per step
+    :type steps: list[tuple[str, Callable, int, int]]
+    :return: (item, result, error) per item, error None on success
+    :rtype: Iterator[tuple]
+    """
+
+    stop = threading.Event()
+    lock = threading.Lock()
+
+    source = queue.Queue()
+    queues = [source] + [queue.Queue(maxsize=max(depth, 1)) for _, _, _, depth in steps]
+
+    workers = [max(count, 1) for _, _, count, _ in steps]
+    live = list(workers)
+
+    for item in items:
+        source.put((item, item, None))
+    for _ in range(workers[0]):
+        source.put(_DONE)
+
+    def put(target: queue.Queue, entry) -> bool:
+
+        while not stop.is_set():
+            try:
+                target.put(entry, timeout=POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def work(index: int, name: str, function: Callable):
+
+        inbox, outbox = queues[index], queues[index + 1]
+
+        while not stop.is_set():
+            try:
+                entry = inbox.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+
+            if entry is _DONE:
+                break
+
+            item, value, error = entry
+
+            if error is None:
+                try:
+                    with metrics.timer("etl_pipeline_step", step=name):
+                        value = function(value)
+                except Exception as e:
+                    value, error = None, e
+
+            with metrics.timer("etl_pipeline_blocked", step=name):
+                if not put(outbox, (item, value, error)):
+                    return
+
+            # Queued before its parts, produced as the consumer reads them
+            if isinstance(value, Handoff):
+                value.produce(stop, name)
+
+        # The last worker out of a step ends the next step's queue
+        with lock:
+            live[index] -= 1
+            last = live[index] == 0
+
+        if last:
+            for _ in range(workers[index + 1] if index + 1 < len(steps) else 1):
+                put(outbox, _DONE)
+
+    threads = [
+        threading.Thread(target=work, args=(index, name, function), name=f"{name}-{n}", daemon=True)
+        for index, (name, function, _, _) in enumerate(steps)
+        for n in range(workers[index])
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    results = queues[-1]
+
+    try:
+        while True:
+            with metrics.timer("etl_pipeline_starved", step="consumer"):
+                entry = results.get()
+
+            if entry is _DONE:
+                return
+
+            yield entry
+
+    finally:
+        stop.set()
+
+        for thread in threads:
+            thread.join()
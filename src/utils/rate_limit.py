@@ -0,0 +1,63 @@
+"""
+Token bucket rate limiter shared across worker threads
+"""
+
+import threading
+import time
+
+# --------------------------------------------------
+# Token bucket
+# --------------------------------------------------
+
+class TokenBucket:
+
+    """
+    Thread safe token bucket
+
+    Tokens refill continuously at rate_per_minute / 60 per second,
+    up to capacity. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+
+        """
+        :param rate_per_minute: Sustained requests allowed per minute
+        :type rate_per_minute: float
+        :param capacity: Maximum burst, defaults to one second of tokens
+        :type capacity: float | None
+        """
+
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens: float = 1.0):
+
+        """
+        Block until tokens are available, then consume them
+
+        :param tokens: Tokens to consume
+        :type tokens: float
+        """
+
+        while True:
+            with self.lock:
+                self._refill()
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+
+                wait = (tokens - self.tokens) / self.rate
+
+            time.sleep(wait)
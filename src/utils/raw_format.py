@@ -0,0 +1,319 @@
+"""
+Raw layer payload formats
+
+json        legacy payload, {meta..., "data": [...]}, indent=2
+ndjson.gz   gzip NDJSON, meta header line then one row per line
+ndjson.zst  zstd NDJSON, same layout (requires zstandard)
+
+Readers detect the format from the object bytes, so raw objects
+written in any format stay replayable.
+
+Payloads carry a content digest of their rows in the meta and as
+object metadata, so unchanged data can be recognised without
+reading it.
+"""
+
+import gzip
+import hashlib
+import json
+from src.utils import settings
+from src.utils.custom_exceptions import *
+from src.utils.json_stream import READ_SIZE, PayloadStream, stream_chunk_rows
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+# Format written when none is given, RAW_FORMAT overrides it
+DEFAULT_FORMAT = "json"
+
+FORMATS = {
+    "json": {
+        "extension": ".json",
+        "content_type": "application/json",
+        "content_encoding": None
+    },
+    "ndjson.gz": {
+        "extension": ".ndjson.gz",
+        "content_type": "application/x-ndjson",
+        "content_encoding": "gzip"
+    },
+    "ndjson.zst": {
+        "extension": ".ndjson.zst",
+        "content_type": "application/x-ndjson",
+        "content_encoding": "zstd"
+    }
+}
+
+RAW_EXTENSIONS = [spec["extension"] for spec in FORMATS.values()]
+
+# Content digest in the payload meta and in object metadata
+DIGEST_FIELD = "content_digest"
+DIGEST_METADATA = "content-digest"
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Longest NDJSON header line looked for before assuming legacy JSON
+MAX_HEADER_BYTES = 1 << 20
+
+# --------------------------------------------------
+# Helpers
+# --------------------------------------------------
+
+def write_format() -> str:
+
+    """
+    Raw format new payloads are written in, RAW_FORMAT
+    """
+
+    return settings.get("RAW_FORMAT", DEFAULT_FORMAT)
+
+def _format_spec(fmt: str) -> dict:
+
+    if fmt not in FORMATS:
+        raise ConfigError(f"Unknown raw format: {fmt}")
+
+    return FORMATS[fmt]
+
+def _zstandard():
+
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ConfigError("zstandard is required for the ndjson.zst raw format") from e
+
+    return zstandard
+
+class _Prefixed:
+
+    """
+    File-like reader returning already consumed bytes before the body
+    """
+
+    def __init__(self, prefix: bytes, body):
+        self.prefix = prefix
+        self.body = body
+
+    def read(self, size: int = -1) -> bytes:
+
+        if not self.prefix:
+            return self.body.read(size)
+
+        if size is None or size < 0:
+            data, self.prefix = self.prefix + self.body.read(), b""
+            return data
+
+        data, self.prefix = self.prefix[:size], self.prefix[size:]
+        return data
+
+# --------------------------------------------------
+# Content digest
+# --------------------------------------------------
+
+class ContentDigest:
+
+    """
+    sha256 over the canonical JSON array of the rows, fed in chunks
+
+    Depends only on the rows, not on the raw format, compression,
+    chunking or payload meta such as ingested_at.
+    """
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self._rows = 0
+
+    def update(self, rows: list[dict]) -> "ContentDigest":
+
+        if not rows:
+            return self
+
+        # One encoder call per chunk, chunks joined as one array body
+        if self._rows:
+            self._hash.update(b",")
+
+        self._hash.update(json.dumps(rows, sort_keys=True, separators=(",", ":"))[1:-1].encode("utf-8"))
+        self._rows += len(rows)
+
+        return self
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+def content_digest(rows: list[dict]) -> str:
+
+    """
+    Content digest of payload rows
+
+    :param rows: Payload data rows
+    :type rows: list[dict]
+    :return: Hex sha256
+    :rtype: str
+    """
+
+    return ContentDigest().update(rows).hexdigest()
+
+# --------------------------------------------------
+# Write side
+# --------------------------------------------------
+
+def raw_key(stem: str, fmt: str | None = None) -> str:
+
+    """
+    Object key for a raw payload in the given format
+
+    :param stem: Key without extension
+    :type stem: str
+    :param fmt: Raw format, defaults to RAW_FORMAT
+    :type fmt: str | None
+    :return: Object key
+    :rtype: str
+    """
+
+    return stem + _format_spec(fmt or write_format())["extension"]
+
+def encode_payload(meta: dict, rows: list, fmt: str | None = None, digest: str | None = None) -> tuple[bytes, dict]:
+
+    """
+    Serialise a raw payload, tagged with its content digest
+
+    :param meta: Payload meta
+    :type meta: dict
+    :param rows: Payload data rows
+    :type rows: list
+    :param fmt: Raw format, defaults to RAW_FORMAT
+    :type fmt: str | None
+    :param digest: Content digest of rows, computed if None
+    :type digest: str | None
+    :return: Object body and storage put keyword arguments
+    :rtype: tuple[bytes, dict]
+    """
+
+    fmt = fmt or write_format()
+    spec = _format_spec(fmt)
+
+    digest = digest or content_digest(rows)
+    meta = {**meta, DIGEST_FIELD: digest}
+
+    if fmt == "json":
+        body = json.dumps({**meta, "data": rows}, indent=2).encode("utf-8")
+
+    else:
+        lines = [json.dumps(meta)]
+        lines.extend(json.dumps(row) for row in rows)
+        ndjson = ("\n".join(lines) + "\n").encode("utf-8")
+
+        if spec["content_encoding"] == "gzip":
+            body = gzip.compress(ndjson, compresslevel=6)
+        else:
+            body = _zstandard().ZstdCompressor(level=10).compress(ndjson)
+
+    put_args = {
+        "content_type": spec["content_type"],
+        "content_encoding": spec["content_encoding"],
+        "metadata": {
+            "raw-format": fmt,
+            "row-count": str(len(rows)),
+            DIGEST_METADATA: digest
+        }
+    }
+
+    return body, put_args
+
+# --------------------------------------------------
+# Read side
+# --------------------------------------------------
+
+def _decompress(body):
+
+    head = body.read(4)
+    stream = _Prefixed(head, body)
+
+    if head.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+
+    if head.startswith(ZSTD_MAGIC):
+        return _zstandard().ZstdDecompressor().stream_reader(stream)
+
+    return stream
+
+def _read_first_line(stream) -> tuple[bytes, bytes]:
+
+    buffer = b""
+
+    while b"\n" not in buffer and len(buffer) < MAX_HEADER_BYTES:
+        block = stream.read(READ_SIZE)
+        if not block:
+            break
+        buffer += block
+
+    line, newline, rest = buffer.partition(b"\n")
+
+    if not newline:
+        return b"", buffer
+
+    return line, rest
+
+def _iter_ndjson_chunks(stream, chunk_rows: int):
+
+    chunk = []
+    pending = b""
+
+    while True:
+        block = stream.read(READ_SIZE)
+
+        if block:
+            pending += block
+            *lines, pending = pending.split(b"\n")
+        else:
+            lines, pending = [pending], b""
+
+        for line in lines:
+            if not line.strip():
+                continue
+
+            try:
+                chunk.append(json.loads(line))
+            except ValueError as e:
+                raise ParsingError(f"Invalid NDJSON row: {e}") from e
+
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+
+        if not block:
+            break
+
+    if chunk:
+        yield chunk
+
+def open_payload(body, chunk_rows: int | None = None):
+
+    """
+    Stream a raw payload in any raw format
+
+    :param body: File-like object with read(n), eg S3 StreamingBody or mmap
+    :param chunk_rows: Rows per chunk, defaults to STREAM_CHUNK_ROWS
+    :type chunk_rows: int | None
+    :return: Payload meta and an iterator of row chunks
+    :rtype: tuple[dict, Iterator[list[dict]]]
+    """
+
+    chunk_rows = chunk_rows or stream_chunk_rows()
+    stream = _decompress(body)
+
+    line, rest = _read_first_line(stream)
+
+    try:
+        header = json.loads(line) if line else None
+    except ValueError:
+        header = None
+
+    if isinstance(header, dict) and "data" not in header:
+        return header, _iter_ndjson_chunks(_Prefixed(rest, stream), chunk_rows)
+
+    legacy = PayloadStream(_Prefixed(line + b"\n" + rest if line else rest, stream))
+    meta = legacy.read_meta()
+
+    return meta, legacy.iter_chunks(chunk_rows)
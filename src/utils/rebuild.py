@@ -0,0 +1,515 @@
+"""
+Full rebuilds of a partitioned table through a shadow copy
+The shadow is loaded into unlogged partitions without indexes,
+its indexes and constraints are then built in parallel, one
+partition per connection, and it replaces the live table by
+renames in one short transaction. Readers keep the old table
+until the swap commits, writers wait for the whole rebuild.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Callable
+from src.utils.db import get_connection, transaction, fetch_all
+from src.utils.partitions import LOCK, LIST_INDEXES, SHADOW_SUFFIX, shadow_table, split_table, partition_name, list_partitions, ensure_partitions, forget
+from src.utils import metrics, settings
+from src.utils.custom_exceptions import *
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+# Read on use:
+# REBUILD_WORKERS               partitions indexed at once, one connection each (4)
+# REBUILD_MAINTENANCE_WORK_MEM  per index build connection (1GB)
+# REBUILD_LOCK_TIMEOUT          wait for the table locks before giving up an
+#                               attempt, readers queue behind the swap for at
+#                               most this long (30s)
+# REBUILD_SWAP_RETRIES          swap attempts (5)
+# REBUILD_KEEP_OLD              keep the replaced table as <table>_old instead
+#                               of dropping it (false)
+
+OLD_SUFFIX = "_old"
+
+# Longest Postgres identifier
+MAX_NAME = 63
+
+# --------------------------------------------------
+# SQL
+# --------------------------------------------------
+
+# Plain column indexes of a table, with the constraint each backs
+
+SELECT_INDEXES = """
+SELECT
+    i.relname,
+    am.amname,
+    x.indisunique,
+    c.conname IS NOT NULL,
+    c.contype,
+    ARRAY(
+        SELECT a.attname
+        FROM unnest(x.indkey::INT2[]) WITH ORDINALITY as k(attnum, n)
+        JOIN pg_attribute as a
+            ON a.attrelid = x.indrelid
+           AND a.attnum = k.attnum
+        WHERE k.n <= x.indnkeyatts
+        ORDER BY k.n
+    ),
+    x.indexprs IS NOT NULL OR x.indpred IS NOT NULL
+FROM pg_index as x
+JOIN pg_class as i
+    ON i.oid = x.indexrelid
+JOIN pg_am as am
+    ON am.oid = i.relam
+LEFT JOIN pg_constraint as c
+    ON c.conindid = x.indexrelid
+   AND c.conrelid = x.indrelid
+   AND c.contype IN ('p', 'u')
+WHERE x.indrelid = %(table)s::REGCLASS
+ORDER BY i.relname;
+"""
+
+SELECT_FOREIGN_KEYS = """
+SELECT conname, pg_get_constraintdef(oid)
+FROM pg_constraint
+WHERE conrelid = %(table)s::REGCLASS
+  AND contype = 'f'
+ORDER BY conname;
+"""
+
+# Grantee 0 is PUBLIC
+
+SELECT_GRANTS = """
+SELECT
+    CASE WHEN g.grantee = 0 THEN 'PUBLIC' ELSE pg_get_userbyid(g.grantee) END,
+    g.privilege_type
+FROM pg_class as c,
+     aclexplode(c.relacl) as g
+WHERE c.oid = %(table)s::REGCLASS;
+"""
+
+SELECT_SEQUENCES = """
+SELECT a.attname, pg_get_serial_sequence(%(table)s, a.attname)
+FROM pg_attribute as a
+WHERE a.attrelid = %(table)s::REGCLASS
+  AND a.attnum > 0
+  AND NOT a.attisdropped
+  AND pg_get_serial_sequence(%(table)s, a.attname) IS NOT NULL;
+"""
+
+SELECT_UNLOGGED = """
+SELECT c.relname
+FROM pg_inherits as i
+JOIN pg_class as c
+    ON c.oid = i.inhrelid
+WHERE i.inhparent = %(table)s::REGCLASS
+  AND c.relpersistence = 'u';
+"""
+
+# Columns, defaults, generated columns and checks, no indexes
+
+CREATE_SHADOW = """
+CREATE TABLE {shadow} (
+    LIKE {table} INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS INCLUDING COMMENTS
+)
+PARTITION BY RANGE ({key});
+"""
+
+CONSTRAINT_TYPES = {"p": "PRIMARY KEY", "u": "UNIQUE"}
+
+# --------------------------------------------------
+# Catalog
+# --------------------------------------------------
+
+@dataclass
+class IndexSpec:
+
+    """
+    Index of the live table, rebuilt on the shadow under the same name
+    """
+
+    name: str
+    method: str
+    unique: bool
+    constraint: str | None
+    columns: list[str]
+
+def read_indexes(conn, table: str) -> list[IndexSpec]:
+
+    """
+    Read the indexes of a partitioned table
+
+    :param conn: Open connection
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :return: Index specs, constraint type p/u or None
+    :rtype: list[IndexSpec]
+    """
+
+    specs = []
+
+    for name, method, unique, has_constraint, contype, columns, derived in fetch_all(SELECT_INDEXES, {"table": table}, conn=conn):
+        if derived:
+            raise ConfigError(f"{table} index {name} has expressions or a predicate, rebuild it by hand")
+
+        specs.append(IndexSpec(name, method, unique, contype if has_constraint else None, list(columns)))
+
+    return specs
+
+def partition_index(partition: str, spec: IndexSpec) -> str:
+
+    """
+    Name of a shadow partition's index, prefixed by the partition so
+    renaming the partition prefix at the swap keeps names unique
+
+    :param partition: Partition name eg stocks_shadow_2024
+    :type partition: str
+    :param spec: Parent index
+    :type spec: IndexSpec
+    :return: Index name
+    :rtype: str
+    """
+
+    name = f"{partition}_{spec.name}"
+
+    if len(name) > MAX_NAME:
+        raise ConfigError(f"Index name {name} is longer than {MAX_NAME} characters")
+
+    return name
+
+# --------------------------------------------------
+# Shadow
+# --------------------------------------------------
+
+def create_shadow(table: str) -> str:
+
+    """
+    Create an empty shadow of a table, with unlogged partitions for
+    the years the table has, replacing any left by a failed rebuild
+
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :return: Shadow table
+    :rtype: str
+    """
+
+    from psycopg import sql
+
+    shadow = shadow_table(table)
+
+    with transaction() as conn, conn.cursor() as cur:
+        cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(*split_table(shadow))))
+        cur.execute(sql.SQL(CREATE_SHADOW).format(shadow=sql.Identifier(*split_table(shadow)), table=sql.Identifier(*split_table(table)), key=sql.Identifier("trade_date")))
+
+        forget(shadow)
+        ensure_partitions(conn, shadow, list_partitions(conn, table))
+
+    return shadow
+
+def build_partition(partition: str, schema: str, specs: list[IndexSpec], foreign_keys: list[tuple[str, str]]) -> str:
+
+    """
+    Make one shadow partition durable, then build its indexes,
+    constraints and foreign keys, on its own connection
+
+    WAL is written once by SET LOGGED before the indexes exist, so
+    they are not rewritten with the table.
+
+    :param partition: Partition name eg stocks_shadow_2024
+    :type partition: str
+    :param schema: Schema of the partition
+    :type schema: str
+    :param specs: Indexes of the live table
+    :type specs: list[IndexSpec]
+    :param foreign_keys: (name, definition) of the live table
+    :type foreign_keys: list[tuple[str, str]]
+    :return: Partition name
+    :rtype: str
+    """
+
+    from psycopg import sql
+
+    target = sql.Identifier(schema, partition)
+
+    with closing(get_connection()) as conn:
+        conn.autocommit = True
+
+        with conn.cursor() as cur, metrics.timer("etl_rebuild_partition"):
+            cur.execute(sql.SQL("SET maintenance_work_mem = {}").format(sql.Literal(settings.get("REBUILD_MAINTENANCE_WORK_MEM", "1GB"))))
+            cur.execute(sql.SQL("ALTER TABLE {} SET LOGGED").format(target))
+
+            for spec in specs:
+                index = partition_index(partition, spec)
+
+                cur.execute(sql.SQL("CREATE {unique}INDEX {index} ON {table} USING {method} ({columns})").format(
+                    unique=sql.SQL("UNIQUE " if spec.unique else ""),
+                    index=sql.Identifier(index),
+                    table=target,
+                    method=sql.SQL(spec.method),
+                    columns=sql.SQL(", ").join(sql.Identifier(column) for column in spec.columns)
+                ))
+
+                if spec.constraint:
+                    cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {} USING INDEX {}").format(
+                        target, sql.Identifier(index), sql.SQL(CONSTRAINT_TYPES[spec.constraint]), sql.Identifier(index)
+                    ))
+
+            # Definitions come from pg_get_constraintdef
+            for name, definition in foreign_keys:
+                cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {}").format(target, sql.Identifier(name), sql.SQL(definition)))
+
+    return partition
+
+def finish_shadow(table: str, workers: int | None = None) -> int:
+
+    """
+    Build the live table's indexes, constraints, foreign keys and
+    grants on its loaded shadow and analyze it
+
+    Partitions are indexed in parallel. The parent indexes and
+    constraints are then created with a _shadow suffix, which only
+    attaches the partition indexes, and renamed at the swap.
+
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :param workers: Partitions indexed at once, defaults to REBUILD_WORKERS
+    :type workers: int | None
+    :return: Partitions indexed
+    :rtype: int
+    """
+
+    from psycopg import sql
+
+    workers = workers or settings.get_int("REBUILD_WORKERS", 4)
+    shadow = shadow_table(table)
+    schema, _ = split_table(shadow)
+
+    with transaction() as conn:
+        specs = read_indexes(conn, table)
+        foreign_keys = fetch_all(SELECT_FOREIGN_KEYS, {"table": table}, conn=conn)
+        grants = fetch_all(SELECT_GRANTS, {"table": table}, conn=conn)
+        partitions = [partition_name(shadow, year) for year in sorted(list_partitions(conn, shadow))]
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        for partition in executor.map(lambda partition: build_partition(partition, schema, specs, foreign_keys), partitions):
+            print(f"[OK] {schema}.{partition} indexed")
+
+    target = sql.Identifier(schema, split_table(shadow)[1])
+
+    with transaction() as conn, conn.cursor() as cur:
+        for spec in specs:
+            name = sql.Identifier(f"{spec.name}{SHADOW_SUFFIX}")
+            columns = sql.SQL(", ").join(sql.Identifier(column) for column in spec.columns)
+
+            if spec.constraint:
+                cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {} ({})").format(target, name, sql.SQL(CONSTRAINT_TYPES[spec.constraint]), columns))
+            else:
+                cur.execute(sql.SQL("CREATE {unique}INDEX {index} ON {table} USING {method} ({columns})").format(
+                    unique=sql.SQL("UNIQUE " if spec.unique else ""),
+                    index=name,
+                    table=target,
+                    method=sql.SQL(spec.method),
+                    columns=columns
+                ))
+
+        for name, definition in foreign_keys:
+            cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {}").format(target, sql.Identifier(name), sql.SQL(definition)))
+
+        for grantee, privilege in grants:
+            cur.execute(sql.SQL("GRANT {} ON {} TO {}").format(sql.SQL(privilege), target, sql.SQL("PUBLIC") if grantee == "PUBLIC" else sql.Identifier(grantee)))
+
+    with closing(get_connection()) as conn, metrics.timer("etl_rebuild_analyze"):
+        conn.autocommit = True
+
+        # Samples the parent and recurses into each partition
+        conn.execute(sql.SQL("ANALYZE {}").format(target))
+
+    return len(partitions)
+
+# --------------------------------------------------
+# Swap
+# --------------------------------------------------
+
+def freeze_writes(conn, table: str):
+
+    """
+    Block writes to a table until the connection's transaction ends,
+    reads carry on. Held from before the shadow is loaded to the swap
+    so no write to the live table is lost.
+
+    :param conn: Dedicated connection, not pooled, left in its transaction
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    """
+
+    from psycopg import sql
+
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("SET lock_timeout = {}").format(sql.Literal(settings.get("REBUILD_LOCK_TIMEOUT", "30s"))))
+        cur.execute(sql.SQL("LOCK TABLE {} IN EXCLUSIVE MODE").format(sql.Identifier(*split_table(table))))
+
+def rename_tree(cur, table: str, name: str, suffix: str = ""):
+
+    """
+    Rename a partitioned table, its partitions and their indexes
+
+    :param cur: Cursor inside the swap transaction
+    :param table: Partitioned table to rename eg staging.stocks_shadow
+    :type table: str
+    :param name: New table name, unqualified eg stocks
+    :type name: str
+    :param suffix: Appended to the parent's index names, removed when
+        the names already carry it
+    :type suffix: str
+    """
+
+    from psycopg import sql
+
+    schema, current = split_table(table)
+    conn = cur.connection
+
+    for year in sorted(list_partitions(conn, table)):
+        partition = partition_name(table, year)
+        renamed = f"{name}_{year}"
+
+        for (index,) in fetch_all(LIST_INDEXES, {"schema": schema, "table": partition}, conn=conn):
+            if index.startswith(partition):
+                cur.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(sql.Identifier(schema, index), sql.Identifier(renamed + index[len(partition):])))
+
+        cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(schema, partition), sql.Identifier(renamed)))
+
+    for (index,) in fetch_all(LIST_INDEXES, {"schema": schema, "table": current}, conn=conn):
+        if index.endswith(SHADOW_SUFFIX):
+            renamed = index[:-len(SHADOW_SUFFIX)]
+        else:
+            renamed = f"{index}{suffix}"
+
+        cur.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(sql.Identifier(schema, index), sql.Identifier(renamed)))
+
+    cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(schema, current), sql.Identifier(name)))
+
+def swap(conn, table: str, keep_old: bool | None = None, on_swap: Callable | None = None):
+
+    """
+    Replace a table by its finished shadow with renames
+
+    Runs in the transaction of the connection that froze the table,
+    the caller commits. Serial sequences move to the shadow before
+    the old table is dropped, or kept as <table>_old.
+
+    :param conn: Connection holding freeze_writes
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :param keep_old: Rename the old table to <table>_old, replacing
+        any previous one, instead of dropping it, defaults to REBUILD_KEEP_OLD
+    :type keep_old: bool | None
+    :param on_swap: Called with the connection after the renames, to
+        commit related state with the swap
+    :type on_swap: Callable | None
+    """
+
+    from psycopg import sql
+
+    if keep_old is None:
+        keep_old = settings.get_bool("REBUILD_KEEP_OLD")
+
+    shadow = shadow_table(table)
+    schema, name = split_table(table)
+    old = f"{table}{OLD_SUFFIX}"
+
+    if fetch_all(SELECT_UNLOGGED, {"table": shadow}, conn=conn) or len(read_indexes(conn, shadow)) != len(read_indexes(conn, table)):
+        raise SQLError(f"{shadow} is not finished, run finish_shadow first")
+
+    with conn.cursor() as cur:
+        cur.execute(LOCK, {"table": table})
+        cur.execute(sql.SQL("LOCK TABLE {}, {} IN ACCESS EXCLUSIVE MODE").format(sql.Identifier(schema, name), sql.Identifier(*split_table(shadow))))
+
+        # Returned quoted by pg_get_serial_sequence
+        for column, sequence in fetch_all(SELECT_SEQUENCES, {"table": table}, conn=conn):
+            cur.execute(sql.SQL("ALTER SEQUENCE {} OWNED BY {}").format(sql.SQL(sequence), sql.Identifier(*split_table(shadow), column)))
+
+        if keep_old:
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(schema, f"{name}{OLD_SUFFIX}")))
+            rename_tree(cur, table, f"{name}{OLD_SUFFIX}", OLD_SUFFIX)
+        else:
+            cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(schema, name)))
+
+        forget(table)
+        rename_tree(cur, shadow, name)
+
+        if on_swap is not None:
+            on_swap(conn)
+
+    forget(table)
+    forget(shadow)
+    forget(old)
+
+# --------------------------------------------------
+# Rebuild
+# --------------------------------------------------
+
+def rebuild(table: str, load: Callable[[], dict], on_swap: Callable | None = None, keep_old: bool | None = None, workers: int | None = None) -> dict:
+
+    """
+    Rebuild a table from scratch: load its shadow, index it and swap
+    it in, writes to the table are held off from start to finish
+
+    The loader writes to shadow_table(table) only. A failed rebuild
+    leaves the live table untouched and the shadow behind, dropped
+    by the next rebuild.
+
+    :param table: Partitioned table eg staging.stocks
+    :type table: str
+    :param load: Fills the shadow, returns its counts
+    :type load: Callable[[], dict]
+    :param on_swap: Called with the swap connection and the load counts
+    :type on_swap: Callable | None
+    :param keep_old: Keep the replaced table as <table>_old, defaults to REBUILD_KEEP_OLD
+    :type keep_old: bool | None
+    :param workers: Partitions indexed at once, defaults to REBUILD_WORKERS
+    :type workers: int | None
+    :return: Counts returned by load
+    :rtype: dict
+    """
+
+    from psycopg import errors
+
+    retries = settings.get_int("REBUILD_SWAP_RETRIES", 5)
+
+    # Not pooled, the staging loader closes the pool before forking
+    with closing(get_connection()) as freeze:
+        started = time.perf_counter()
+
+        with metrics.timer("etl_rebuild", table=table, step="freeze"):
+            freeze_writes(freeze, table)
+
+        with metrics.timer("etl_rebuild", table=table, step="load"):
+            create_shadow(table)
+            result = load()
+
+        with metrics.timer("etl_rebuild", table=table, step="index"):
+            partitions = finish_shadow(table, workers)
+
+        with metrics.timer("etl_rebuild", table=table, step="swap"):
+            for attempt in range(1, retries + 1):
+                try:
+                    # Savepoint, a lock timeout keeps the freeze
+                    with freeze.transaction():
+                        swap(freeze, table, keep_old, on_swap and (lambda conn: on_swap(conn, result)))
+                    break
+
+                except errors.LockNotAvailable:
+                    if attempt == retries:
+                        raise SQLError(f"{table} swap could not lock the table within {settings.get("REBUILD_LOCK_TIMEOUT", "30s")} in {attempt} attempts")
+
+                    print(f"[WARN] {table} swap waiting for readers, attempt {attempt}")
+                    time.sleep(attempt)
+
+            freeze.commit()
+
+    print(f"[OK] {table} rebuilt, {partitions} partitions indexed in {time.perf_counter() - started:.1f}s")
+
+    return result
@@ -1,52 +1,50 @@
-import os
-import boto3
-from dotenv import load_dotenv
+import threading
+from src.utils import settings
 from src.utils.custom_exceptions import *
 
 # --------------------------------------------------
-# Load environment variables
+# AWS config, resolved on first use
 # --------------------------------------------------
 
-load_dotenv()
+_client = None
+_client_lock = threading.Lock()
 
-# --------------------------------------------------
-# AWS config
-# --------------------------------------------------
-
-s3_bucket = os.getenv("S3_RAW_BUCKET")
-
-if not s3_bucket:
-    raise ConfigError("S3 bucket not set in environment")
+def get_bucket() -> str:
 
-aws_region = os.getenv("AWS_REGION")
+    """
+    Raw bucket name from S3_RAW_BUCKET
 
-client = boto3.client(
-    "s3",
-    region_name=aws_region
-)
+    :return: S3 Bucket
+    :rtype: str
+    """
 
-# --------------------------------------------------
-# S3 helpers
-# --------------------------------------------------
+    return settings.require("S3_RAW_BUCKET", "S3 bucket")
 
-def s3_key_exists(bucket: str, key: str) -> bool:
+def get_client():
 
     """
-    Checks if S3 bucket exists
-    
-    :param bucket: S3 Bucket
-    :type bucket: str
-    :param key: Path key
-    :type key: str
-    :return: True/False
-    :rtype: bool
+    Process-wide boto3 S3 client, boto3 is imported on first use
     """
 
-    try:
-        client.head_object(Bucket=bucket, Key=key)
-        return True
-    
-    except client.exceptions.ClientError as e:
-        if e.response["Error"]["Code"] == "404":
-            return False
-        raise
\ No newline at end of file
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            import boto3
+
+            _client = boto3.client(
+                "s3",
+                region_name=settings.get("AWS_REGION")
+            )
+
+    return _client
+
+def __getattr__(name: str):
+
+    # Module attributes s3_bucket and client kept for existing callers
+    if name == "s3_bucket":
+        return get_bucket()
+    if name == "client":
+        return get_client()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,126 @@
+"""
+Environment settings, loaded on first use
+Nothing is read or validated at import, so modules import without
+credentials and jobs only pay for the settings they touch
+"""
+
+import os
+import threading
+from src.utils.custom_exceptions import *
+
+# --------------------------------------------------
+# .env loading
+# --------------------------------------------------
+
+_loaded = False
+_lock = threading.Lock()
+
+def load_env():
+
+    """
+    Load .env into the process environment once, existing variables win
+    """
+
+    global _loaded
+
+    if _loaded:
+        return
+
+    with _lock:
+        if not _loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            _loaded = True
+
+# --------------------------------------------------
+# Lookups
+# --------------------------------------------------
+
+def get(name: str, default: str | None = None) -> str | None:
+
+    """
+    Read a setting after loading .env
+
+    :param name: Environment variable
+    :type name: str
+    :param default: Value when unset
+    :type default: str | None
+    :return: Setting value
+    :rtype: str | None
+    """
+
+    load_env()
+
+    return os.getenv(name, default)
+
+def require(name: str, description: str | None = None) -> str:
+
+    """
+    Read a setting that must be set
+
+    :param name: Environment variable
+    :type name: str
+    :param description: What the setting is, for the error message
+    :type description: str | None
+    :return: Setting value
+    :rtype: str
+    """
+
+    value = get(name)
+
+    if not value:
+        raise ConfigError(f"{description or name} not set in environment")
+
+    return value
+
+def get_int(name: str, default: int) -> int:
+
+    """
+    Read an integer setting
+
+    :param name: Environment variable
+    :type name: str
+    :param default: Value when unset
+    :type default: int
+    :return: Setting value
+    :rtype: int
+    """
+
+    value = get(name)
+
+    return int(value) if value else default
+
+def get_float(name: str, default: float) -> float:
+
+    """
+    Read a float setting
+
+    :param name: Environment variable
+    :type name: str
+    :param default: Value when unset
+    :type default: float
+    :return: Setting value
+    :rtype: float
+    """
+
+    value = get(name)
+
+    return float(value) if value else default
+
+def get_bool(name: str, default: bool = False) -> bool:
+
+    """
+    Read a true/false setting
+
+    :param name: Environment variable
+    :type name: str
+    :param default: Value when unset
+    :type default: bool
+    :return: True when set to true, any case
+    :rtype: bool
+    """
+
+    value = get(name)
+
+    return value.lower() == "true" if value else default
@@ -0,0 +1,408 @@
+"""
+Raw layer storage backends, S3 and a local filesystem mirror
+Keys are identical on both, so a local data lake can be an
+`aws s3 sync` copy of the bucket
+"""
+
+import mmap
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from src.utils import metrics, settings
+from src.utils.custom_exceptions import *
+from src.utils.raw_format import RAW_EXTENSIONS
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+_storage = None
+
+def local_data_lake() -> Path:
+
+    """
+    Local data lake root, LOCAL_DATA_LAKE or data_lake in the project
+    """
+
+    return Path(settings.get("LOCAL_DATA_LAKE") or PROJECT_ROOT / "data_lake")
+
+# --------------------------------------------------
+# Shared helpers
+# --------------------------------------------------
+
+def newest_raw_key(objects: list[dict], stem: str) -> str | None:
+
+    """
+    Pick the most recently written raw object for a key stem
+
+    :param objects: Listed objects under the stem
+    :type objects: list[dict]
+    :param stem: Path key without extension
+    :type stem: str
+    :return: Key, None if no raw format matches
+    :rtype: str | None
+    """
+
+    candidates = {stem + extension for extension in RAW_EXTENSIONS}
+
+    matches = [obj for obj in objects if obj["key"] in candidates]
+
+    if not matches:
+        return None
+
+    return max(matches, key=lambda obj: obj["last_modified"])["key"]
+
+# --------------------------------------------------
+# S3 backend
+# --------------------------------------------------
+
+class S3Storage:
+
+    """
+    Raw objects in an S3 bucket
+    """
+
+    backend = "s3"
+
+    def __init__(self, bucket: str | None = None, client=None):
+
+        if bucket is None or client is None:
+            from src.utils import s3config
+
+            bucket = bucket or s3config.get_bucket()
+            client = client or s3config.get_client()
+
+        self.bucket = bucket
+        self.client = client
+
+    def uri(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+    def put(self, key: str, body: bytes, content_type: str | None = None, content_encoding: str | None = None, metadata: dict | None = None) -> str:
+
+        """
+        Write an object
+
+        :param key: Object key
+        :type key: str
+        :param body: Object bytes
+        :type body: bytes
+        :param content_type: MIME type
+        :type content_type: str | None
+        :param content_encoding: gzip, zstd or None
+        :type content_encoding: str | None
+        :param metadata: User metadata
+        :type metadata: dict | None
+        :return: ETag of the written object
+        :rtype: str
+        """
+
+        args = {"Bucket": self.bucket, "Key": key, "Body": body}
+
+        if content_type:
+            args["ContentType"] = content_type
+        if content_encoding:
+            args["ContentEncoding"] = content_encoding
+        if metadata:
+            args["Metadata"] = metadata
+
+        with metrics.timer("etl_storage_put", backend="s3"):
+            etag = self.client.put_object(**args)["ETag"]
+
+        metrics.observe("etl_storage_put_bytes", len(body), buckets=metrics.SIZE_BUCKETS, backend="s3")
+
+        return etag
+
+    def open(self, key: str) -> tuple:
+
+        """
+        Open an object as a stream
+
+        :param key: Object key
+        :type key: str
+        :return: Streaming body and ETag
+        :rtype: tuple
+        """
+
+        with metrics.timer("etl_storage_get", backend="s3"):
+            request = self.client.get_object(Bucket=self.bucket, Key=key)
+
+        if "ContentLength" in request:
+            metrics.observe("etl_storage_get_bytes", request["ContentLength"], buckets=metrics.SIZE_BUCKETS, backend="s3")
+
+        return request["Body"], request["ETag"]
+
+    def get(self, key: str) -> bytes:
+
+        body, _ = self.open(key)
+
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    def head(self, key: str) -> dict | None:
+
+        """
+        Object attributes without reading it
+
+        :param key: Object key
+        :type key: str
+        :return: etag, size, last_modified, metadata, None if absent
+        :rtype: dict | None
+        """
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key)
+
+        except self.client.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+        return {
+            "etag": response["ETag"],
+            "size": response.get("ContentLength"),
+            "last_modified": response.get("LastModified"),
+            "metadata": response.get("Metadata", {})
+        }
+
+    def list(self, prefix: str) -> list[dict]:
+
+        """
+        List objects under a key prefix, all pages
+
+        :param prefix: Key prefix, may end mid file name
+        :type prefix: str
+        :return: key, etag, size, last_modified per object
+        :rtype: list[dict]
+        """
+
+        params = {"Bucket": self.bucket, "Prefix": prefix}
+        objects = []
+
+        while True:
+            with metrics.timer("etl_storage_list", backend="s3"):
+                response = self.client.list_objects_v2(**params)
+
+            objects.extend(
+                {
+                    "key": obj["Key"],
+                    "etag": obj.get("ETag"),
+                    "size": obj.get("Size"),
+                    "last_modified": obj["LastModified"]
+                }
+                for obj in response.get("Contents", [])
+            )
+
+            if not response.get("IsTruncated"):
+                return objects
+
+            params["ContinuationToken"] = response["NextContinuationToken"]
+
+    def find_raw(self, stem: str) -> str | None:
+
+        """
+        Latest raw object for a key stem in any raw format
+
+        :param stem: Path key without extension
+        :type stem: str
+        :return: Key, None if absent
+        :rtype: str | None
+        """
+
+        return newest_raw_key(self.list(stem), stem)
+
+# --------------------------------------------------
+# Local filesystem backend
+# --------------------------------------------------
+
+class LocalStorage:
+
+    """
+    Raw objects as files under a local data lake root, read with mmap
+
+    ETags are derived from size and mtime, stable while a file is
+    unchanged, so checkpoints work against a synced mirror.
+    """
+
+    backend = "local"
+
+    def __init__(self, root: Path | str | None = None):
+        self.root = Path(root or local_data_lake())
+
+    def uri(self, key: str) -> str:
+        return str(self.root / key)
+
+    def _path(self, key: str) -> Path:
+
+        path = (self.root / key).resolve()
+
+        if not path.is_relative_to(self.root.resolve()):
+            raise ConfigError(f"Key outside local data lake: {key}")
+
+        return path
+
+    @staticmethod
+    def _etag(stat: os.stat_result) -> str:
+        return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+    def put(self, key: str, body: bytes, content_type: str | None = None, content_encoding: str | None = None, metadata: dict | None = None) -> str:
+
+        """
+        Write an object atomically, attributes other than the body
+        are implied by the key extension
+
+        :param key: Object key
+        :type key: str
+        :param body: Object bytes
+        :type body: bytes
+        :return: ETag of the written file
+        :rtype: str
+        """
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with metrics.timer("etl_storage_put", backend="local"):
+            temp_file = path.with_name(path.name + ".tmp")
+            temp_file.write_bytes(body)
+            temp_file.replace(path)
+
+        metrics.observe("etl_storage_put_bytes", len(body), buckets=metrics.SIZE_BUCKETS, backend="local")
+
+        return self._etag(path.stat())
+
+    def open(self, key: str) -> tuple:
+
+        """
+        Open a file as a memory-mapped stream
+
+        :param key: Object key
+        :type key: str
+        :return: Readable stream and ETag
+        :rtype: tuple
+        """
+
+        path = self._path(key)
+
+        try:
+            with path.open("rb") as f:
+                stat = os.fstat(f.fileno())
+                metrics.observe("etl_storage_get_bytes", stat.st_size, buckets=metrics.SIZE_BUCKETS, backend="local")
+
+                if stat.st_size == 0:
+                    return open(path, "rb"), self._etag(stat)
+
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), self._etag(stat)
+
+        except FileNotFoundError as e:
+            raise ConfigError(f"No raw object {key}") from e
+
+    def get(self, key: str) -> bytes:
+
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError as e:
+            raise ConfigError(f"No raw object {key}") from e
+
+    def head(self, key: str) -> dict | None:
+
+        path = self._path(key)
+
+        if not path.is_file():
+            return None
+
+        stat = path.stat()
+
+        return {
+            "etag": self._etag(stat),
+            "size": stat.st_size,
+            "last_modified": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+            "metadata": {}
+        }
+
+    def list(self, prefix: str) -> list[dict]:
+
+        """
+        List files under a key prefix, which may end mid file name
+
+        :param prefix: Key prefix
+        :type prefix: str
+        :return: key, etag, size, last_modified per file
+        :rtype: list[dict]
+        """
+
+        directory = self._path(prefix.rpartition("/")[0])
+        objects = []
+
+        if not directory.is_dir():
+            return objects
+
+        for dirpath, _, filenames in os.walk(directory):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+
+                path = Path(dirpath) / filename
+                key = path.relative_to(self.root.resolve()).as_posix()
+
+                if not key.startswith(prefix):
+                    continue
+
+                stat = path.stat()
+
+                objects.append({
+                    "key": key,
+                    "etag": self._etag(stat),
+                    "size": stat.st_size,
+                    "last_modified": datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+                })
+
+        return objects
+
+    def find_raw(self, stem: str) -> str | None:
+
+        # Candidates are known, stat them instead of walking the directory
+        objects = [head | {"key": stem + extension} for extension in RAW_EXTENSIONS if (head := self.head(stem + extension))]
+
+        return newest_raw_key(objects, stem)
+
+# --------------------------------------------------
+# Process-wide backend
+# --------------------------------------------------
+
+def get_storage():
+
+    """
+    Process-wide storage backend from STORAGE_BACKEND (s3 | local),
+    created on first use
+    """
+
+    global _storage
+
+    if _storage is None:
+        backend = settings.get("STORAGE_BACKEND", "s3")
+
+        if backend == "s3":
+            _storage = S3Storage()
+        elif backend == "local":
+            _storage = LocalStorage()
+        else:
+            raise ConfigError(f"Unsupported STORAGE_BACKEND: {backend}")
+
+    return _storage
+
+def set_storage(storage):
+
+    """
+    Replace the process-wide storage backend
+
+    :param storage: S3Storage or LocalStorage
+    """
+
+    global _storage
+
+    _storage = storage
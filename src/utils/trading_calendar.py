@@ -0,0 +1,175 @@
+"""
+NYSE trading calendar
+Regular holiday rules plus unscheduled closures, sessions as an
+ordered numpy datetime64[D] array
+"""
+
+from datetime import date, timedelta
+from functools import lru_cache
+import numpy as np
+from src.utils import settings
+
+# --------------------------------------------------
+# Config
+# --------------------------------------------------
+
+# Holiday rules below follow NYSE practice from 1971 on, CALENDAR_START
+# moves the default first session, read on use
+DEFAULT_START = "1980-01-01"
+
+# Unscheduled full-day closures
+
+SPECIAL_CLOSURES = {
+    date(1972, 12, 28),  # President Truman funeral
+    date(1973, 1, 25),   # President Johnson funeral
+    date(1977, 7, 14),   # New York City blackout
+    date(1985, 9, 27),   # Hurricane Gloria
+    date(1994, 4, 27),   # President Nixon funeral
+    date(2001, 9, 11),   # September 11
+    date(2001, 9, 12),
+    date(2001, 9, 13),
+    date(2001, 9, 14),
+    date(2004, 6, 11),   # President Reagan funeral
+    date(2007, 1, 2),    # President Ford funeral
+    date(2012, 10, 29),  # Hurricane Sandy
+    date(2012, 10, 30),
+    date(2018, 12, 5),   # President G.H.W. Bush funeral
+    date(2025, 1, 9)     # President Carter funeral
+}
+
+# --------------------------------------------------
+# Holiday rules
+# --------------------------------------------------
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+
+    """
+    nth weekday of a month, n=-1 for the last one
+    """
+
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _observed(holiday: date) -> date:
+
+    """
+    Saturday holidays close the Friday before, Sunday holidays the Monday after
+    """
+
+    if holiday.weekday() == 5:
+        return holiday - timedelta(days=1)
+    if holiday.weekday() == 6:
+        return holiday + timedelta(days=1)
+    return holiday
+
+def _easter(year: int) -> date:
+
+    """
+    Gregorian Easter Sunday (anonymous Gregorian algorithm)
+    """
+
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+
+    return date(year, month, day + 1)
+
+def holidays(year: int) -> list[date]:
+
+    """
+    NYSE full-day holidays for a year, observed dates
+
+    :param year: Calendar year
+    :type year: int
+    :return: Holiday dates
+    :rtype: list[date]
+    """
+
+    days = [
+        _nth_weekday(year, 2, 0, 3),                    # Washington's Birthday
+        _easter(year) - timedelta(days=2),              # Good Friday
+        _nth_weekday(year, 5, 0, -1),                   # Memorial Day
+        _observed(date(year, 7, 4)),                    # Independence Day
+        _nth_weekday(year, 9, 0, 1),                    # Labor Day
+        _nth_weekday(year, 11, 3, 4),                   # Thanksgiving
+        _observed(date(year, 12, 25))                   # Christmas
+    ]
+
+    # A Saturday New Year's Day is not observed on the Friday before
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        days.append(_observed(new_year))
+
+    # Presidential Election Day, the Tuesday after the first Monday
+    if year <= 1980 and year % 4 == 0:
+        days.append(_nth_weekday(year, 11, 0, 1) + timedelta(days=1))
+
+    if year >= 1998:
+        days.append(_nth_weekday(year, 1, 0, 3))        # Martin Luther King Jr. Day
+
+    if year >= 2022:
+        days.append(_observed(date(year, 6, 19)))       # Juneteenth
+
+    return days
+
+# --------------------------------------------------
+# Sessions
+# --------------------------------------------------
+
+@lru_cache(maxsize=8)
+def _sessions(start: date, end: date) -> np.ndarray:
+
+    closed = [day for year in range(start.year, end.year + 1) for day in holidays(year)]
+    closed.extend(SPECIAL_CLOSURES)
+
+    calendar = np.busdaycalendar(holidays=np.array(closed, dtype="datetime64[D]"))
+    days = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+
+    result = days[np.is_busday(days, busdaycal=calendar)]
+    result.flags.writeable = False
+
+    return result
+
+def sessions(start: date | None = None, end: date | None = None) -> np.ndarray:
+
+    """
+    Ordered NYSE sessions between two dates, inclusive
+
+    :param start: First date, defaults to CALENDAR_START
+    :type start: date | None
+    :param end: Last date, defaults to the end of next year
+    :type end: date | None
+    :return: Sessions as a read-only datetime64[D] array
+    :rtype: np.ndarray
+    """
+
+    if start is None:
+        start = date.fromisoformat(settings.get("CALENDAR_START", DEFAULT_START))
+
+    if end is None:
+        end = date(date.today().year + 1, 12, 31)
+
+    return _sessions(start, end)
+
+def is_session(day: date) -> bool:
+
+    """
+    True if the NYSE is open on a date
+
+    :param day: Date to check
+    :type day: date
+    :rtype: bool
+    """
+
+    return bool(sessions(day, day).size)
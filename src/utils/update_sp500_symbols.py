@@ -3,9 +3,7 @@ Creates a json file containing upto date S&P500 tickers
 
 """
 
-import pandas as pd
 import json
-import requests
 from pathlib import Path
 from datetime import datetime
 
@@ -33,6 +31,9 @@ def fetch_sp500() -> list[str]:
     a list of ticker symbols (strings).
     """
 
+    import pandas as pd
+    import requests
+
     response = requests.get(URL, headers=HEADERS, timeout=30)
     response.raise_for_status()
 
@@ -0,0 +1,128 @@
+"""
+Load watermarks per pipeline stage, optionally per symbol
+Read and advanced inside the caller's transaction
+"""
+
+from datetime import date
+from src.utils.db import execute_many, fetch_all
+
+# --------------------------------------------------
+# Stage-wide watermark symbol
+# --------------------------------------------------
+
+ALL_SYMBOLS = "*"
+
+# --------------------------------------------------
+# SQL
+# --------------------------------------------------
+
+SELECT = """
+SELECT high_water_date
+FROM etl.load_watermark
+WHERE stage = %(stage)s
+  AND symbol = %(symbol)s
+FOR UPDATE;
+"""
+
+SELECT_SYMBOLS = """
+SELECT symbol, high_water_date
+FROM etl.load_watermark
+WHERE stage = %(stage)s
+  AND symbol <> '*'
+FOR UPDATE;
+"""
+
+UPSERT = """
+INSERT INTO etl.load_watermark (
+    stage,
+    symbol,
+    high_water_date
+) VALUES (
+    %(stage)s,
+    %(symbol)s,
+    %(high_water_date)s
+)
+ON CONFLICT (stage, symbol) DO UPDATE
+SET high_water_date = GREATEST(etl.load_watermark.high_water_date, EXCLUDED.high_water_date),
+    updated_at = now();
+"""
+
+# --------------------------------------------------
+# Read watermark
+# --------------------------------------------------
+
+def get_watermark(conn, stage: str, symbol: str = ALL_SYMBOLS) -> date | None:
+
+    """
+    Read and lock the watermark for a stage
+
+    :param conn: Open connection, inside a transaction
+    :param stage: Pipeline stage eg curated
+    :type stage: str
+    :param symbol: Symbol, defaults to the stage-wide watermark
+    :type symbol: str
+    :return: Latest loaded trade date, None if never loaded
+    :rtype: date | None
+    """
+
+    with conn.cursor() as cur:
+        cur.execute(SELECT, {"stage": stage, "symbol": symbol})
+        row = cur.fetchone()
+
+    return row[0] if row else None
+
+def get_symbol_watermarks(conn, stage: str) -> dict[str, date]:
+
+    """
+    Read and lock every per-symbol watermark for a stage
+
+    :param conn: Open connection, inside a transaction
+    :param stage: Pipeline stage eg curated
+    :type stage: str
+    :return: Latest loaded trade date per symbol
+    :rtype: dict[str, date]
+    """
+
+    return dict(fetch_all(SELECT_SYMBOLS, {"stage": stage}, conn=conn))
+
+# --------------------------------------------------
+# Advance watermark
+# --------------------------------------------------
+
+def advance_watermark(conn, stage: str, high_water_date: date, symbol: str = ALL_SYMBOLS):
+
+    """
+    Move a stage watermark forward, never backwards
+
+    :param conn: Open connection, inside the load transaction
+    :param stage: Pipeline stage eg curated
+    :type stage: str
+    :param high_water_date: Latest trade date loaded
+    :type high_water_date: date
+    :param symbol: Symbol, defaults to the stage-wide watermark
+    :type symbol: str
+    """
+
+    with conn.cursor() as cur:
+        cur.execute(UPSERT, {"stage": stage, "symbol": symbol, "high_water_date": high_water_date})
+
+def advance_symbol_watermarks(conn, stage: str, high_water_dates: dict[str, date]):
+
+    """
+    Move per-symbol watermarks forward in one pipelined batch
+
+    :param conn: Open connection, inside the load transaction
+    :param stage: Pipeline stage eg curated
+    :type stage: str
+    :param high_water_dates: Latest trade date loaded per symbol
+    :type high_water_dates: dict[str, date]
+    """
+
+    execute_many(
+        UPSERT,
+        [
+            {"stage": stage, "symbol": symbol, "high_water_date": high_water_date}
+            for symbol, high_water_date in high_water_dates.items()
+        ],
+        conn=conn
+    )
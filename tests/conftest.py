@@ -0,0 +1,84 @@
+"""
+Shared test fixtures
+
+Database tests run against a scratch database created on the server
+given by DB_HOST, DB_PORT, DB_USER and DB_PASSWORD and dropped
+afterwards. They are skipped when no server is reachable.
+
+    DB_HOST=127.0.0.1 DB_USER=postgres DB_PASSWORD=... python -m pytest -q
+"""
+
+import os
+import uuid
+
+import pytest
+
+from benchmarks.run_pipeline import PROJECT_ROOT, SCHEMA_FILES, TRUNCATE
+
+# The benchmark does not run the orchestrator
+TEST_SCHEMA_FILES = SCHEMA_FILES + ["sql/etl/etl_pipeline_run.sql"]
+
+# --------------------------------------------------
+# Scratch database
+# --------------------------------------------------
+
+@pytest.fixture(scope="session")
+def scratch_db():
+
+    """
+    Create a UTF8 scratch database with the pipeline schema and point
+    DB_NAME at it for the session.
+    """
+
+    psycopg = pytest.importorskip("psycopg")
+    pytest.importorskip("psycopg_pool")
+
+    from src.utils import db
+
+    admin_kwargs = db.connection_kwargs() | {"dbname": "postgres"}
+
+    try:
+        admin = psycopg.connect(**admin_kwargs, autocommit=True, connect_timeout=3)
+    except psycopg.OperationalError as e:
+        pytest.skip(f"No database server: {e}")
+
+    name = f"etl_test_{uuid.uuid4().hex[:8]}"
+    previous = os.environ.get("DB_NAME")
+
+    with admin:
+        admin.execute(f"CREATE DATABASE {name} TEMPLATE template0 ENCODING 'UTF8'")
+
+        os.environ["DB_NAME"] = name
+        db.close_pool()
+
+        try:
+            with db.transaction() as conn:
+                for path in TEST_SCHEMA_FILES:
+                    db.execute((PROJECT_ROOT / path).read_text(), conn=conn)
+
+            yield name
+
+        finally:
+            db.close_pool()
+
+            if previous is None:
+                os.environ.pop("DB_NAME", None)
+            else:
+                os.environ["DB_NAME"] = previous
+
+            admin.execute(f"DROP DATABASE {name} WITH (FORCE)")
+
+@pytest.fixture
+def clean_db(scratch_db):
+
+    """
+    Empty every pipeline table before the test.
+    """
+
+    from src.utils import db
+
+    with db.transaction() as conn:
+        db.execute(TRUNCATE, conn=conn)
+        db.execute("TRUNCATE etl.pipeline_run;", conn=conn)
+
+    return scratch_db
@@ -0,0 +1,154 @@
+"""
+scale_prices must round exactly as the Decimal contract does,
+including half-way ties that float64 cannot represent exactly, and
+the batch contracts must keep and reject the same candles as the
+per-row validators.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from src.load_staging.contract_columnar import PRICE_FIELDS, PRICE_SCALE, _quantize, scale_prices
+from src.load_staging.contract_historical import validate_historical_batch, validate_historical_data
+from src.load_staging.contract_incremental import validate_incremental_batch, validate_incremental_data
+
+TIES = [
+    "1.00005", "2.67895", "123.45675", "0.00015", "0.00005",
+    "9999.99995", "1.23445", "1.23455", "10.10105", "0.30005",
+    "-1.00005", "-2.67895", "-0.00015",
+]
+
+# --------------------------------------------------
+# Half-way ties
+# --------------------------------------------------
+
+@pytest.mark.parametrize("cast", [str, float], ids=["str", "float"])
+def test_ties_match_decimal(cast):
+    values = [cast(v) for v in TIES]
+
+    scaled, valid = scale_prices(values)
+
+    assert valid.all()
+    assert scaled.tolist() == [_quantize(v) for v in values]
+
+def test_ties_round_half_up():
+    scaled, _ = scale_prices(["1.00005", "2.67895", "-1.00005"])
+
+    assert scaled.tolist() == [10001, 26790, -10001]
+
+def test_generated_ties_match_decimal():
+    rng = random.Random(20240131)
+    values = [f"{rng.randrange(0, 10**9)}5e-5" for _ in range(5000)]
+    values = [float(v) for v in values]
+
+    scaled, _ = scale_prices(values)
+
+    assert scaled.tolist() == [_quantize(v) for v in values]
+
+# --------------------------------------------------
+# Everything else
+# --------------------------------------------------
+
+def test_random_prices_match_decimal():
+    rng = np.random.default_rng(7)
+    values = (rng.random(20000) * 5000).tolist() + [0.0, 1.0, 0.12344999, 0.12345001]
+
+    scaled, _ = scale_prices(values)
+
+    assert scaled.tolist() == [_quantize(v) for v in values]
+
+def test_invalid_values_are_flagged():
+    scaled, valid = scale_prices(["1.5", "n/a", None, "2"])
+
+    assert valid.tolist() == [True, False, False, True]
+    assert scaled[valid].tolist() == [int(1.5 * PRICE_SCALE), 2 * PRICE_SCALE]
+
+# --------------------------------------------------
+# Batch contracts against the per-row validators
+# --------------------------------------------------
+
+CANDLES = [
+    {"date": "2024-01-02", "open": 10.12345, "high": "11.00005", "low": 9.5, "close": 10.99995, "adjusted_close": "10.5", "volume": 1200},
+    {"date": "2024-01-03", "open": "1.00005", "high": 2.67895, "low": 0.00005, "close": 1.23445, "adjusted_close": 1.23455, "volume": "300"},
+    {"date": "2024-01-04", "open": 10, "high": 11, "low": 9, "close": 10, "adjusted_close": 10, "volume": 0},
+    {"date": "2024-01-05", "open": 10, "high": 11, "low": 9, "close": 10, "adjusted_close": 10, "volume": -1},
+    {"date": "2024-01-08", "open": "n/a", "high": 11, "low": 9, "close": 10, "adjusted_close": 10, "volume": 5},
+    {"date": "2024-01-09", "open": 10, "high": 11, "low": 9, "close": None, "adjusted_close": 10, "volume": 5},
+    {"date": "2024-01-10", "open": 10, "high": 11, "low": 9, "close": 10, "adjusted_close": 10, "volume": "many"},
+    {"date": "2024-02-30", "open": 10, "high": 11, "low": 9, "close": 10, "adjusted_close": 10, "volume": 5},
+    {"date": "2024-01-11", "open": 10, "high": 11, "low": 9, "close": 10, "volume": 5},
+    {"date": "2024-01-12", "open": 3999.99995, "high": 4000.00015, "low": 3999.00005, "close": 4000, "adjusted_close": 3998.12345, "volume": 7},
+]
+
+META = {"domain": "sp500", "source": "eodhd", "ingested_at": "2024-02-01T00:00:00"}
+
+def reference(validate, payload: dict, data: list[dict]) -> tuple[list[tuple], list[int]]:
+
+    """
+    Run the per-row validator over each candle, as COPY rows and the
+    indices it raised on
+    """
+
+    rows, rejected = [], []
+
+    for i, candle in enumerate(data):
+        try:
+            row = validate(payload, candle)
+        except (ValueError, ArithmeticError):
+            rejected.append(i)
+            continue
+
+        rows.append((
+            row["symbol"],
+            row["domain"],
+            row["source"],
+            row["ingestion_type"],
+            row["ingested_at"],
+            row["trade_date"],
+            *(int(row[field].scaleb(4)) for field in PRICE_FIELDS),
+            row["volume"],
+        ))
+
+    return rows, rejected
+
+def generated_candles(n: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+
+    def price():
+        return rng.choice([
+            round(rng.uniform(0, 5000), rng.randrange(1, 8)),
+            f"{rng.randrange(0, 10**8)}5e-5",
+            str(round(rng.uniform(0, 500), 5)),
+        ])
+
+    return [
+        {
+            "date": f"2023-{rng.randrange(1, 13):02}-{rng.randrange(1, 29):02}",
+            **{field: price() for field in PRICE_FIELDS},
+            "volume": rng.randrange(0, 10**9),
+        }
+        for _ in range(n)
+    ]
+
+@pytest.mark.parametrize("data", [CANDLES, generated_candles(2000, 5)], ids=["edge", "generated"])
+def test_historical_batch_matches_per_row(data):
+    payload = META | {"symbol": "AAA", "ingestion_type": "historical"}
+
+    batch, rejected = validate_historical_batch(payload, data)
+    rows, failed = reference(validate_historical_data, payload, data)
+
+    assert list(batch.rows()) == rows
+    assert [data.index(r["candle"]) for r in rejected] == failed
+
+@pytest.mark.parametrize("data", [CANDLES, generated_candles(2000, 6)], ids=["edge", "generated"])
+def test_incremental_batch_matches_per_row(data):
+    payload = META | {"ingestion_type": "incremental"}
+    data = [candle | {"code": f"S{i % 7}"} for i, candle in enumerate(data)]
+
+    batch, rejected = validate_incremental_batch(payload, data)
+    rows, failed = reference(validate_incremental_data, payload, data)
+
+    assert list(batch.rows()) == rows
+    assert [data.index(r["candle"]) for r in rejected] == failed
@@ -0,0 +1,103 @@
+"""
+load_curated_incremental against a scratch database: candles staging
+queued in etl.restated_candles are applied to curated and consumed,
+and stay queued while their symbol is missing from dim_stock_meta.
+"""
+
+from datetime import date
+
+import pytest
+
+from src.load_curated.curated_incremental import load_curated_incremental
+from src.load_staging.contract_historical import validate_historical_batch
+from src.load_staging.staging_bulk import copy_batch, create_load_table, merge_into_staging
+from src.utils import db
+
+pytestmark = pytest.mark.usefixtures("clean_db")
+
+# --------------------------------------------------
+# Helpers
+# --------------------------------------------------
+
+def stage_candles(symbol: str, days: list[str], close: float = 10.0):
+    candles = [
+        {"date": day, "open": 10.0, "high": 11.0, "low": 9.0, "close": close, "adjusted_close": close, "volume": 1000}
+        for day in days
+    ]
+    batch, _ = validate_historical_batch(
+        {"symbol": symbol, "domain": "sp500", "source": "eodhd", "ingestion_type": "historical", "ingested_at": "2024-02-01T00:00:00"},
+        candles,
+    )
+
+    with db.transaction() as conn:
+        create_load_table(conn)
+        copy_batch(conn, batch)
+        merge_into_staging(conn, "upsert")
+
+def add_stock_meta(symbol: str):
+    db.execute(
+        "INSERT INTO curated.dim_stock_meta (symbol, name, sector, sub_industry, cik, domain) VALUES (%s, %s, 'Tech', 'Software', 1, 'sp500')",
+        (symbol, symbol),
+    )
+
+def queue(symbol: str, day: date):
+    db.execute(
+        "INSERT INTO etl.restated_candles (stage, symbol, trade_date) VALUES ('curated', %s, %s)",
+        (symbol, day),
+    )
+
+def queued() -> list[tuple]:
+    return db.fetch_all("SELECT symbol, trade_date FROM etl.restated_candles WHERE stage = 'curated' ORDER BY 1, 2")
+
+def facts() -> list[tuple]:
+    rows = db.fetch_all(
+        """
+        SELECT sm.symbol, f.trade_date, f.close
+        FROM curated.fact_stock_prices as f
+        JOIN curated.dim_stock_meta as sm ON sm.stock_meta_sk = f.symbol_sk
+        ORDER BY 1, 2
+        """
+    )
+    return [(symbol, day, float(close)) for symbol, day, close in rows]
+
+# --------------------------------------------------
+# Restated queue
+# --------------------------------------------------
+
+def test_restated_candles_applied_and_consumed():
+    stage_candles("AAA", ["2024-01-02", "2024-01-03"])
+    add_stock_meta("AAA")
+    load_curated_incremental()
+
+    # Restated close behind the curated watermark
+    stage_candles("AAA", ["2024-01-02"], close=10.5)
+
+    assert queued() == [("AAA", date(2024, 1, 2))]
+
+    result = load_curated_incremental()
+
+    assert result["updated"] == 1
+    assert facts() == [("AAA", date(2024, 1, 2), 10.5), ("AAA", date(2024, 1, 3), 10.0)]
+    assert queued() == []
+
+def test_unknown_symbol_stays_queued():
+    stage_candles("AAA", ["2024-01-02", "2024-01-03"])
+    add_stock_meta("AAA")
+    load_curated_incremental()
+
+    # BBB staged behind the watermark before its stock meta reached curated
+    stage_candles("BBB", ["2024-01-02"])
+    queue("AAA", date(2024, 1, 3))
+
+    assert queued() == [("AAA", date(2024, 1, 3)), ("BBB", date(2024, 1, 2))]
+
+    load_curated_incremental()
+
+    assert queued() == [("BBB", date(2024, 1, 2))]
+    assert [row[0] for row in facts()] == ["AAA", "AAA"]
+
+    add_stock_meta("BBB")
+    load_curated_incremental()
+
+    assert queued() == []
+    assert ("BBB", date(2024, 1, 2), 10.0) in facts()
@@ -0,0 +1,141 @@
+"""
+Pipeline runner: stage validation, downstream skips when a stage
+fails, and resuming a run id from the stages that did not finish.
+Stages run the trivial targets below in spawned processes.
+"""
+
+import time
+from pathlib import Path
+
+import pytest
+
+from src.utils.custom_exceptions import ConfigError
+from src.utils.orchestrator import DONE, FAILED, SKIPPED, Stage, ledger, run_pipeline, validate_stages
+
+# --------------------------------------------------
+# Stage targets
+# --------------------------------------------------
+
+def mark(log: str, name: str, fail_while: str | None = None):
+
+    """
+    Append the stage name to a log file, failing while a flag file exists
+    """
+
+    with open(log, "a") as f:
+        f.write(f"{name}\n")
+
+    if fail_while is not None and Path(fail_while).exists():
+        raise RuntimeError(f"{name} broken")
+
+def sleep(seconds: float):
+    time.sleep(seconds)
+
+# --------------------------------------------------
+# Helpers
+# --------------------------------------------------
+
+def stage(name: str, log: Path, after: tuple[str, ...] = (), fail_while: Path | None = None) -> Stage:
+    kwargs = {"log": str(log), "name": name, "fail_while": fail_while and str(fail_while)}
+    return Stage(name, f"{__name__}:mark", after, kwargs, retries=0, timeout=60, retry_delay=0)
+
+def ran(log: Path) -> list[str]:
+    return log.read_text().split() if log.exists() else []
+
+def statuses(run_id: str) -> dict[str, str]:
+    return {name: entry["status"] for name, entry in ledger(run_id).items()}
+
+# --------------------------------------------------
+# Validation
+# --------------------------------------------------
+
+def test_dependency_order():
+    ordered = validate_stages([
+        Stage("mart", "m:f", ("curated",)),
+        Stage("curated", "m:f", ("staging",)),
+        Stage("staging", "m:f"),
+        Stage("meta", "m:f"),
+    ])
+
+    names = [s.name for s in ordered]
+
+    assert names.index("staging") < names.index("curated") < names.index("mart")
+
+def test_cycle_rejected():
+    with pytest.raises(ConfigError, match="cycle: a, b"):
+        validate_stages([Stage("a", "m:f", ("b",)), Stage("b", "m:f", ("a",)), Stage("c", "m:f")])
+
+def test_self_dependency_rejected():
+    with pytest.raises(ConfigError, match="cycle"):
+        validate_stages([Stage("a", "m:f", ("a",))])
+
+def test_unknown_dependency_rejected():
+    with pytest.raises(ConfigError, match="unknown stages: missing"):
+        validate_stages([Stage("a", "m:f", ("missing",))])
+
+def test_duplicate_stage_rejected():
+    with pytest.raises(ConfigError, match="Duplicate"):
+        validate_stages([Stage("a", "m:f"), Stage("a", "m:f")])
+
+# --------------------------------------------------
+# Running
+# --------------------------------------------------
+
+@pytest.mark.usefixtures("clean_db")
+def test_failure_skips_downstream(tmp_path):
+    log, broken = tmp_path / "log", tmp_path / "broken"
+    broken.touch()
+
+    stages = [
+        stage("a", log, fail_while=broken),
+        stage("b", log, ("a",)),
+        stage("c", log, ("b",)),
+        stage("d", log),
+    ]
+
+    with pytest.raises(RuntimeError, match="failed at: a"):
+        run_pipeline(stages, run_id="skip-test", workers=2)
+
+    assert statuses("skip-test") == {"a": FAILED, "b": SKIPPED, "c": SKIPPED, "d": DONE}
+    assert sorted(ran(log)) == ["a", "d"]
+
+@pytest.mark.usefixtures("clean_db")
+def test_rerun_resumes_from_unfinished_stages(tmp_path):
+    log, broken = tmp_path / "log", tmp_path / "broken"
+    broken.touch()
+
+    stages = [
+        stage("a", log),
+        stage("b", log, ("a",), fail_while=broken),
+        stage("c", log, ("b",)),
+    ]
+
+    with pytest.raises(RuntimeError):
+        run_pipeline(stages, run_id="resume-test", workers=1)
+
+    assert ran(log) == ["a", "b"]
+
+    broken.unlink()
+
+    assert run_pipeline(stages, run_id="resume-test", workers=1) == {"a": DONE, "b": DONE, "c": DONE}
+
+    # a is not run again, b's attempts carry over
+    assert ran(log) == ["a", "b", "b", "c"]
+    assert ledger("resume-test")["b"]["attempts"] == 2
+
+    # Another run id starts from scratch
+    run_pipeline(stages, run_id="other-run", workers=1)
+
+    assert ran(log)[4:] == ["a", "b", "c"]
+
+@pytest.mark.usefixtures("clean_db")
+def test_timeout_fails_stage():
+    stages = [Stage("slow", f"{__name__}:sleep", (), {"seconds": 30}, retries=0, timeout=1, retry_delay=0)]
+
+    started = time.perf_counter()
+
+    with pytest.raises(RuntimeError, match="failed at: slow"):
+        run_pipeline(stages, run_id="timeout-test")
+
+    assert time.perf_counter() - started < 20
+    assert statuses("timeout-test") == {"slow": FAILED}
@@ -0,0 +1,77 @@
+"""
+ensure_partitions against a scratch database: the process-wide cache
+of partitioned years only holds partitions that were committed.
+"""
+
+import pytest
+
+from src.utils import db, partitions
+
+pytestmark = pytest.mark.usefixtures("clean_db")
+
+TABLE = "staging.stocks"
+
+# --------------------------------------------------
+# Helpers
+# --------------------------------------------------
+
+def drop_year(year: int):
+    schema, _ = partitions.split_table(TABLE)
+
+    db.execute(f"DROP TABLE IF EXISTS {schema}.{partitions.partition_name(TABLE, year)}")
+    partitions.forget(TABLE)
+
+@pytest.fixture
+def years():
+
+    """
+    Years no other test partitions, dropped afterwards
+    """
+
+    years = (1971, 1972)
+
+    for year in years:
+        drop_year(year)
+
+    yield years
+
+    for year in years:
+        drop_year(year)
+
+# --------------------------------------------------
+# Cache
+# --------------------------------------------------
+
+def test_cached_once_committed(years):
+    with db.transaction() as conn:
+        assert partitions.ensure_partitions(conn, TABLE, years) == list(years)
+        assert not set(years) <= partitions._known.get(TABLE, set())
+
+    assert set(years) <= partitions._known[TABLE]
+
+    with db.transaction() as conn:
+        assert partitions.ensure_partitions(conn, TABLE, years) == []
+
+def test_rolled_back_partitions_are_not_cached(years):
+    first, second = years
+
+    # Chunk N creates a year, chunk N+1 reads it back, then the load fails
+    with pytest.raises(RuntimeError):
+        with db.transaction() as conn:
+            partitions.ensure_partitions(conn, TABLE, [first])
+            partitions.ensure_partitions(conn, TABLE, [first, second])
+            raise RuntimeError("load failed")
+
+    assert not set(years) & partitions._known.get(TABLE, set())
+
+    with db.transaction() as conn:
+        assert partitions.ensure_partitions(conn, TABLE, [first]) == [first]
+
+    assert set(years) & partitions._known[TABLE] == {first}
+
+def test_forget_drops_years_committed_after(years):
+    with db.transaction() as conn:
+        partitions.ensure_partitions(conn, TABLE, years)
+        partitions.forget(TABLE)
+
+    assert TABLE not in partitions._known
@@ -0,0 +1,134 @@
+"""
+pipelined and Handoff: items streamed to the consumer in parts are
+produced a bounded number of parts ahead, failures reach the
+consumer, and giving up early does not hang the workers.
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.utils.pipelined import Handoff, pipelined
+
+# --------------------------------------------------
+# Helpers
+# --------------------------------------------------
+
+class Counted:
+
+    """
+    Parts generator recording how far it ran ahead of the consumer
+    """
+
+    def __init__(self, n: int, fail_at: int | None = None):
+        self.n = n
+        self.fail_at = fail_at
+        self.produced = 0
+        self.consumed = 0
+        self.ahead = 0
+        self.closed = threading.Event()
+
+    def parts(self):
+        try:
+            for i in range(self.n):
+                if i == self.fail_at:
+                    raise ValueError(f"bad part {i}")
+
+                self.produced += 1
+                self.ahead = max(self.ahead, self.produced - self.consumed)
+                yield i
+
+        finally:
+            self.closed.set()
+
+def streamed(counters: dict[str, Counted], depth: int = 2):
+    return pipelined(counters, [
+        ("list", lambda item: item, 2, 4),
+        ("parse", lambda item: Handoff(item, counters[item].parts(), depth), 2, 4)
+    ])
+
+# --------------------------------------------------
+# Streaming
+# --------------------------------------------------
+
+def test_parts_arrive_in_order_and_bounded():
+    counters = {"a": Counted(200), "b": Counted(50)}
+    results = {}
+
+    for item, handoff, error in streamed(counters):
+        assert error is None
+        assert handoff.value == item
+
+        parts = []
+
+        for part in handoff:
+            # Let the producer run ahead as far as it can
+            time.sleep(0.0005)
+            counters[item].consumed += 1
+            parts.append(part)
+
+        results[item] = parts
+
+    assert results == {"a": list(range(200)), "b": list(range(50))}
+
+    # depth queued, one being put and one being produced
+    assert max(counter.ahead for counter in counters.values()) <= 2 + 2
+
+def test_error_reaches_consumer():
+    counters = {"a": Counted(10, fail_at=5), "b": Counted(3)}
+    results = {}
+
+    for item, handoff, error in streamed(counters):
+        try:
+            results[item] = list(handoff)
+        except ValueError as e:
+            results[item] = str(e)
+
+    assert results == {"a": "bad part 5", "b": [0, 1, 2]}
+
+def test_step_error_skips_handoff():
+    def fail(item):
+        raise KeyError(item)
+
+    results = list(pipelined(["a"], [("list", fail, 1, 1), ("parse", lambda item: Handoff(item, (i for i in []), 1), 1, 1)]))
+
+    assert [(item, value, type(error)) for item, value, error in results] == [("a", None, KeyError)]
+
+# --------------------------------------------------
+# Giving up early
+# --------------------------------------------------
+
+def test_closed_handoff_stops_producer():
+    counters = {"a": Counted(10_000), "b": Counted(3)}
+    results = {}
+
+    for item, handoff, error in streamed(counters, depth=1):
+        if item == "a":
+            handoff.close()
+            assert counters["a"].closed.wait(2)
+            results[item] = "closed"
+        else:
+            results[item] = list(handoff)
+
+    assert results == {"a": "closed", "b": [0, 1, 2]}
+    assert counters["a"].produced < 10_000
+
+def test_closing_pipeline_mid_item_does_not_hang():
+    counters = {name: Counted(10_000) for name in "abcd"}
+
+    results = streamed(counters, depth=1)
+    _, handoff, _ = next(results)
+    next(iter(handoff))
+
+    started = time.perf_counter()
+    results.close()
+
+    assert time.perf_counter() - started < 5
+    assert all(counter.closed.is_set() for counter in counters.values() if counter.produced)
+
+@pytest.mark.parametrize("depth", [0, 1, 3])
+def test_depth_is_at_least_one(depth):
+    handoff = Handoff(None, (i for i in range(3)), depth)
+
+    assert handoff._queue.maxsize == max(depth, 1)
@@ -0,0 +1,140 @@
+"""
+PresenceIndex: bit offsets of record and missing against a plain
+Python reference, and remap onto a changed calendar.
+"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+from src.load_staging.presence_index import PresenceIndex
+from src.utils.trading_calendar import sessions
+
+CALENDAR = sessions(date(2023, 1, 1), date(2024, 12, 31))
+
+# --------------------------------------------------
+# Helpers
+# --------------------------------------------------
+
+def days(*values) -> np.ndarray:
+    return np.array(values, dtype="datetime64[D]")
+
+def reference_missing(present: dict[str, np.ndarray], calendar: np.ndarray, start=None, end=None) -> dict[str, list[date]]:
+    result = {}
+
+    for symbol, staged in present.items():
+        staged = set(staged.tolist())
+
+        if not staged:
+            continue
+
+        first, last = min(staged), max(staged)
+        gaps = [
+            day for day in calendar.tolist()
+            if first <= day <= last and day not in staged
+            and (start is None or day >= start) and (end is None or day <= end)
+        ]
+
+        if gaps:
+            result[symbol] = gaps
+
+    return result
+
+# --------------------------------------------------
+# record and missing
+# --------------------------------------------------
+
+def test_missing_between_first_and_last():
+    index = PresenceIndex(sessions=CALENDAR)
+    january = CALENDAR[CALENDAR < np.datetime64("2024-02-01")]
+    january = january[january >= np.datetime64("2024-01-01")]
+
+    index.record({"AAA": np.delete(january, [3, 8]), "BBB": january})
+
+    assert index.missing() == {"AAA": [january[3].item(), january[8].item()]}
+
+def test_byte_boundaries():
+    index = PresenceIndex(sessions=CALENDAR)
+
+    # Gaps on both sides of the first byte boundaries of the bitmap
+    holes = [7, 8, 15, 16, 23]
+    staged = np.delete(CALENDAR[:30], holes)
+
+    index.record({"AAA": staged})
+
+    assert index.missing() == {"AAA": CALENDAR[holes].tolist()}
+
+    # Windows starting and ending mid-byte
+    assert index.missing(start=CALENDAR[8].item(), end=CALENDAR[15].item()) == {"AAA": CALENDAR[[8, 15]].tolist()}
+    assert index.missing(start=CALENDAR[9].item(), end=CALENDAR[14].item()) == {}
+
+def test_matches_reference():
+    rng = np.random.default_rng(18)
+    present = {}
+
+    for n in range(12):
+        first, last = sorted(rng.integers(0, len(CALENDAR), 2))
+        span = CALENDAR[first:last + 1]
+        present[f"S{n:02}"] = span[rng.random(len(span)) > 0.05]
+
+    present["EMPTY"] = days()
+
+    index = PresenceIndex(sessions=CALENDAR)
+    index.record(present)
+
+    assert index.missing() == reference_missing(present, CALENDAR)
+
+    for lower, upper in [(0, 5), (13, 99), (250, 251), (101, 400)]:
+        start, end = CALENDAR[lower].item(), CALENDAR[upper].item()
+        assert index.missing(start=start, end=end) == reference_missing(present, CALENDAR, start, end)
+
+def test_record_merges_and_reports_off_calendar():
+    index = PresenceIndex(sessions=CALENDAR)
+
+    off = index.record({"AAA": days("2024-01-02", "2024-01-06")})
+    index.record({"AAA": days("2024-01-05")})
+    index.record({"AAA": days("2023-12-29", "2030-01-02")})
+
+    # Saturday reported, dates past the calendar ignored
+    assert off == {"AAA": [date(2024, 1, 6)]}
+    assert index.missing(["AAA"]) == {"AAA": [date(2024, 1, 3), date(2024, 1, 4)]}
+
+    row = index.rows["AAA"]
+    assert CALENDAR[index.first[row]] == np.datetime64("2023-12-29")
+    assert CALENDAR[index.last[row]] == np.datetime64("2024-01-05")
+
+def test_missing_unknown_symbol():
+    index = PresenceIndex(sessions=CALENDAR)
+    index.record({"AAA": days("2024-01-02", "2024-01-04")})
+
+    assert index.missing(["ZZZ"]) == {}
+    assert index.missing(["AAA", "ZZZ"]) == {"AAA": [date(2024, 1, 3)]}
+
+# --------------------------------------------------
+# remap
+# --------------------------------------------------
+
+def test_remap_onto_longer_calendar():
+    index = PresenceIndex(sessions=CALENDAR[:300])
+    index.record({"AAA": np.delete(CALENDAR[10:290], [50, 51])})
+
+    remapped = index.remap(CALENDAR)
+
+    assert remapped.missing() == index.missing()
+    assert remapped.bits.shape[1] == (len(CALENDAR) + 7) // 8
+
+def test_remap_drops_removed_session():
+    # A closure added to the calendar, eg a missed holiday
+    closed = 100
+    calendar = np.delete(CALENDAR, closed)
+
+    index = PresenceIndex(sessions=CALENDAR)
+    index.record({"AAA": np.delete(CALENDAR[90:110], closed - 90), "BBB": CALENDAR[90:110]})
+
+    assert index.missing() == {"AAA": [CALENDAR[closed].item()]}
+    assert index.remap(calendar).missing() == {}
+
+@pytest.mark.parametrize("n", [1, 7, 8, 9])
+def test_bitmap_width(n):
+    assert PresenceIndex(sessions=CALENDAR[:n]).bits.shape == (0, (n + 7) // 8)
@@ -0,0 +1,176 @@
+"""
+Shadow rebuild and swap of curated.fact_stock_prices against a
+scratch database: the swapped-in table must keep the live table's
+constraints, foreign keys, indexes and serial sequence.
+"""
+
+from datetime import date
+
+import pytest
+
+from src.load_curated.curated_bulk import load_curated_bulk, rebuild_curated_bulk
+from src.load_staging.contract_historical import validate_historical_batch
+from src.load_staging.staging_bulk import copy_batch, create_load_table, merge_into_staging
+from src.utils import db
+
+pytestmark = pytest.mark.usefixtures("clean_db")
+
+TABLE = "curated.fact_stock_prices"
+
+SELECT_CONSTRAINTS = """
+SELECT conname, contype, pg_get_constraintdef(oid)
+FROM pg_constraint
+WHERE conrelid = %s::regclass
+ORDER BY conname
+"""
+
+SELECT_INDEXES = """
+SELECT indexname, regexp_replace(indexdef, ' INDEX \\S+ ON ', ' INDEX ON ')
+FROM pg_indexes
+WHERE schemaname = 'curated'
+  AND tablename = 'fact_stock_prices'
+ORDER BY 1
+"""
+
+# Partition index names are not kept, a rebuild names them itself
+SELECT_PARTITION_INDEXES = """
+SELECT c.relname, COUNT(i.indexrelid)
+FROM pg_inherits as p
+JOIN pg_class as c
+    ON c.oid = p.inhrelid
+LEFT JOIN pg_index as i
+    ON i.indrelid = p.inhrelid
+WHERE p.inhparent = %s::regclass
+GROUP BY c.relname
+ORDER BY 1
+"""
+
+# --------------------------------------------------
+# Helpers
+# --------------------------------------------------
+
+def seed_staging():
+    db.execute(
+        """
+        INSERT INTO staging.stocks_meta (symbol, name, sector, sub_industry, cik, domain, source, ingested_at)
+        VALUES ('AAA', 'A Corp', 'Tech', 'Software', 1, 'sp500', 'wikipedia', now()),
+               ('BBB', 'B Corp', 'Energy', 'Oil', 2, 'sp500', 'wikipedia', now())
+        """
+    )
+
+    with db.transaction() as conn:
+        create_load_table(conn)
+
+        for symbol in ("AAA", "BBB"):
+            meta = {
+                "symbol": symbol,
+                "domain": "sp500",
+                "source": "eodhd",
+                "ingestion_type": "historical",
+                "ingested_at": "2024-02-01T00:00:00",
+            }
+            candles = [
+                {"date": day, "open": 10, "high": 11, "low": 9, "close": 10, "adjusted_close": 10, "volume": 100}
+                for day in ("2023-12-29", "2024-01-02", "2024-01-03")
+            ]
+            copy_batch(conn, validate_historical_batch(meta, candles)[0])
+
+        merge_into_staging(conn, "upsert")
+
+def snapshot() -> dict:
+    return {
+        "constraints": db.fetch_all(SELECT_CONSTRAINTS, (TABLE,)),
+        "indexes": db.fetch_all(SELECT_INDEXES),
+        "partition_indexes": db.fetch_all(SELECT_PARTITION_INDEXES, (TABLE,)),
+        "sequence": db.fetch_all("SELECT pg_get_serial_sequence(%s, 'stock_price_sk')", (TABLE,))[0][0],
+    }
+
+def exists(table: str) -> bool:
+    return db.fetch_all("SELECT to_regclass(%s) IS NOT NULL", (table,))[0][0]
+
+def insert_fact(symbol_sk: int) -> int:
+    return db.fetch_all(
+        """
+        INSERT INTO curated.fact_stock_prices (symbol_sk, trade_date_sk, trade_date, open, high, low, close, adjusted_close, volume)
+        SELECT %s, date_sk, date, 1, 1, 1, 1, 1, 1
+        FROM curated.dim_trade_date
+        WHERE date = '2024-01-04'
+        RETURNING stock_price_sk
+        """,
+        (symbol_sk,),
+    )[0][0]
+
+@pytest.fixture
+def loaded():
+
+    """
+    Staging and curated loaded in place, before any rebuild
+    """
+
+    seed_staging()
+    load_curated_bulk(full=True)
+
+    db.execute(
+        "INSERT INTO curated.dim_trade_date (date, day, month, year, day_of_week) VALUES ('2024-01-04', 4, 1, 2024, 4)"
+    )
+
+    return snapshot()
+
+# --------------------------------------------------
+# Swap
+# --------------------------------------------------
+
+def test_swap_keeps_constraints_and_indexes(loaded):
+    rebuild_curated_bulk(keep_old=False)
+
+    after = snapshot()
+
+    assert after["constraints"] == loaded["constraints"]
+    assert after["indexes"] == loaded["indexes"]
+    assert after["partition_indexes"] == loaded["partition_indexes"]
+    assert all(count == len(after["indexes"]) for _, count in after["partition_indexes"])
+    assert {name for name, _, _ in after["constraints"]} >= {"fact_stock_prices_pk", "fact_stock_grain"}
+    assert sum(contype == "f" for _, contype, _ in after["constraints"]) == 2
+
+    assert not exists(f"{TABLE}_shadow")
+    assert not exists(f"{TABLE}_old")
+    assert db.fetch_all(f"SELECT COUNT(*) FROM {TABLE}")[0][0] == 6
+
+def test_swap_keeps_foreign_keys_enforced(loaded):
+    import psycopg
+
+    rebuild_curated_bulk(keep_old=False)
+
+    with pytest.raises(psycopg.errors.ForeignKeyViolation):
+        insert_fact(symbol_sk=999)
+
+def test_swap_keeps_serial_sequence(loaded):
+    before_max = db.fetch_all(f"SELECT MAX(stock_price_sk) FROM {TABLE}")[0][0]
+
+    rebuild_curated_bulk(keep_old=False)
+
+    assert snapshot()["sequence"] == loaded["sequence"]
+
+    rebuilt_max = db.fetch_all(f"SELECT MAX(stock_price_sk) FROM {TABLE}")[0][0]
+    symbol_sk = db.fetch_all("SELECT MIN(stock_meta_sk) FROM curated.dim_stock_meta")[0][0]
+
+    assert rebuilt_max > before_max
+    assert insert_fact(symbol_sk) > rebuilt_max
+
+def test_keep_old_replaces_previous_old_table(loaded):
+    rebuild_curated_bulk(keep_old=True)
+    rebuild_curated_bulk(keep_old=True)
+
+    assert snapshot() == loaded
+    assert exists(f"{TABLE}_old")
+    assert not exists(f"{TABLE}_shadow")
+
+    # The old table no longer owns the sequence
+    assert db.fetch_all("SELECT pg_get_serial_sequence(%s, 'stock_price_sk')", (f"{TABLE}_old",))[0][0] is None
+
+def test_rebuild_advances_curated_watermark(loaded):
+    db.execute("DELETE FROM etl.load_watermark")
+
+    rebuild_curated_bulk(keep_old=False)
+
+    assert db.fetch_all("SELECT high_water_date FROM etl.load_watermark WHERE stage = 'curated'") == [(date(2024, 1, 3),)]
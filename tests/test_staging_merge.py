@@ -0,0 +1,160 @@
+"""
+merge_into_staging against a scratch database: inserted vs updated
+classification of the upsert merge and the candles it queues for
+curated in etl.restated_candles.
+"""
+
+from datetime import date
+
+import pytest
+
+from src.load_staging.contract_historical import validate_historical_batch
+from src.load_staging.staging_bulk import copy_batch, create_load_table, merge_into_staging
+from src.utils import db
+
+pytestmark = pytest.mark.usefixtures("clean_db")
+
+# --------------------------------------------------
+# Helpers
+# --------------------------------------------------
+
+def candle(day: str, close: float = 10.0) -> dict:
+    return {
+        "date": day,
+        "open": 10.0,
+        "high": 11.0,
+        "low": 9.0,
+        "close": close,
+        "adjusted_close": close,
+        "volume": 1000,
+    }
+
+def merge(symbol: str, candles: list[dict], mode: str = "upsert", ingested_at: str = "2024-02-01T00:00:00"):
+    batch, rejected = validate_historical_batch(
+        {
+            "symbol": symbol,
+            "domain": "sp500",
+            "source": "eodhd",
+            "ingestion_type": "historical",
+            "ingested_at": ingested_at,
+        },
+        candles,
+    )
+    assert not rejected
+
+    with db.transaction() as conn:
+        create_load_table(conn)
+        copy_batch(conn, batch)
+        return merge_into_staging(conn, mode)
+
+def queued() -> list[tuple]:
+    return db.fetch_all(
+        "SELECT symbol, trade_date FROM etl.restated_candles WHERE stage = 'curated' ORDER BY 1, 2"
+    )
+
+def closes(symbol: str) -> list[float]:
+    rows = db.fetch_all(
+        "SELECT close FROM staging.stocks WHERE symbol = %s ORDER BY trade_date",
+        (symbol,),
+    )
+    return [float(close) for close, in rows]
+
+def set_curated_watermark(day: date, symbol: str = "*"):
+    db.execute(
+        "INSERT INTO etl.load_watermark (stage, symbol, high_water_date) VALUES ('curated', %s, %s)",
+        (symbol, day),
+    )
+
+# --------------------------------------------------
+# Upsert classification
+# --------------------------------------------------
+
+def test_first_load_counts_inserts():
+    inserted, updated = merge("AAA", [candle("2024-01-02"), candle("2024-01-03")])
+
+    assert inserted == {"AAA": 2}
+    assert not updated
+    assert queued() == []
+
+def test_existing_rows_count_as_updates():
+    merge("AAA", [candle("2024-01-02"), candle("2024-01-03")])
+
+    # Restated close, unchanged candle, new candle
+    inserted, updated = merge(
+        "AAA",
+        [candle("2024-01-02", close=10.5), candle("2024-01-03"), candle("2024-01-04")],
+        ingested_at="2024-02-02T00:00:00",
+    )
+
+    assert inserted == {"AAA": 1}
+    assert updated == {"AAA": 1}
+    assert closes("AAA") == [10.5, 10.0, 10.0]
+    assert queued() == [("AAA", date(2024, 1, 2))]
+
+def test_unchanged_reload_is_a_no_op():
+    merge("AAA", [candle("2024-01-02")])
+
+    inserted, updated = merge("AAA", [candle("2024-01-02")], ingested_at="2024-02-02T00:00:00")
+
+    assert not inserted
+    assert not updated
+    assert queued() == []
+
+def test_duplicate_in_one_load_latest_wins():
+    batch = [candle("2024-01-02", close=10.0)]
+    later = [candle("2024-01-02", close=12.0)]
+
+    with db.transaction() as conn:
+        create_load_table(conn)
+
+        for candles, ingested_at in ((batch, "2024-02-01T00:00:00"), (later, "2024-02-02T00:00:00")):
+            meta = {
+                "symbol": "AAA",
+                "domain": "sp500",
+                "source": "eodhd",
+                "ingestion_type": "historical",
+                "ingested_at": ingested_at,
+            }
+            copy_batch(conn, validate_historical_batch(meta, candles)[0])
+
+        inserted, updated = merge_into_staging(conn, "upsert")
+
+    assert inserted == {"AAA": 1}
+    assert not updated
+    assert closes("AAA") == [12.0]
+
+def test_inserts_behind_curated_watermark_are_queued():
+    set_curated_watermark(date(2024, 1, 3))
+
+    inserted, _ = merge("AAA", [candle("2024-01-02"), candle("2024-01-03"), candle("2024-01-04")])
+
+    assert inserted == {"AAA": 3}
+    assert queued() == [("AAA", date(2024, 1, 2)), ("AAA", date(2024, 1, 3))]
+
+def test_symbol_watermark_only_applies_to_its_symbol():
+    set_curated_watermark(date(2024, 1, 31), symbol="AAA")
+
+    merge("AAA", [candle("2024-01-02")])
+    merge("BBB", [candle("2024-01-02")])
+
+    assert queued() == [("AAA", date(2024, 1, 2))]
+
+# --------------------------------------------------
+# Insert mode
+# --------------------------------------------------
+
+def test_insert_mode_keeps_existing_rows():
+    merge("AAA", [candle("2024-01-02")])
+    set_curated_watermark(date(2024, 1, 3))
+
+    inserted, updated = merge(
+        "AAA",
+        [candle("2024-01-02", close=10.5), candle("2024-01-03")],
+        mode="insert",
+        ingested_at="2024-02-02T00:00:00",
+    )
+
+    assert inserted == {"AAA": 1}
+    assert not updated
+    assert closes("AAA") == [10.0, 10.0]
+    assert queued() == [("AAA", date(2024, 1, 3))]
@@ -0,0 +1,79 @@
+"""
+NYSE calendar: holiday rules, unscheduled closures and session counts
+"""
+
+from datetime import date
+
+import pytest
+
+from src.utils.trading_calendar import holidays, is_session, sessions
+
+# Published NYSE sessions per year
+SESSIONS_PER_YEAR = {
+    1980: 253,
+    2001: 248,
+    2012: 250,
+    2018: 251,
+    2019: 252,
+    2020: 253,
+    2021: 252,
+    2022: 251,
+    2023: 250,
+    2024: 252,
+}
+
+# --------------------------------------------------
+# Sessions
+# --------------------------------------------------
+
+@pytest.mark.parametrize("year, count", SESSIONS_PER_YEAR.items())
+def test_sessions_per_year(year, count):
+    assert len(sessions(date(year, 1, 1), date(year, 12, 31))) == count
+
+def test_sessions_are_ordered_weekdays():
+    days = sessions(date(1980, 1, 1), date(2024, 12, 31))
+
+    assert (days[1:] > days[:-1]).all()
+    assert not any(day.weekday() >= 5 for day in days.tolist())
+
+def test_sessions_read_only():
+    days = sessions(date(2024, 1, 1), date(2024, 1, 31))
+
+    with pytest.raises(ValueError):
+        days[0] = days[1]
+
+# --------------------------------------------------
+# Holidays
+# --------------------------------------------------
+
+def test_holidays_2024():
+    assert sorted(holidays(2024)) == [
+        date(2024, 1, 1),
+        date(2024, 1, 15),
+        date(2024, 2, 19),
+        date(2024, 3, 29),
+        date(2024, 5, 27),
+        date(2024, 6, 19),
+        date(2024, 7, 4),
+        date(2024, 9, 2),
+        date(2024, 11, 28),
+        date(2024, 12, 25),
+    ]
+
+@pytest.mark.parametrize("day, open_", [
+    (date(1972, 11, 7), False),    # Presidential Election Day
+    (date(1976, 11, 2), False),
+    (date(1980, 11, 4), False),
+    (date(1982, 11, 2), True),     # Midterm, open from 1972
+    (date(1984, 11, 6), True),     # Presidential, open from 1984
+    (date(1977, 7, 14), False),    # Blackout
+    (date(2012, 10, 29), False),   # Hurricane Sandy
+    (date(2021, 12, 31), True),    # Saturday New Year's Day, not observed
+    (date(2022, 6, 20), False),    # Juneteenth observed on Monday
+    (date(2021, 6, 18), True),     # Before Juneteenth was a holiday
+    (date(1997, 1, 20), True),     # Before Martin Luther King Jr. Day was a holiday
+    (date(2022, 12, 26), False),   # Christmas observed on Monday
+    (date(2021, 7, 5), False),     # Independence Day observed on Monday
+])
+def test_is_session(day, open_):
+    assert is_session(day) is open_